@@ -0,0 +1,73 @@
+"""Запись собранных цен в DataFrame: построчно (iterrows + df.at) и одной операцией
+
+Запуск: python benchmarks/bench_apply_prices.py [--rows 100000 --changed 0.1]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pandas as pd
+
+from parser import PRICE_COLUMN, apply_prices
+
+
+def legacy_apply_prices(df, prices):
+    """Запись цен в том виде, в котором она была в update_prices"""
+    updated_count = 0
+    for index, row in df.iterrows():
+        article = str(row['Артикул']).strip()
+        if article and article != 'nan' and article != 'None' and article != '':
+            new_price = prices.get(article)
+            if new_price and new_price != row[PRICE_COLUMN]:
+                df.at[index, PRICE_COLUMN] = new_price
+                updated_count += 1
+    return updated_count
+
+
+def make_frame(rows, changed, seed=1):
+    rng = random.Random(seed)
+    articles = [str(15000000 + i) for i in range(rows)]
+    old = [rng.randrange(100, 50000) for _ in range(rows)]
+    df = pd.DataFrame({'Артикул': articles, 'Наименование': ['Ступень'] * rows, PRICE_COLUMN: old})
+    prices = {}
+    for article, price in zip(articles, old):
+        roll = rng.random()
+        if roll < changed:
+            prices[article] = price + rng.randrange(1, 1000)
+        elif roll < changed + 0.02:
+            prices[article] = None
+        else:
+            prices[article] = price
+    return df, prices
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--changed', type=float, default=0.1, help='доля строк с новой ценой')
+    args = parser.parse_args()
+
+    df, prices = make_frame(args.rows, args.changed)
+
+    legacy_df = df.copy()
+    started = time.perf_counter()
+    updated = legacy_apply_prices(legacy_df, prices)
+    legacy_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    report = apply_prices(df, prices)
+    vector_time = time.perf_counter() - started
+
+    print(f'Строк: {args.rows}, изменено: {updated} / {len(report)}, '
+          f'результаты совпадают: {legacy_df.equals(df)}')
+    print(f'iterrows + df.at: {legacy_time:.2f} с')
+    print(f'apply_prices:     {vector_time:.3f} с ({legacy_time / vector_time:.0f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Холодный старт бота до run_polling: без снимка прайса и со снимком
+
+Запуск: python benchmarks/bench_cold_start.py [--rows 20000]
+Время считается от запуска интерпретатора до загруженного прайса,
+то есть до момента, когда main() переходит к run_polling.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_load_prices import ROOT, make_workbook
+
+sys.path.insert(0, ROOT)
+
+from catalog import snapshot_path
+
+STARTUP_CODE = 'import bot; bot.load_prices()'
+
+
+def cold_start(workdir):
+    """Время запуска отдельного процесса бота до загрузки прайса"""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-c', STARTUP_CODE], cwd=workdir, env=env, check=True, capture_output=True)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'data.xlsx')
+        make_workbook(path, args.rows)
+        snapshot = snapshot_path(path)
+
+        without_snapshot = []
+        for _ in range(args.repeat):
+            if os.path.exists(snapshot):
+                os.remove(snapshot)
+            without_snapshot.append(cold_start(tmp))
+
+        with_snapshot = [cold_start(tmp) for _ in range(args.repeat)]
+
+        print(f'Прайс: {args.rows} строк, снимок {os.path.getsize(snapshot) / 1024 / 1024:.1f} МБ')
+        print(f'Без снимка: {min(without_snapshot):.2f} с')
+        print(f'Со снимком: {min(with_snapshot):.2f} с')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Нагрузочный тест: обработка обновлений по очереди против параллельной по пользователям
+
+Запуск: python benchmarks/bench_concurrent_updates.py [--users 1000 --latency 0.02 --window 30]
+Пользователи начинают диалог в случайный момент окна window и проходят
+полный расчет лестницы (6 обновлений) с паузой think между сообщениями.
+Обновления кладутся прямо в очередь Application, вызовы Bot API уходят в
+заглушку fake_telegram.py. Задержка обновления - от попадания в очередь до
+конца обработки. Вызовы Bot API одного пользователя медленные (--slow-delay),
+как у чата с долгой очисткой истории.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('STATE_DB', ':memory:')
+
+from telegram import Update
+from telegram.ext import TypeHandler
+
+import bot
+from fake_telegram import FakeTelegram, conversation
+from update_processor import PerUserUpdateProcessor
+
+TOKEN = '123456:TEST'
+UPDATES_PER_USER = 6
+
+
+def schedule(args, first_user):
+    """(время поступления, обновление) для всех пользователей по возрастанию времени"""
+    rng = random.Random(args.seed)
+    arrivals = []
+    for user in range(args.users):
+        start = rng.uniform(0, args.window)
+        updates = conversation(first_user + user, 1 + user * UPDATES_PER_USER)
+        arrivals.extend((start + step * args.think, update) for step, update in enumerate(updates))
+    arrivals.sort(key=lambda item: item[0])
+    return arrivals
+
+
+async def run_mode(args, name, concurrency, first_user):
+    slow_user = first_user
+    fake = FakeTelegram(TOKEN, args.latency, slow_chats={slow_user: args.slow_delay})
+    base_url = await fake.start()
+    fake.expected_results = args.users
+    processor = PerUserUpdateProcessor(concurrency)
+    application = bot.build_application(TOKEN, base_url=base_url, processor=processor)
+
+    received = {}
+    latencies = []
+    slow_latencies = []
+    order = {}
+
+    async def finished(update, context):
+        latency = time.perf_counter() - received[update.update_id]
+        (slow_latencies if update.effective_user.id == slow_user else latencies).append(latency)
+        order.setdefault(update.effective_user.id, []).append(update.update_id)
+
+    # Группа 1 выполняется после обработчиков диалога для того же обновления
+    application.add_handler(TypeHandler(Update, finished), group=1)
+    await application.initialize()
+    await application.post_init(application)
+    await application.start()
+
+    arrivals = schedule(args, first_user)
+    started = time.perf_counter()
+    for at, data in arrivals:
+        delay = started + at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        update = Update.de_json(data, application.bot)
+        received[update.update_id] = time.perf_counter()
+        await application.update_queue.put(update)
+    last_arrival = time.perf_counter()
+    await asyncio.wait_for(fake.results_done.wait(), args.deadline)
+    elapsed = time.perf_counter() - started
+    drain = time.perf_counter() - last_arrival
+
+    await application.stop()
+    await application.shutdown()
+    await fake.stop()
+
+    in_order = all(ids == sorted(ids) for ids in order.values())
+    latencies.sort()
+    print(f"{name} (одновременно {concurrency}): {elapsed:.1f} с, {len(arrivals) / elapsed:.0f} обновлений/с, "
+          f"досчет после последнего обновления {drain:.1f} с; задержка остальных пользователей "
+          f"p50 {statistics.median(latencies) * 1000:.0f} мс, p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.0f} мс, "
+          f"max {latencies[-1] * 1000:.0f} мс, медленного - max {max(slow_latencies) * 1000:.0f} мс; "
+          f"результатов {fake.results}/{args.users}, порядок внутри пользователя {'сохранен' if in_order else 'НАРУШЕН'}, "
+          f"очередь одного пользователя до {processor.max_user_queue}")
+
+
+async def run(args):
+    bot.load_prices()
+    modes = {'sequential': 1, 'concurrent': args.concurrency}
+    # Разные пользователи в режимах: состояние бота после первого прогона не влияет на второй
+    for i, name in enumerate(args.modes.split(',')):
+        await run_mode(args, name, modes[name], 100000 * (i + 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.02, help='задержка ответа Bot API (с)')
+    parser.add_argument('--slow-delay', type=float, default=1.0, help='доп. задержка вызовов медленного пользователя (с)')
+    parser.add_argument('--window', type=float, default=30.0, help='за сколько секунд приходят все пользователи')
+    parser.add_argument('--think', type=float, default=1.0, help='пауза пользователя между сообщениями (с)')
+    parser.add_argument('--concurrency', type=int, default=bot.CONCURRENT_UPDATES)
+    parser.add_argument('--modes', default='sequential,concurrent')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--deadline', type=float, default=1800.0)
+    args = parser.parse_args()
+
+    # bot настраивает логирование на INFO при импорте: в тесте оставляем только предупреждения
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Скорость извлечения цены из страниц поиска разными способами
+
+Запуск: python benchmarks/bench_extractors.py [--pages DIR]
+DIR - каталог с сохраненными страницами поиска (*.html). Без него
+генерируется корпус из страниц четырех видов: с JSON-LD, с data-price,
+только с разметкой цены и без результатов. Для каждого способа выводятся
+страницы в секунду и число расхождений с исходным разбором BeautifulSoup.
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import extractors
+
+FILLER_LINKS = 400
+CARDS = 30
+
+
+def filler(rng):
+    """Меню, ссылки и скрипты, которыми обвешана настоящая страница"""
+    links = ''.join(
+        f'<li class="menu-item"><a href="/catalogue/{rng.randrange(10 ** 6)}/">Раздел {i}</a></li>'
+        for i in range(FILLER_LINKS)
+    )
+    script = 'window.__STATE__ = ' + json.dumps({'k': [rng.random() for _ in range(500)]}) + ';'
+    return f'<nav><ul>{links}</ul></nav><script>{script}</script>'
+
+
+def card(article, price, kind):
+    data_price = f' data-price="{price}.00"' if kind == 'data-price' else ''
+    price_text = f'{price:,}'.replace(',', ' ')
+    return (
+        f'<div class="product-card"{data_price} data-sku="{article}">'
+        f'<a class="product-title" href="/product/{article}/">Ступень {article}</a>'
+        f'<div class="product-price"><span class="price">{price_text} ₽</span></div></div>'
+    )
+
+
+def make_page(kind, rng):
+    """Страница поиска вида jsonld, data-price, dom или empty и ожидаемая цена"""
+    products = [] if kind == 'empty' else [
+        (str(15000000 + rng.randrange(10 ** 6)), rng.randrange(100, 50000)) for _ in range(CARDS)
+    ]
+    head = ''
+    if kind == 'jsonld':
+        ld = {
+            '@context': 'https://schema.org',
+            '@type': 'ItemList',
+            'itemListElement': [
+                {'@type': 'ListItem', 'position': i + 1,
+                 'item': {'@type': 'Product', 'sku': article,
+                          'offers': {'@type': 'Offer', 'price': f'{price}.00', 'priceCurrency': 'RUB'}}}
+                for i, (article, price) in enumerate(products)
+            ]
+        }
+        head = f'<script type="application/ld+json">{json.dumps(ld)}</script>'
+    cards = ''.join(card(article, price, kind) for article, price in products) or '<p>Ничего не найдено</p>'
+    html = (
+        f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>Поиск</title>{head}</head><body>'
+        f'<header>{filler(rng)}</header><main class="search-results">{cards}</main>'
+        f'<footer>{filler(rng)}</footer></body></html>'
+    )
+    return html, products[0][1] if products else None
+
+
+def make_corpus(per_kind, seed=1):
+    rng = random.Random(seed)
+    return [make_page(kind, rng)[0] for kind in ('jsonld', 'data-price', 'dom', 'empty') for _ in range(per_kind)]
+
+
+def load_corpus(directory):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.html'))):
+        with open(path, encoding='utf-8', errors='replace') as f:
+            pages.append(f.read())
+    return pages
+
+
+def measure(name, extract, pages, reference):
+    started = time.perf_counter()
+    results = [extract(page) for page in pages]
+    elapsed = time.perf_counter() - started
+    found = sum(result is not None for result in results)
+    mismatches = sum(result is not None and result != expected for result, expected in zip(results, reference))
+    print(f'{name:>12}: {len(pages) / elapsed:8.1f} стр/с, найдено {found}/{len(pages)}, '
+          f'расхождений с soup {mismatches}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', help='каталог с сохраненными страницами *.html')
+    parser.add_argument('--per-kind', type=int, default=25, help='страниц каждого вида в корпусе')
+    args = parser.parse_args()
+
+    pages = load_corpus(args.pages) if args.pages else make_corpus(args.per_kind)
+    size = sum(len(page.encode('utf-8')) for page in pages) / len(pages)
+    print(f'Страниц: {len(pages)}, средний размер {size / 1024:.0f} КБ')
+
+    reference = [extractors.extract_soup(page) for page in pages]
+    measure('soup', extractors.extract_soup, pages, reference)
+    if extractors.lxml_html is not None:
+        measure('lxml', extractors.extract_lxml, pages, reference)
+    measure('jsonld', extractors.extract_jsonld, pages, reference)
+    measure('data-price', extractors.extract_data_price, pages, reference)
+    measure('цепочка', extractors.extract_price, pages, reference)
+    without_lxml = extractors.EXTRACTORS[:-1] + [('soup', extractors.extract_soup)]
+    measure('без lxml', lambda page: extractors.extract_price(page, without_lxml), pages, reference)
+
+
+if __name__ == '__main__':
+    main()
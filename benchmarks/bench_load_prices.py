@@ -0,0 +1,117 @@
+"""Сравнение загрузчиков прайса: старый (sheet.cell) и потоковый (read_only)
+
+Запуск: python benchmarks/bench_load_prices.py [--rows 100000]
+Каждый загрузчик работает в отдельном процессе, чтобы честно измерить пиковый RSS.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from openpyxl import Workbook, load_workbook
+
+from catalog import normalize_article, read_prices
+
+
+def legacy_read_prices(path):
+    """Загрузчик прайса в том виде, в котором он был до потокового чтения"""
+    wb = load_workbook(path, data_only=True)
+    sheet = wb.active
+    prices = []
+    for row_num in range(4, sheet.max_row + 1):
+        article = sheet.cell(row=row_num, column=1).value
+        name = sheet.cell(row=row_num, column=2).value
+        stair_type = sheet.cell(row=row_num, column=3).value
+        sizes = sheet.cell(row=row_num, column=4).value
+        unit = sheet.cell(row=row_num, column=5).value
+        price = sheet.cell(row=row_num, column=6).value
+        if article and name and price:
+            prices.append({
+                'article': normalize_article(article),
+                'name': str(name),
+                'stair_type': str(stair_type) if stair_type else '',
+                'sizes': str(sizes) if sizes else '',
+                'unit': str(unit) if unit else 'шт.',
+                'price': float(price) if price else 0
+            })
+    return prices
+
+
+LOADERS = {
+    'legacy': legacy_read_prices,
+    'streaming': read_prices,
+}
+
+
+def make_workbook(path, rows):
+    """Синтетический прайс в формате data.xlsx"""
+    wb = Workbook(write_only=True)
+    sheet = wb.create_sheet()
+    sheet.append([])
+    sheet.append([])
+    sheet.append(['Артикул', 'Наименование', 'вид лестницы', 'размеры', 'единица измерения', 'Продажная цена магазина'])
+    for i in range(rows):
+        stair_type = 'деревянная' if i % 2 else 'металлическая'
+        sheet.append([
+            10000000 + i,
+            f'Ступень прямая {900 + (i % 3) * 100}x300 арт{i}',
+            stair_type,
+            f'{900 + (i % 3) * 100}x300x40' if i % 4 else None,
+            'штука',
+            1000 + i % 5000,
+        ])
+    wb.save(path)
+
+
+def run_loader(name, path):
+    """Замер одного загрузчика в текущем процессе"""
+    started = time.perf_counter()
+    items = LOADERS[name](path)
+    elapsed = time.perf_counter() - started
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({'loader': name, 'items': len(items), 'seconds': elapsed, 'peak_rss_mb': peak_kb / 1024}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--run', choices=sorted(LOADERS), help=argparse.SUPPRESS)
+    parser.add_argument('--path', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_loader(args.run, args.path)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'data.xlsx')
+        started = time.perf_counter()
+        make_workbook(path, args.rows)
+        print(f'Сгенерирован прайс на {args.rows} строк за {time.perf_counter() - started:.1f} с')
+
+        results = {}
+        for name in ('legacy', 'streaming'):
+            output = subprocess.run(
+                [sys.executable, __file__, '--run', name, '--path', path],
+                check=True, capture_output=True, text=True
+            ).stdout
+            results[name] = json.loads(output.strip().splitlines()[-1])
+            r = results[name]
+            print(f"{name:10} {r['items']:>8} позиций  {r['seconds']:7.2f} с  пик RSS {r['peak_rss_mb']:7.1f} МБ")
+
+        legacy, streaming = results['legacy'], results['streaming']
+        print(
+            f"Ускорение: x{legacy['seconds'] / streaming['seconds']:.2f}, "
+            f"память: x{legacy['peak_rss_mb'] / streaming['peak_rss_mb']:.2f} меньше"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Кэш страниц с условными запросами против полной загрузки
+
+Запуск: python benchmarks/bench_page_cache.py [--articles 1000 --changed 0.05]
+Три прохода по одним и тем же артикулам: без кэша, с истекшим TTL (условные
+запросы, 304 для неизмененных страниц) и со свежим TTL (запросов нет).
+Страница заглушки маленькая, настоящая страница поиска весит сотни КБ.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from page_cache import PageCache
+from scraper import AsyncPriceScraper
+from stub_site import StubSite, article_price
+
+
+async def refresh(url, articles, cache):
+    scraper = AsyncPriceScraper(search_url=url, concurrency=16, rate=1000.0, burst=16,
+                                report_interval=60.0, cache=cache)
+    started = time.perf_counter()
+    prices = await scraper.fetch_prices(articles)
+    return prices, time.perf_counter() - started
+
+
+async def run(args):
+    site = StubSite(latency=args.latency)
+    url = await site.start()
+    articles = [str(15000000 + i) for i in range(args.articles)]
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, 'cache.json')
+        try:
+            _, elapsed = await refresh(url, articles, None)
+            print(f'Без кэша: {elapsed:.2f} с, отдано {site.bytes_sent / 1024:.0f} КБ')
+
+            await refresh(url, articles, PageCache(cache_path))
+            changed = articles[::max(1, int(1 / args.changed))] if args.changed else []
+            for article in changed:
+                site.generations[article] = 1
+
+            site.bytes_sent = 0
+            cache = PageCache(cache_path, ttl=0)
+            prices, elapsed = await refresh(url, articles, cache)
+            wrong = [a for a in articles if prices[a] != article_price(a, site.generations.get(a, 0))]
+            print(f'TTL истек: {elapsed:.2f} с, отдано {site.bytes_sent / 1024:.0f} КБ, '
+                  f'304: {site.not_modified}, изменилось {len(changed)}, неверных цен {len(wrong)}')
+            print(f'  {cache.stats.as_dict()}')
+
+            site.requests = 0
+            cache = PageCache(cache_path)
+            _, elapsed = await refresh(url, articles, cache)
+            print(f'TTL свежий: {elapsed:.2f} с, запросов {site.requests}')
+        finally:
+            await site.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--articles', type=int, default=1000)
+    parser.add_argument('--changed', type=float, default=0.05, help='доля артикулов с новой ценой')
+    parser.add_argument('--latency', type=float, default=0.02)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(message)s')
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Разбор страниц в цикле событий против конвейера с пулом процессов
+
+Запуск: python benchmarks/bench_parse_pipeline.py [--articles 1000 --pages DIR --no-lxml]
+Заглушка сайта отдает записанные страницы (из DIR или корпус из
+bench_extractors), сборщик обходит их без разбора в цикле событий и с
+разбором в пуле процессов. Цены сверяются с разбором каждой страницы.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import extractors
+from bench_extractors import load_corpus, make_corpus
+from scraper import AsyncPriceScraper
+from stub_site import StubSite
+
+
+async def scrape(url, articles, parse_processes, concurrency):
+    scraper = AsyncPriceScraper(search_url=url, concurrency=concurrency, rate=10000.0, burst=concurrency,
+                                report_interval=60.0, parse_processes=parse_processes)
+    started = time.perf_counter()
+    prices = await scraper.fetch_prices(articles)
+    return prices, time.perf_counter() - started
+
+
+async def run(args, pages):
+    site = StubSite(latency=args.latency, pages=pages)
+    url = await site.start()
+    articles = [str(15000000 + i) for i in range(args.articles)]
+    expected = {article: extractors.extract_price(pages[int(article) % len(pages)]) for article in articles}
+    try:
+        modes = [('в цикле событий', 0), (f'пул из {args.processes} процессов', args.processes)]
+        for name, processes in modes:
+            prices, elapsed = await scrape(url, articles, processes, args.concurrency)
+            wrong = sum(prices[article] != expected[article] for article in articles)
+            print(f'{name:>22}: {elapsed:.2f} с, {len(articles) / elapsed:.0f} стр/с, неверных цен {wrong}')
+    finally:
+        await site.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--articles', type=int, default=1000)
+    parser.add_argument('--pages', help='каталог с сохраненными страницами *.html')
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--no-lxml', action='store_true', help='разбирать страницы через BeautifulSoup')
+    args = parser.parse_args()
+
+    if args.no_lxml:
+        # Процессы пула создаются позже и наследуют замену через fork
+        extractors.EXTRACTORS[-1] = ('soup', extractors.extract_soup)
+    pages = load_corpus(args.pages) if args.pages else make_corpus(10)
+    print(f'CPU: {os.cpu_count()}, страниц в корпусе: {len(pages)}, извлекатели: '
+          f'{", ".join(name for name, _ in extractors.EXTRACTORS)}')
+
+    logging.basicConfig(level=logging.WARNING, format='%(message)s')
+    asyncio.run(run(args, pages))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Таблица готовых расчетов: время построения, память и скорость ответа
+
+Запуск: python benchmarks/bench_quote_table.py [--check-step 1]
+Строит таблицу для всех типов, конфигураций, ширин и целых высот
+1000-5000 мм, сверяет ее с калькуляторами и сравнивает время ответа по
+таблице с расчетом калькулятором и с кэшем calculate_stairs.
+"""
+import argparse
+import asyncio
+import copy
+import logging
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Таблицу строит сам тест, а не фоновый поток бота
+os.environ['PRECOMPUTE_QUOTES'] = '0'
+
+import bot
+from quote_table import QuoteTable
+from ui import CONFIGS, MAX_HEIGHT, MIN_HEIGHT, STAIR_TYPES, STEP_WIDTHS
+
+
+def random_specs(count, seed):
+    rnd = random.Random(seed)
+    return [
+        (stair_type, rnd.choice(CONFIGS), material_type, float(rnd.randint(MIN_HEIGHT, MAX_HEIGHT)), rnd.choice(STEP_WIDTHS))
+        for stair_type, material_type in (rnd.choice(list(STAIR_TYPES.items())) for _ in range(count))
+    ]
+
+
+def per_call(func, calls):
+    started = time.perf_counter()
+    for args in calls:
+        func(*args)
+    return (time.perf_counter() - started) / len(calls) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--check-step', type=int, default=1, help='шаг высоты при сверке с калькуляторами')
+    parser.add_argument('--lookups', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    bot.load_prices()
+    catalog = bot.price_catalog
+
+    table = QuoteTable.build(bot.run_calculator, catalog)
+    # Память считаем по копии таблицы: построение под tracemalloc идет в разы дольше
+    tracemalloc.start()
+    table_copy = copy.deepcopy(table)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del table_copy
+
+    # Для сравнения: те же расчеты отдельными результатами калькулятора (по выборке)
+    sample = random_specs(2000, args.seed)
+    tracemalloc.start()
+    results = [bot.run_calculator(*spec, catalog) for spec in sample]
+    dicts_memory = tracemalloc.get_traced_memory()[0] / len(results) * len(table)
+    tracemalloc.stop()
+    del results
+    print(f'Построение: {len(table)} расчетов за {table.build_time:.2f} с; '
+          f'массивы {table.nbytes() / 1024:.0f} КБ, всего с объектами {memory / 1024:.0f} КБ '
+          f'(отдельными результатами было бы ~{dicts_memory / 1024 / 1024:.0f} МБ)')
+
+    checked = 0
+    for stair_type, material_type in STAIR_TYPES.items():
+        for config in CONFIGS:
+            for step_width in STEP_WIDTHS:
+                for height in range(MIN_HEIGHT, MAX_HEIGHT + 1, args.check_step):
+                    expected = bot.run_calculator(stair_type, config, material_type, float(height), step_width, catalog)
+                    quote = table.get(stair_type, config, material_type, float(height), step_width)
+                    assert repr(quote) == repr(expected), (stair_type, config, step_width, height)
+                    checked += 1
+    print(f'Сверено {checked} расчетов: таблица совпадает с калькуляторами')
+
+    calls = random_specs(args.lookups, args.seed)
+    calculator = per_call(lambda *a: bot.run_calculator(*a, catalog), calls)
+    bot.quote_table = None
+    per_call(bot.calculate_stairs, calls)
+    cached = per_call(bot.calculate_stairs, calls)
+    lookup = per_call(table.get, calls)
+
+    async def pooled():
+        # Без таблицы select_step_size отправляет расчет в пул потоков
+        started = time.perf_counter()
+        for i, args in enumerate(calls[:2000]):
+            await bot.calculation_service.run(i, bot.run_calculator, *args, catalog)
+        return (time.perf_counter() - started) / 2000 * 1e6
+
+    pool = asyncio.run(pooled())
+    bot.calculation_service.shutdown()
+    print(f'Ответ на расчет: калькулятор {calculator:.1f} мкс, кэш calculate_stairs {cached:.1f} мкс '
+          f'(размер кэша {bot.CALCULATION_CACHE_SIZE}, попаданий {bot.calculation_cache.stats()["hits"]}), '
+          f'калькулятор через пул расчетов {pool:.1f} мкс, таблица {lookup:.1f} мкс')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""Результаты расчета: StairQuote со __slots__ против словарей, шаблоны против конкатенации
+
+Запуск: python benchmarks/bench_results.py [--quotes 20000]
+Сравнивает память одного результата (StairQuote против прежнего словаря
+из to_dict()), время и пик выделенной памяти на ответ от калькулятора
+до текста: калькулятор + render_quote против калькулятора, словаря и
+прежней сборки текста конкатенацией. Прежний путь получает словарь через
+to_dict(), поэтому включает и создание StairQuote - его оценка сверху.
+Проверяет, что тексты совпадают.
+"""
+import argparse
+import gc
+import logging
+import os
+import random
+import sys
+import time
+import tracemalloc
+from dataclasses import fields
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ['PRECOMPUTE_QUOTES'] = '0'
+
+import bot
+from ui import CONFIGS, MAX_HEIGHT, MIN_HEIGHT, STAIR_TYPES, STEP_WIDTHS
+from render import CONFIG_NAMES, TYPE_NAMES, render_quote
+from results import MaterialLine, StairQuote
+
+
+def legacy_render(result):
+    """Прежняя сборка текста в select_step_size: f-строки и += по словарю результата"""
+    result_text = (
+        f"📊 *РЕЗУЛЬТАТ РАСЧЕТА*\n\n"
+        f"🏷 *Тип:* {TYPE_NAMES[result['type']]}\n"
+        f"📐 *Конфигурация:* {CONFIG_NAMES[result['config']]}\n"
+        f"📏 *Высота:* {result['height']:,} мм\n"
+        f"📐 *Ширина ступени:* {result['step_width']} мм\n"
+        f"🪜 *Количество ступеней:* {result['steps_count']}\n"
+        f"📏 *Высота ступени:* {result['step_height']:.1f} мм\n"
+    )
+    if result['type'] == 'wood':
+        result_text += f"📏 *Длина тетивы:* {result['stringer_length']:.0f} мм\n"
+        result_text += f"🔢 *Количество тетив:* {result['stringer_qty']} шт\n"
+    if result['platforms_count'] > 0:
+        result_text += f"🟦 *Количество площадок:* {result['platforms_count']}\n"
+    result_text += f"\n📦 *МАТЕРИАЛЫ:*\n"
+    for material in result['materials']:
+        result_text += f"• {material['name']}: {material['qty']} {material['unit']} × {material['price']:,.0f} ₽ = {material['total']:,.0f} ₽\n"
+    result_text += f"\n💰 *ОБЩАЯ СТОИМОСТЬ:* {result['total_cost']:,.0f} ₽\n\n"
+    result_text += "_*Примечание:* Стоимость указана без учета доставки и монтажа_\n"
+    return result_text
+
+
+def random_specs(count, seed):
+    rnd = random.Random(seed)
+    return [
+        (stair_type, rnd.choice(CONFIGS), material_type, float(rnd.randint(MIN_HEIGHT, MAX_HEIGHT)), rnd.choice(STEP_WIDTHS))
+        for stair_type, material_type in (rnd.choice(list(STAIR_TYPES.items())) for _ in range(count))
+    ]
+
+
+def copy_quote(quote):
+    """Новый StairQuote с новыми строками материалов"""
+    values = {field.name: getattr(quote, field.name) for field in fields(StairQuote)}
+    values['materials'] = [MaterialLine(m.name, m.qty, m.unit, m.price, m.total) for m in quote.materials]
+    return StairQuote(**values)
+
+
+def memory_per_item(make, count):
+    """Байт на объект, созданный make(i), по tracemalloc"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    items = [make(i) for i in range(count)]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del items
+    return used / count
+
+
+def peak_per_call(func, calls):
+    """Средний пик выделенной памяти (байт) за один вызов"""
+    gc.disable()
+    tracemalloc.start()
+    total = 0
+    for args in calls:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        func(*args)
+        total += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    gc.enable()
+    return total / len(calls)
+
+
+def per_call(func, calls):
+    gc.disable()
+    started = time.perf_counter()
+    for args in calls:
+        func(*args)
+    elapsed = time.perf_counter() - started
+    gc.enable()
+    return elapsed / len(calls) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--quotes', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    bot.load_prices()
+    catalog = bot.price_catalog
+    calls = random_specs(args.quotes, args.seed)
+    quotes = [bot.run_calculator(*spec, catalog) for spec in calls]
+
+    mismatched = sum(render_quote(quote) != legacy_render(quote.to_dict()) for quote in quotes)
+    assert mismatched == 0, f'{mismatched} текстов отличаются'
+    print(f'Сверено {len(quotes)} ответов: текст совпадает с прежней сборкой')
+
+    count = min(len(quotes), 5000)
+    # Оба варианта собираются из готового результата: списки тетив общие, считаются только сами объекты
+    quote_bytes = memory_per_item(lambda i: copy_quote(quotes[i]), count)
+    dict_bytes = memory_per_item(lambda i: quotes[i].to_dict(), count)
+    print(f'Память результата: StairQuote {quote_bytes:.0f} Б, словарь {dict_bytes:.0f} Б '
+          f'({(1 - quote_bytes / dict_bytes) * 100:.0f}% меньше)')
+
+    rendered = [(quote,) for quote in quotes]
+    dicts = [(quote.to_dict(),) for quote in quotes]
+    render_new = per_call(render_quote, rendered)
+    render_old = per_call(legacy_render, dicts)
+    print(f'Текст ответа: шаблоны {render_new:.2f} мкс, конкатенация {render_old:.2f} мкс '
+          f'({render_old / render_new:.2f}x)')
+
+    def new_path(*spec):
+        return render_quote(bot.run_calculator(*spec, catalog))
+
+    def old_path(*spec):
+        # Калькулятор + словарь результата + прежняя сборка текста
+        return legacy_render(bot.run_calculator(*spec, catalog).to_dict())
+
+    for name, func in (('StairQuote + шаблоны', new_path), ('словарь + конкатенация', old_path)):
+        # Прогрев кэша раскроя тетив, чтобы оба пути считали одинаково
+        per_call(func, calls)
+        elapsed = per_call(func, calls)
+        peak = peak_per_call(func, calls[:2000])
+        print(f'{name:24} {elapsed:7.2f} мкс на ответ, пик памяти {peak:6.0f} Б на ответ')
+
+
+if __name__ == '__main__':
+    main()
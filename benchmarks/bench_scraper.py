@@ -0,0 +1,59 @@
+"""Параллельный сборщик цен против локальной заглушки сайта
+
+Запуск: python benchmarks/bench_scraper.py [--articles 2000 --concurrency 16 --rate 200]
+Проверяет, что все цены собраны верно несмотря на ответы 429/503, и
+сравнивает время с последовательным обходом (1 с паузы на артикул).
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from scraper import AsyncPriceScraper
+from stub_site import StubSite, article_price
+
+
+async def run(args):
+    site = StubSite(latency=args.latency, error_rate=args.error_rate)
+    url = await site.start()
+    try:
+        articles = [str(15000000 + i) for i in range(args.articles)]
+        scraper = AsyncPriceScraper(
+            search_url=url, concurrency=args.concurrency, rate=args.rate,
+            burst=args.concurrency, backoff=0.05, report_interval=2.0
+        )
+        started = time.perf_counter()
+        prices = await scraper.fetch_prices(articles)
+        elapsed = time.perf_counter() - started
+    finally:
+        await site.stop()
+
+    wrong = [article for article in articles if prices.get(article) != article_price(article)]
+    stats = scraper.progress.snapshot()
+    print(f'Артикулов: {len(articles)}, запросов к заглушке: {site.requests}, ошибок сервера: {site.errors}, '
+          f'повторов: {stats["retries"]}, неверных цен: {len(wrong)}')
+    sequential = len(articles) * (1 + args.latency)
+    print(f'Параллельно: {elapsed:.2f} с ({len(articles) / elapsed:.0f} стр/с), '
+          f'последовательно с паузой 1 с: ~{sequential:.0f} с')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--articles', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--rate', type=float, default=200.0, help='запросов в секунду на хост')
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0.05)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
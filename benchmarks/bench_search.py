@@ -0,0 +1,84 @@
+"""Задержка поиска материалов на синтетическом прайсе
+
+Запуск: python benchmarks/bench_search.py [--items 50000]
+Сравнивает ранжированный поиск по индексу с прежним перебором подстрок.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from catalog import PriceCatalog
+
+PARTS = [
+    ('Тетива', '{}x300x60', (3000, 4000)),
+    ('СТУПЕНЬ ПРЯМАЯ', '{}*300*40', (900, 1000, 1200)),
+    ('Подступенок', '{}*200*18', (900, 1000, 1200)),
+    ('Поручень', '{}*60*40', (3000, 2000)),
+    ('Балясина', '50*50*{}', (900, 1000)),
+    ('Столб', '90*90*{}', (1178, 1500)),
+    ('Площадка', '{0}x{0}', (1000, 1200)),
+    ('Опора под поручень', '{}мм', (800, 900)),
+    ('Промежуточный элемент сталь', '', (0,)),
+]
+SERIES = ['Хюгге', 'Классик', 'Сосна', 'Бук', 'Дуб', 'Лиственница', 'Модерн', 'Лофт']
+QUERIES = ['тетива 4000', 'ступ 1200', 'стпень', 'поручень', 'балясна хюгге', '1576', 'дуб 900', 'лиственица', 'элемент', 'x300']
+
+
+def make_items(count, seed=1):
+    """Синтетические позиции прайса"""
+    rnd = random.Random(seed)
+    items = []
+    for i in range(count):
+        name, sizes, lengths = rnd.choice(PARTS)
+        length = rnd.choice(lengths)
+        items.append({
+            'article': str(15000000 + i),
+            'name': f'{name} {rnd.choice(SERIES)} {length}мм' if length else f'{name} ЛЭ-{i % 100:02d}',
+            'stair_type': rnd.choice(['деревянная', 'металлическая']),
+            'sizes': sizes.format(length),
+            'unit': 'штука',
+            'price': float(rnd.randrange(300, 15000)),
+        })
+    return items
+
+
+def legacy_search(items, search_term):
+    """Прежний поиск бота: перебор всех позиций с проверкой подстроки в артикуле и названии"""
+    term = search_term.lower().strip()
+    return [item for item in items if term in item['article'].lower() or term in item['name'].lower()]
+
+
+def measure(func, repeat):
+    """Среднее время вызова, мкс"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    items = make_items(args.items)
+    started = time.perf_counter()
+    catalog = PriceCatalog(items)
+    print(f'Каталог на {args.items} позиций построен за {time.perf_counter() - started:.2f} с')
+    print(f"{'запрос':16} {'найдено':>8} {'индекс, мкс':>12} {'перебор, мкс':>13}")
+
+    for query in QUERIES:
+        results, total = catalog.search_ranked(query, 10)
+        ranked = measure(lambda: catalog.search_ranked(query, 10), args.repeat)
+        linear = measure(lambda: legacy_search(items, query), max(1, args.repeat // 4))
+        print(f'{query:16} {total:>8} {ranked:>12.0f} {linear:>13.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""Память и скорость хранилища состояния при большом числе пользователей
+
+Запуск: python benchmarks/bench_state_store.py [--users 1000000 --dialogs 3000 --limit 1000]
+Каждый пользователь проходит шаги диалога (сессия + два сообщения в
+истории чата). Сравниваются старые глобальные словари, бэкенд в памяти
+с лимитом записей и SQLite. Каждый вариант работает в отдельном процессе,
+чтобы честно измерить пиковый RSS.
+
+Режимы dialogs-memory и dialogs-sqlite гоняют настоящий бот (Application
+с ConversationHandler и StatePersistence, Bot API - заглушка
+fake_telegram.py): каждый из --dialogs пользователей начинает расчет и
+бросает его на выборе конфигурации. Бэкенд в памяти ограничен --limit
+записями, в SQLite после каждой порции брошенные диалоги удаляются по
+сроку (purge). На контрольных точках выводятся размер словаря состояний
+ConversationHandler, индекса диалогов StatePersistence, число записей
+бэкенда и текущий RSS: все они должны перестать расти.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from state import ChatHistory, MemoryBackend, SQLiteBackend, StateStore, UserSession
+
+MODES = ('dicts', 'memory', 'sqlite', 'dialogs-memory', 'dialogs-sqlite')
+TOKEN = '123456:TEST'
+# /start, кнопка расчета и тип лестницы: дальше пользователь не отвечает
+ABANDON_STEPS = 3
+CHECKPOINTS = 5
+# Пользователей между записями накопленных изменений SQLite (в боте - раз в FLUSH_INTERVAL)
+FLUSH_EVERY = 1000
+
+
+def run_dicts(users):
+    """Глобальные словари в том виде, в котором они были в bot.py"""
+    user_data = {}
+    messages_to_delete = {}
+    for user_id in range(users):
+        user_data[user_id] = {'type': 'wood', 'material_type': 'деревянная'}
+        user_data[user_id]['config'] = 'straight'
+        user_data[user_id]['height'] = 3000.0
+        for message_id in (1, 2):
+            messages_to_delete.setdefault(user_id, []).append(message_id)
+    return len(user_data)
+
+
+def run_store(backend, users):
+    sessions = StateStore(backend, 'user', UserSession)
+    chats = StateStore(backend, 'chat', ChatHistory)
+    for user_id in range(users):
+        sessions.put(user_id, UserSession(stair_type='wood', material_type='деревянная'))
+        session = sessions.get(user_id)
+        session.config = 'straight'
+        session.height = 3000.0
+        sessions.put(user_id, session)
+        for message_id in (1, 2):
+            history = chats.get(user_id) or ChatHistory()
+            history.message_ids.append(message_id)
+            chats.put(user_id, history)
+        if user_id % FLUSH_EVERY == FLUSH_EVERY - 1:
+            backend.flush()
+    backend.flush()
+    return backend.stats()['entries']
+
+
+def current_rss_mb():
+    """Текущий (а не пиковый) RSS процесса по /proc (Linux)"""
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 1024 / 1024
+
+
+async def abandon_dialogs(mode, dialogs, limit, path):
+    """Брошенные на середине диалоги через настоящий бот; строка JSON на контрольную точку"""
+    # bot создает бэкенд состояния при импорте
+    os.environ['STATE_DB'] = path if mode == 'dialogs-sqlite' else ':memory:'
+    os.environ['PRECOMPUTE_QUOTES'] = '0'
+    import logging
+    from telegram import Update
+    import bot
+    from fake_telegram import FakeTelegram, conversation
+
+    logging.disable(logging.INFO)
+    bot.load_prices()
+    backend = bot.state_backend
+    if mode == 'dialogs-memory':
+        backend.max_entries = limit
+    fake = FakeTelegram(TOKEN)
+    base_url = await fake.start()
+    application = bot.build_application(TOKEN, base_url=base_url)
+    await application.initialize()
+    await application.start()
+    conv_handler = application.handlers[0][0]
+    persistence = application.persistence
+
+    started = time.perf_counter()
+    portion = max(1, dialogs // CHECKPOINTS)
+    for user in range(dialogs):
+        for update in conversation(10 ** 6 + user, 1 + user * 6)[:ABANDON_STEPS]:
+            await application.process_update(Update.de_json(update, application.bot))
+        if (user + 1) % portion == 0:
+            # Запись состояний диалогов, как раз в update_interval
+            await application.update_persistence()
+            if mode == 'dialogs-sqlite':
+                # Срок жизни много меньше прогона: все брошенные диалоги устарели
+                backend.purge(time.time())
+            await asyncio.sleep(0)
+            gc.collect()
+            print(json.dumps({
+                'mode': mode, 'users': user + 1, 'conversations': len(conv_handler._conversations),
+                'index': len(persistence._user_conversations), 'entries': backend.stats()['entries'],
+                'rss_mb': current_rss_mb(), 'seconds': time.perf_counter() - started
+            }), flush=True)
+    await application.stop()
+    await application.shutdown()
+    await fake.stop()
+
+
+def run_mode(mode, users, path, dialogs=0, limit=0):
+    if mode.startswith('dialogs-'):
+        asyncio.run(abandon_dialogs(mode, dialogs, limit, path))
+        return
+    started = time.perf_counter()
+    if mode == 'dicts':
+        entries = run_dicts(users)
+    elif mode == 'memory':
+        entries = run_store(MemoryBackend(), users)
+    else:
+        entries = run_store(SQLiteBackend(path), users)
+    elapsed = time.perf_counter() - started
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({'mode': mode, 'entries': entries, 'seconds': elapsed, 'peak_rss_mb': peak_kb / 1024}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--modes', default=','.join(MODES), help=','.join(MODES))
+    parser.add_argument('--dialogs', type=int, default=3000, help='брошенных диалогов в режимах dialogs-*')
+    parser.add_argument('--limit', type=int, default=1000, help='лимит записей бэкенда в памяти для dialogs-memory')
+    parser.add_argument('--run', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--path', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_mode(args.run, args.users, args.path, args.dialogs, args.limit)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in args.modes.split(','):
+            output = subprocess.run(
+                [sys.executable, __file__, '--run', mode, '--users', str(args.users),
+                 '--dialogs', str(args.dialogs), '--limit', str(args.limit),
+                 '--path', os.path.join(tmp, f'{mode}.sqlite3')],
+                check=True, capture_output=True, text=True, cwd=ROOT
+            ).stdout
+            if mode.startswith('dialogs-'):
+                for line in output.strip().splitlines():
+                    if not line.startswith('{'):
+                        continue
+                    r = json.loads(line)
+                    print(f"{mode:14} брошено {r['users']:>7}: состояний в ConversationHandler {r['conversations']:>6}, "
+                          f"в индексе {r['index']:>6}, записей бэкенда {r['entries']:>6}, "
+                          f"RSS {r['rss_mb']:6.1f} МБ ({r['seconds']:.0f} с)")
+                continue
+            r = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:7} записей {r['entries']:>8}  {r['seconds']:7.2f} с  "
+                  f"{args.users / r['seconds']:>8.0f} польз/с  пик RSS {r['peak_rss_mb']:7.1f} МБ")
+
+
+if __name__ == '__main__':
+    main()
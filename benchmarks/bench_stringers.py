@@ -0,0 +1,170 @@
+"""Раскрой тетив: перебор по доскам прайса против прежней эвристики
+
+Запуск: python benchmarks/bench_stringers.py [--step 10]
+Для деревянных лестниц всех конфигураций и высот 1000-5000 мм сравнивает
+стоимость досок для тетив с прежним optimize_stringers ("все по 4000" или
+"4000 + 3000" для половины общей длины, умноженные на 2) и измеряет время
+раскроя без кэша. Перебор находит самый дешевый раскрой, в котором короткие
+тетивы не сращиваются; если эвристика дешевле, ее доски можно использовать,
+только сращивая тетивы из обрезков. Стоимость раскроя сверяется с полным
+перебором без отсечений (brute_force); расхождение - ошибка.
+"""
+import argparse
+import gc
+import itertools
+import logging
+import math
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Фоновое построение таблицы расчетов не должно мешать замерам
+os.environ.setdefault('PRECOMPUTE_QUOTES', '0')
+
+import bot
+import cutting
+from quotes import CONFIGS
+
+
+def heuristic_stringers(stringer_length):
+    """Прежний optimize_stringers"""
+    total_stringer_qty = 2
+    if stringer_length <= 3000:
+        return [{'length': 3000, 'qty': total_stringer_qty}], total_stringer_qty
+    elif stringer_length <= 4000:
+        return [{'length': 4000, 'qty': total_stringer_qty}], total_stringer_qty
+    qty_4000 = math.ceil(stringer_length / 4000) * total_stringer_qty
+    waste_4000 = (qty_4000 * 4000) - (stringer_length * total_stringer_qty)
+    qty_4000_combo = math.floor(stringer_length / 4000) * total_stringer_qty
+    remaining_length = (stringer_length * total_stringer_qty) - (qty_4000_combo * 4000)
+    qty_3000_combo = math.ceil(remaining_length / 3000) if remaining_length > 0 else 0
+    waste_combo = (qty_4000_combo * 4000 + qty_3000_combo * 3000) - (stringer_length * total_stringer_qty)
+    if waste_4000 <= waste_combo:
+        return [{'length': 4000, 'qty': qty_4000}], qty_4000
+    result = []
+    if qty_4000_combo > 0:
+        result.append({'length': 4000, 'qty': qty_4000_combo})
+    if qty_3000_combo > 0:
+        result.append({'length': 3000, 'qty': qty_3000_combo})
+    return result, qty_4000_combo + qty_3000_combo
+
+
+def brute_force(pieces, stock):
+    """Стоимость самого дешевого раскроя полным перебором, без отсечений cutting
+
+    Длинный кусок - любой набор целых досок плюс остаток не длиннее самой
+    длинной доски; остатки и короткие куски по одному кладутся в каждую
+    уже начатую доску, где хватает места, или в новую доску любой длины.
+    """
+    stock = sorted({(int(length), price) for length, price in stock})
+    longest = stock[-1][0]
+    pieces = [math.ceil(piece) for piece in pieces]
+    short = [piece for piece in pieces if piece <= longest]
+    splits = []
+    for piece in (piece for piece in pieces if piece > longest):
+        options = []
+        for count in range(1, piece // stock[0][0] + 1):
+            for boards in itertools.combinations_with_replacement(stock, count):
+                remainder = piece - sum(length for length, _ in boards)
+                if 0 < remainder <= longest:
+                    options.append((sum(price for _, price in boards), remainder))
+        splits.append(options)
+
+    def place(items, free, cost):
+        if not items:
+            return cost
+        item, rest = items[0], items[1:]
+        best = math.inf
+        for i, left in enumerate(free):
+            if item <= left:
+                best = min(best, place(rest, free[:i] + (left - item,) + free[i + 1:], cost))
+        for length, price in stock:
+            if item <= length:
+                best = min(best, place(rest, free + (length - item,), cost + price))
+        return best
+
+    best = math.inf
+    for choice in itertools.product(*splits):
+        whole = sum(price for price, _ in choice)
+        best = min(best, place(tuple(short + [remainder for _, remainder in choice]), (), whole))
+    return best
+
+
+def plan_cost(plan, prices):
+    return sum(prices[stringer['length']] * stringer['qty'] for stringer in plan)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--step', type=int, default=10, help='шаг высоты (мм)')
+    parser.add_argument('--min-height', type=int, default=1000)
+    parser.add_argument('--max-height', type=int, default=5000)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    bot.load_prices()
+    material_type = 'деревянная'
+    stock = bot.get_stringer_stock(material_type)
+    prices = dict(stock)
+    print('Доски для тетив: ' + ', '.join(f'{length} мм - {price:,.0f} ₽' for length, price in stock))
+
+    # Куски тетив берем из самого расчета лестницы
+    recorded = []
+    optimize = bot.optimize_stringers
+
+    def record(pieces, stock):
+        recorded.append(list(pieces))
+        return optimize(pieces, stock)
+
+    bot.optimize_stringers = record
+    for config in CONFIGS:
+        old_total = new_total = 0
+        cheaper = spliced = mismatched = 0
+        best_saving = 0
+        timings = []
+        heights = range(args.min_height, args.max_height + 1, args.step)
+        for height in heights:
+            recorded.clear()
+            result = bot.calculate_wood_stairs(height, 0, config, material_type, bot.FIXED_STEP_HEIGHT, '1000')
+            pieces = recorded[0]
+
+            old_plan, _ = heuristic_stringers(result.stringer_length)
+            old_cost = plan_cost(old_plan, prices)
+            new_cost = plan_cost(result.stringers_detail, prices)
+            old_total += old_cost
+            new_total += new_cost
+            if new_cost < old_cost:
+                cheaper += 1
+                best_saving = max(best_saving, old_cost - new_cost)
+            elif new_cost > old_cost:
+                spliced += 1
+            exhaustive = brute_force(pieces, stock)
+            if new_cost != exhaustive:
+                mismatched += 1
+                print(f'{config} {height} мм: раскрой {new_cost:,.0f} ₽, полный перебор {exhaustive:,.0f} ₽')
+
+            cutting._pack.cache_clear()
+            cutting._solve.cache_clear()
+            # Без сборки мусора посреди замера
+            gc.disable()
+            started = time.perf_counter()
+            cutting.cut_stock(pieces, stock)
+            timings.append(time.perf_counter() - started)
+            gc.enable()
+
+        timings.sort()
+        count = len(heights)
+        print(f'{config:9} {count} высот: эвристика {old_total / count:,.0f} ₽, раскрой {new_total / count:,.0f} ₽ '
+              f'в среднем ({(new_total / old_total - 1) * 100:+.1f}%); раскрой дешевле в {cheaper} случаях, '
+              f'до {best_saving:,.0f} ₽; эвристика дешевле за счет сращивания обрезков в {spliced}; '
+              f'время без кэша p50 {statistics.median(timings) * 1e6:.0f} мкс, '
+              f'p99 {timings[int(count * 0.99) - 1] * 1e6:.0f} мкс, max {timings[-1] * 1e6:.0f} мкс; '
+              f'расхождений с полным перебором {mismatched}')
+    bot.optimize_stringers = optimize
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""Готовые клавиатуры и кэш текста расчета: сколько процессорного времени экономит обновление
+
+Запуск: python benchmarks/bench_ui.py [--repeat 20000 --users 200]
+Сравнивает работу обработчиков по подготовке ответа в диалоге расчета
+(6 обновлений: /start, кнопка, тип, конфигурация, высота, ширина): сборку
+клавиатур и текстов в каждом сообщении, как было раньше, против готовых
+объектов из ui.py, и форматирование результата против кэша текста.
+Для масштаба считает процессорное время на обновление при прогоне
+диалогов через заглушку fake_telegram.py (заглушка в том же процессе).
+"""
+import argparse
+import asyncio
+import gc
+import logging
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('STATE_DB', ':memory:')
+os.environ.setdefault('PRECOMPUTE_QUOTES', '0')
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, Update
+
+import bot
+import ui
+from fake_telegram import FakeTelegram, conversation
+from render import render_quote
+
+TOKEN = '123456:TEST'
+UPDATES_PER_USER = 6
+
+
+def legacy_markup():
+    """Клавиатуры и тексты диалога расчета, собранные заново, как в прежних обработчиках"""
+    first_name = 'User'
+    welcome_text = (
+        f"👋 Добро пожаловать, {first_name}!\n"
+        "Я твой помощник в расчете лестниц.\n\n"
+        "📋 *Доступные функции:*\n"
+        "• 🏠 *Расчет лестницы* - полный расчет стоимости\n"
+        "• 🔍 *Поиск материала* - найти материал по артикулу или названию\n\n"
+        "Выберите действие:"
+    )
+    main_menu = InlineKeyboardMarkup([
+        [InlineKeyboardButton("🔄 Рассчитать лестницу", callback_data="calculate_stairs")],
+        [InlineKeyboardButton("🔍 Найти материал", callback_data="search_material")],
+        [InlineKeyboardButton("🔄 Перезапустить", callback_data="restart")]
+    ])
+    type_keyboard = ReplyKeyboardMarkup(
+        [["🏠 Деревянная", "⚡ Модульная"], ["🔍 Найти материал", "🔄 Перезапустить"]],
+        one_time_keyboard=True, resize_keyboard=True
+    )
+    config_keyboard = ReplyKeyboardMarkup(
+        [["📏 Прямая", "📐 Г-образная", "🔄 П-образная"], ["🔍 Найти материал", "🔄 Перезапустить"]],
+        one_time_keyboard=True, resize_keyboard=True
+    )
+    config_map = {'📏 Прямая': 'straight', '📐 Г-образная': 'l_shape', '🔄 П-образная': 'u_shape'}
+    height_keyboard = ReplyKeyboardMarkup([["🔄 Перезапустить"]], one_time_keyboard=True, resize_keyboard=True)
+    step_keyboard = ReplyKeyboardMarkup(
+        [["900", "1000", "1200"], ["🔍 Найти материал", "🔄 Перезапустить"]],
+        one_time_keyboard=True, resize_keyboard=True
+    )
+    quote_menu = InlineKeyboardMarkup([
+        [InlineKeyboardButton("🔄 Новый расчет", callback_data="calculate_stairs")],
+        [InlineKeyboardButton("🔍 Поиск материала", callback_data="search_material")],
+        [InlineKeyboardButton("🔄 Перезапустить", callback_data="restart")]
+    ])
+    return (welcome_text, main_menu, type_keyboard, config_keyboard, config_map['📏 Прямая'],
+            height_keyboard, step_keyboard, quote_menu)
+
+
+def registry_markup():
+    """То же из готовых объектов ui.py"""
+    return (ui.welcome_text('User'), ui.MAIN_MENU, ui.TYPE_KEYBOARD, ui.CONFIG_KEYBOARD,
+            ui.CONFIG_CHOICES['📏 Прямая'], ui.RESTART_KEYBOARD, ui.STEP_WIDTH_KEYBOARD, ui.QUOTE_MENU)
+
+
+def per_call(func, repeat):
+    gc.disable()
+    started = time.process_time()
+    for _ in range(repeat):
+        func()
+    elapsed = time.process_time() - started
+    gc.enable()
+    return elapsed / repeat * 1e6
+
+
+async def cpu_per_update(users):
+    """Процессорное время на обновление при прогоне диалогов через заглушку Bot API"""
+    fake = FakeTelegram(TOKEN)
+    base_url = await fake.start()
+    fake.expected_results = users
+    application = bot.build_application(TOKEN, base_url=base_url)
+    await application.initialize()
+    await application.start()
+    started = time.process_time()
+    for user in range(users):
+        for update in conversation(10 ** 6 + user, 1 + user * UPDATES_PER_USER):
+            await application.update_queue.put(Update.de_json(update, application.bot))
+    await asyncio.wait_for(fake.results_done.wait(), 300)
+    elapsed = time.process_time() - started
+    await application.stop()
+    await application.shutdown()
+    await fake.stop()
+    return elapsed / (users * UPDATES_PER_USER) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=200)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    bot.load_prices()
+    catalog = bot.price_catalog
+
+    assert legacy_markup()[1:] == registry_markup()[1:]
+    legacy = per_call(legacy_markup, args.repeat)
+    registry = per_call(registry_markup, args.repeat)
+    print(f'Клавиатуры и тексты на диалог: заново {legacy:.1f} мкс, готовые {registry:.1f} мкс '
+          f'({(legacy - registry) / UPDATES_PER_USER:.1f} мкс на обновление)')
+
+    spec = ('wood', 'straight', 'деревянная', 3000.0, '1000')
+    quote = bot.run_calculator(*spec, catalog)
+    key = bot.quote_key(*spec, catalog)
+    bot.quote_text_cache.put(key, render_quote(quote))
+    render = per_call(lambda: render_quote(quote), args.repeat)
+    cached = per_call(lambda: bot.quote_text_cache.get(bot.quote_key(*spec, catalog)), args.repeat)
+    calculated = per_call(lambda: render_quote(bot.run_calculator(*spec, catalog)), args.repeat // 10)
+    print(f'Текст расчета: форматирование {render:.1f} мкс (с калькулятором {calculated:.1f} мкс), '
+          f'из кэша {cached:.1f} мкс')
+
+    saved = (legacy - registry + render - cached) / UPDATES_PER_USER
+    total = asyncio.run(cpu_per_update(args.users))
+    print(f'Процессорное время на обновление (бот и заглушка): {total:.0f} мкс; '
+          f'готовые объекты и кэш текста экономят ~{saved:.1f} мкс на обновление '
+          f'({saved / total * 100:.1f}%); обновление с повторным расчетом вне таблицы и кэша расчетов '
+          f'экономит {calculated - cached:.1f} мкс')
+
+
+if __name__ == '__main__':
+    main()
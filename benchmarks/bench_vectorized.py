@@ -0,0 +1,95 @@
+"""Векторный расчет по диапазону высот против поштучного вызова калькуляторов
+
+Запуск: python benchmarks/bench_vectorized.py [--cases 20000]
+Сначала проверяет на случайных высотах и ширинах, что векторный расчет
+совпадает с calculate_wood_stairs / calculate_modular_stairs точно, затем
+сравнивает время расчета всех высот 1000-5000 мм с шагом 1 мм.
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Фоновое построение таблицы расчетов не должно мешать замерам
+os.environ.setdefault('PRECOMPUTE_QUOTES', '0')
+
+import numpy as np
+
+import bot
+import vectorized
+from quotes import CONFIGS, STAIR_TYPES, STEP_WIDTHS
+
+FIELDS = ('steps_count', 'platforms_count', 'step_height', 'stringer_length', 'total_cost')
+
+
+def scalar(stair_type, config, height, step_width):
+    calculator = bot.calculate_wood_stairs if stair_type == 'wood' else bot.calculate_modular_stairs
+    return calculator(height, 0, config, STAIR_TYPES[stair_type], bot.FIXED_STEP_HEIGHT, step_width)
+
+
+def random_height(rnd):
+    """Целые, дробные и граничные высоты (кратные высоте ступени и рядом с ними)"""
+    kind = rnd.random()
+    if kind < 0.4:
+        return rnd.randint(1000, 5000)
+    if kind < 0.7:
+        return round(rnd.uniform(1000, 5000), rnd.randint(1, 3))
+    base = rnd.randint(5, 22) * bot.FIXED_STEP_HEIGHT
+    return base + rnd.choice((-1, 0, 1, 0.5, -0.5))
+
+
+def check(cases, seed):
+    """Сравнение с поштучным расчетом на случайных входных данных"""
+    rnd = random.Random(seed)
+    checked = 0
+    for stair_type in STAIR_TYPES:
+        for config in CONFIGS:
+            heights = [random_height(rnd) for _ in range(cases // 6)]
+            widths = [rnd.choice(STEP_WIDTHS) for _ in heights]
+            vector = vectorized.stairs(stair_type, config, heights, widths)
+            for i, (height, width) in enumerate(zip(heights, widths)):
+                expected = scalar(stair_type, config, height, width)
+                for field in FIELDS:
+                    assert vector[field][i] == getattr(expected, field), (stair_type, config, height, width, field)
+                checked += 1
+    print(f'Проверено {checked} случаев: векторный расчет совпадает с поштучным')
+
+
+def benchmark():
+    heights = np.arange(1000, 5001)
+    widths = np.array(STEP_WIDTHS)[:, None]
+    for stair_type in STAIR_TYPES:
+        for config in CONFIGS:
+            started = time.perf_counter()
+            vectorized.stairs(stair_type, config, heights, widths)
+            vector_time = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for width in STEP_WIDTHS:
+                for height in heights.tolist():
+                    scalar(stair_type, config, height, width)
+            scalar_time = time.perf_counter() - started
+
+            count = heights.size * len(STEP_WIDTHS)
+            print(f'{stair_type:8} {config:9} {count} расчетов: векторно {vector_time * 1000:7.1f} мс, '
+                  f'поштучно {scalar_time * 1000:8.1f} мс (x{scalar_time / vector_time:.0f})')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    bot.load_prices()
+    check(args.cases, args.seed)
+    benchmark()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Нагрузочный тест бота: webhook сервер против run_polling
+
+Запуск: python benchmarks/bench_webhook.py [--users 50 --latency 0.03 --mode both]
+Заглушка Telegram Bot API (fake_telegram.py) отдает боту обновления:
+в режиме webhook - POST запросами на HTTP сервер бота, в режиме polling -
+через getUpdates. Каждый пользователь проходит полный расчет лестницы
+(6 обновлений); тест ждет, пока все получат результат.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('STATE_DB', ':memory:')
+
+import aiohttp
+
+import bot
+import webhook
+from fake_telegram import FakeTelegram, conversation
+
+TOKEN = '123456:TEST'
+UPDATES_PER_USER = 6
+
+
+def make_updates(users, first_user=100000):
+    return [conversation(first_user + user, 1 + user * UPDATES_PER_USER) for user in range(users)]
+
+
+async def run_webhook_mode(args, conversations):
+    fake = FakeTelegram(TOKEN, args.latency)
+    base_url = await fake.start()
+    fake.expected_results = len(conversations)
+    application = bot.build_application(TOKEN, base_url=base_url)
+    secret = webhook.default_secret(TOKEN)
+    web_app = webhook.create_web_app(application, secret, bot.HOME_TEXT, bot.status_payload)
+    stop = asyncio.Event()
+    server = asyncio.create_task(webhook.serve(application, web_app, args.port, stop))
+    await asyncio.sleep(1)
+
+    url = f'http://127.0.0.1:{args.port}{webhook.WEBHOOK_PATH}'
+    headers = {'X-Telegram-Bot-Api-Secret-Token': secret}
+    acks = []
+    limit = asyncio.Semaphore(webhook.MAX_CONNECTIONS)
+
+    async def replay(session, updates):
+        # Telegram отправляет обновления одного чата по порядку
+        for update in updates:
+            async with limit:
+                started = time.perf_counter()
+                async with session.post(url, json=update, headers=headers) as response:
+                    assert response.status == 200, response.status
+                acks.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(replay(session, updates) for updates in conversations))
+        await asyncio.wait_for(fake.results_done.wait(), args.deadline)
+        elapsed = time.perf_counter() - started
+        async with session.get(f'http://127.0.0.1:{args.port}/status') as response:
+            status_ok = response.status == 200
+
+    stop.set()
+    await server
+    await fake.stop()
+    acks.sort()
+    print(f"webhook: {elapsed:.2f} с, {len(acks) / elapsed:.0f} обновлений/с, "
+          f"ответ на POST p50 {statistics.median(acks) * 1000:.1f} мс, "
+          f"p99 {acks[int(len(acks) * 0.99) - 1] * 1000:.1f} мс, /status {'ok' if status_ok else 'ошибка'}, "
+          f"вызовов Bot API {sum(fake.calls.values())}")
+
+
+async def run_polling_mode(args, conversations):
+    fake = FakeTelegram(TOKEN, args.latency)
+    base_url = await fake.start()
+    fake.expected_results = len(conversations)
+    application = bot.build_application(TOKEN, base_url=base_url)
+    await application.initialize()
+    await application.post_init(application)
+    await application.start()
+
+    # Telegram отдает обновления в порядке поступления, чаты вперемешку
+    updates = [update for step in zip(*conversations) for update in step]
+    started = time.perf_counter()
+    fake.add_updates(updates)
+    await application.updater.start_polling(poll_interval=0, timeout=10)
+    await asyncio.wait_for(fake.results_done.wait(), args.deadline)
+    elapsed = time.perf_counter() - started
+
+    await application.updater.stop()
+    await application.stop()
+    await application.shutdown()
+    await fake.stop()
+    print(f"polling: {elapsed:.2f} с, {len(updates) / elapsed:.0f} обновлений/с, "
+          f"запросов getUpdates {fake.calls.get('getUpdates', 0)}, вызовов Bot API {sum(fake.calls.values())}")
+
+
+async def run(args):
+    bot.load_prices()
+    # Разные пользователи в режимах: состояние бота после первого прогона не влияет на второй
+    if args.mode in ('webhook', 'both'):
+        await run_webhook_mode(args, make_updates(args.users, 100000))
+    if args.mode in ('polling', 'both'):
+        await run_polling_mode(args, make_updates(args.users, 200000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.03, help='задержка ответа Bot API (с)')
+    parser.add_argument('--mode', choices=('webhook', 'polling', 'both'), default='both')
+    parser.add_argument('--port', type=int, default=18080)
+    parser.add_argument('--deadline', type=float, default=600.0)
+    args = parser.parse_args()
+
+    # bot настраивает логирование на INFO при импорте: в тесте оставляем только предупреждения
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
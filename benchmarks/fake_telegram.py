@@ -0,0 +1,127 @@
+"""Локальная заглушка Telegram Bot API для нагрузочных тестов бота
+
+Отвечает на вызовы методов бота (/bot<token>/<method>) как настоящий
+Bot API, считает их и отдает заранее подготовленные обновления через
+getUpdates. Задержка latency имитирует путь до api.telegram.org,
+slow_chats - дополнительную задержку вызовов для отдельных чатов.
+"""
+import asyncio
+import json
+import time
+
+from aiohttp import web
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'Stair Bot', 'username': 'stair_bot',
+            'can_join_groups': False, 'can_read_all_group_messages': False, 'supports_inline_queries': False}
+
+
+def user(user_id):
+    return {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}'}
+
+
+def text_update(update_id, user_id, message_id, text):
+    message = {'message_id': message_id, 'date': int(time.time()), 'chat': {'id': user_id, 'type': 'private'},
+               'from': user(user_id), 'text': text}
+    if text.startswith('/'):
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+    return {'update_id': update_id, 'message': message}
+
+
+def callback_update(update_id, user_id, message_id, data):
+    return {'update_id': update_id, 'callback_query': {
+        'id': str(update_id), 'from': user(user_id), 'chat_instance': str(user_id), 'data': data,
+        'message': {'message_id': message_id, 'date': int(time.time()), 'chat': {'id': user_id, 'type': 'private'},
+                    'from': BOT_USER, 'text': 'menu'}
+    }}
+
+
+def conversation(user_id, first_update_id):
+    """Обновления полного расчета одной лестницы: /start, кнопка и четыре ответа"""
+    steps = [('text', '/start'), ('callback', 'calculate_stairs'), ('text', '🏠 Деревянная'),
+             ('text', '📏 Прямая'), ('text', '3000'), ('text', '1000')]
+    updates = []
+    for i, (kind, value) in enumerate(steps):
+        make = text_update if kind == 'text' else callback_update
+        updates.append(make(first_update_id + i, user_id, 1000 + i, value))
+    return updates
+
+
+class FakeTelegram:
+    def __init__(self, token, latency=0.0, slow_chats=None):
+        self.token = token
+        self.latency = latency
+        # chat_id -> дополнительная задержка (с)
+        self.slow_chats = slow_chats or {}
+        self.calls = {}
+        self.results = 0
+        self.results_done = asyncio.Event()
+        self.expected_results = None
+        self.pending = []
+        self.new_updates = asyncio.Event()
+        self._message_id = 10 ** 6
+        self.runner = None
+        self.base_url = None
+
+    def add_updates(self, updates):
+        self.pending.extend(updates)
+        self.new_updates.set()
+
+    def _message(self, chat_id, text=''):
+        self._message_id += 1
+        return {'message_id': self._message_id, 'date': int(time.time()),
+                'chat': {'id': int(chat_id), 'type': 'private'}, 'from': BOT_USER, 'text': text}
+
+    async def _get_updates(self, params):
+        offset = int(params.get('offset') or 0)
+        limit = int(params.get('limit') or 100)
+        timeout = float(params.get('timeout') or 0)
+        deadline = time.monotonic() + timeout
+        while True:
+            self.pending = [u for u in self.pending if u['update_id'] >= offset]
+            if self.pending or time.monotonic() >= deadline:
+                return self.pending[:limit]
+            self.new_updates.clear()
+            try:
+                await asyncio.wait_for(self.new_updates.wait(), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                pass
+
+    async def handle(self, request):
+        method = request.match_info['method']
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if request.content_type == 'application/json':
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+        delay = self.latency + self.slow_chats.get(int(params.get('chat_id') or 0), 0.0)
+        if delay:
+            await asyncio.sleep(delay)
+
+        if method == 'getMe':
+            result = BOT_USER
+        elif method == 'getUpdates':
+            result = await self._get_updates(params)
+        elif method in ('sendMessage', 'editMessageText'):
+            text = params.get('text', '')
+            result = self._message(params.get('chat_id', 0), text)
+            if 'РЕЗУЛЬТАТ РАСЧЕТА' in text:
+                self.results += 1
+                if self.expected_results is not None and self.results >= self.expected_results:
+                    self.results_done.set()
+        else:
+            result = True
+        return web.Response(text=json.dumps({'ok': True, 'result': result}), content_type='application/json')
+
+    async def start(self, host='127.0.0.1', port=0):
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f'http://{host}:{port}/bot'
+        return self.base_url
+
+    async def stop(self):
+        await self.runner.cleanup()
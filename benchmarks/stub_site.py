@@ -0,0 +1,90 @@
+"""Локальная заглушка сайта lemanapro.ru с заготовленными страницами поиска
+
+Отдает страницу поиска с ценой, зависящей от артикула, с задержкой и
+изредка отвечает 503/429, чтобы проверить повторы и ограничение частоты.
+Поддерживает ETag/Last-Modified и отвечает 304 на условные запросы.
+"""
+import asyncio
+import random
+
+from aiohttp import web
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html><head><title>Поиск: {article}</title></head>
+<body>
+<header class="header"><div class="cart-price-total">0 ₽</div></header>
+<main>
+  <div class="product-card" data-sku="{article}">
+    <a class="product-title" href="/product/{article}/">Товар {article}</a>
+    <div class="product-price"><span class="price">{price_text} ₽</span></div>
+  </div>
+</main>
+</body></html>
+"""
+
+
+def article_price(article, generation=0):
+    """Цена, которую заглушка отдает для артикула"""
+    return 500 + int(article) % 10000 + generation
+
+
+def render_page(article, generation=0):
+    price = article_price(article, generation)
+    return PAGE_TEMPLATE.format(article=article, price_text=f'{price:,}'.replace(',', ' '))
+
+
+class StubSite:
+    """HTTP сервер с заготовленными страницами поиска"""
+
+    def __init__(self, latency=0.02, error_rate=0.0, seed=1, pages=None):
+        self.latency = latency
+        # Записанные страницы: артикул выбирает страницу по остатку от деления
+        self.pages = [page.encode('utf-8') for page in pages] if pages else None
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+        # Артикул -> номер изменения цены; меняет ETag и цену на странице
+        self.generations = {}
+        self.runner = None
+        self.url = None
+
+    async def search(self, request):
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        if self.random.random() < self.error_rate:
+            self.errors += 1
+            if self.random.random() < 0.5:
+                return web.Response(status=429, headers={'Retry-After': '0'})
+            return web.Response(status=503)
+        article = request.query.get('q', '0')
+        generation = self.generations.get(article, 0)
+        headers = {
+            'ETag': f'"{article}-{generation}"',
+            'Last-Modified': 'Mon, 06 Jan 2025 00:00:00 GMT'
+        }
+        if request.headers.get('If-None-Match') == headers['ETag']:
+            self.not_modified += 1
+            return web.Response(status=304, headers=headers)
+        if self.pages:
+            body = self.pages[int(article) % len(self.pages)]
+        else:
+            body = render_page(article, generation).encode('utf-8')
+        self.bytes_sent += len(body)
+        return web.Response(body=body, content_type='text/html', charset='utf-8', headers=headers)
+
+    async def start(self, host='127.0.0.1', port=0):
+        app = web.Application()
+        app.router.add_get('/search/', self.search)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f'http://{host}:{port}/search/?q={{article}}'
+        return self.url
+
+    async def stop(self):
+        await self.runner.cleanup()
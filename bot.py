@@ -1,23 +1,45 @@
 import os
 import logging
 import requests
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup
+from telegram import Update
+from telegram.error import RetryAfter
+from telegram.request import HTTPXRequest
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters, ContextTypes, ConversationHandler
-import json
-from datetime import datetime, timedelta
+from datetime import datetime
 import math
-from openpyxl import load_workbook
 import asyncio
-from flask import Flask
-from threading import Thread
+from flask import Flask, Response
+import functools
+from threading import Lock, Thread
 import time
+from catalog import PRICES_FILE, PriceCatalog, PriceFileWatcher, apply_price_overrides, overrides_path, refresh_price_catalog
+from cache import LRUCache
+from cutting import cut_stock
+from render import render_quote
+from results import MaterialLine, StairQuote
+from calculations import CALCULATION_TIMEOUT, CALCULATION_WORKERS, CalculationBusy, CalculationCancelled, CalculationService
+from state import FLUSH_INTERVAL, SESSION_TTL, ChatHistory, StatePersistence, StateStore, UserSession, open_backend
+from update_processor import PerUserUpdateProcessor
+from metrics import CONTENT_TYPE, Registry, watch_event_loop
+import ui
+
+try:
+    from quote_table import QuoteTable
+except ImportError:
+    QuoteTable = None
 
 # Replit keep-alive server
 app = Flask('')
+HOME_TEXT = "🚀 Telegram Stair Bot is Alive and Running!"
+
+# Режим webhook: адрес, на который Telegram отправляет обновления (без него - polling)
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+PORT = int(os.getenv('PORT', '8080'))
 
 @app.route('/')
 def home():
-    return "🚀 Telegram Stair Bot is Alive and Running!"
+    return HOME_TEXT
 
 @app.route('/ping')
 def ping():
@@ -25,21 +47,36 @@ def ping():
 
 @app.route('/status')
 def status():
+    return status_payload()
+
+@app.route('/metrics')
+def metrics_page():
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+def status_payload():
+    """Данные для /status (Flask в режиме polling и webhook сервер)"""
     return {
         "status": "active",
         "timestamp": datetime.now().isoformat(),
-        "service": "telegram-stair-bot"
+        "service": "telegram-stair-bot",
+        "price_reload": PRICE_RELOAD_STATS,
+        "calculation_cache": calculation_cache.stats(),
+        "quote_text_cache": quote_text_cache.stats(),
+        "state": state_backend.stats(),
+        "updates": update_processor.stats(),
+        "calculations": calculation_service.stats(),
+        "quote_table": quote_table.stats() if quote_table is not None else None
     }
 
 def run_flask():
-    app.run(host='0.0.0.0', port=8080)
+    app.run(host='0.0.0.0', port=PORT)
 
 def keep_alive():
     """Запускает Flask сервер в отдельном потоке"""
     t = Thread(target=run_flask)
     t.daemon = True
     t.start()
-    logging.info("🔄 Keep-alive server started on port 8080")
+    logging.info(f"🔄 Keep-alive server started on port {PORT}")
 
 def start_ping_loop():
     """Фоновая задача для само-пинга (опционально)"""
@@ -59,6 +96,9 @@ def start_ping_loop():
     t.daemon = True
     t.start()
 
+# Момент запуска процесса для замера холодного старта
+PROCESS_STARTED = time.perf_counter()
+
 # Настройка логирования
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -70,58 +110,301 @@ logger = logging.getLogger(__name__)
 SELECTING_TYPE, SELECTING_CONFIG, INPUT_HEIGHT, SELECTING_STEP_SIZE, SEARCH_MATERIAL = range(5)
 
 # Глобальные переменные для хранения данных
-user_data = {}
 prices_data = None
+price_catalog = None
 last_price_update = None
-PRICE_UPDATE_INTERVAL = timedelta(hours=24)
-MESSAGES_TO_DELETE = {}
+# Как часто проверять data.xlsx на изменения (секунды)
+PRICE_CHECK_INTERVAL = 5
+price_watcher = PriceFileWatcher(PRICES_FILE)
+# Цены, собранные с сайта (price_refresh.py), лежат рядом с data.xlsx
+overrides_watcher = PriceFileWatcher(overrides_path(PRICES_FILE))
+price_watch_task = None
+price_reload_lock = asyncio.Lock()
+PRICE_RELOAD_STATS = {
+    'reloads': 0,
+    'last_duration': None,
+    'last_loop_blocked': None,
+    'max_loop_blocked': 0.0
+}
+
+# Состояние диалогов: файл SQLite (переживает перезапуск) или память при STATE_DB=:memory:
+STATE_DB = os.getenv('STATE_DB', 'bot_state.sqlite3')
+# Как часто удалять устаревшие сессии (секунды)
+STATE_PURGE_INTERVAL = 10 * 60
+# Сколько последних сообщений чата помнить для очистки истории
+MESSAGES_TO_DELETE_LIMIT = 50
+state_backend = open_backend(STATE_DB)
+user_sessions = StateStore(state_backend, 'user', UserSession)
+chat_messages = StateStore(state_backend, 'chat', ChatHistory)
+state_purge_task = None
+state_flush_task = None
+
+# Удаление сообщений: сколько запросов к Telegram одновременно
+# и число повторов после RetryAfter
+DELETE_CONCURRENCY = int(os.getenv('DELETE_CONCURRENCY', '8'))
+DELETE_RETRIES = 3
+delete_semaphore = asyncio.Semaphore(DELETE_CONCURRENCY)
+
+# Сколько обновлений разных пользователей обрабатывать одновременно
+# (обновления одного пользователя всегда идут по порядку; 1 - строго по очереди)
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '64'))
+
+# Расчеты в пуле потоков: не блокируют цикл событий, ограничены по времени
+# и отменяются перезапуском диалога
+calculation_service = CalculationService(
+    workers=int(os.getenv('CALCULATION_WORKERS', str(CALCULATION_WORKERS))),
+    timeout=float(os.getenv('CALCULATION_TIMEOUT', str(CALCULATION_TIMEOUT)))
+)
 
 # Константы расчета
 FIXED_STEP_HEIGHT = 225
 MAX_STRINGER_LENGTH = 4000
+# Доски для тетив (длина, цена), если в прайсе их нет
+STRINGER_STOCK = ((4000, 10215), (3000, 9518))
 
-def load_prices(force_update=False):
-    """Загрузка цен из Excel файла с автообновлением"""
-    global prices_data, last_price_update
+# Кэш результатов расчета по входным данным и версии прайса
+CALCULATION_CACHE_SIZE = 1024
+calculation_cache = LRUCache(CALCULATION_CACHE_SIZE)
+# Готовые тексты ответов с расчетом по тому же ключу, что и кэш расчетов
+QUOTE_TEXT_CACHE_SIZE = 1024
+quote_text_cache = LRUCache(QUOTE_TEXT_CACHE_SIZE)
+
+# Готовые расчеты для всех целых высот; перестраиваются в фоне после каждой
+# загрузки прайса (PRECOMPUTE_QUOTES=0 - отключить, нужен numpy)
+PRECOMPUTE_QUOTES = os.getenv('PRECOMPUTE_QUOTES', '1') != '0' and QuoteTable is not None
+quote_table = None
+# Таблицу строит только запущенный бот (main); при импорте bot из quotes.py
+# и других скриптов load_prices ее не строит
+quote_table_builds = False
+# Поток построения таблицы: не больше одного, новый прайс он подхватывает сам
+quote_table_thread = None
+quote_table_lock = Lock()
+
+# Метрики для /metrics (формат Prometheus): где проходит время обработки
+metrics = Registry()
+handler_latency = metrics.histogram(
+    'stairbot_handler_seconds', 'Время обработчика обновления по состоянию диалога', ('state', 'handler')
+)
+telegram_api_latency = metrics.histogram('stairbot_telegram_api_seconds', 'Время вызова Bot API по методу', ('method',))
+price_load_duration = metrics.histogram(
+    'stairbot_load_prices_seconds', 'Время загрузки прайса (sync - при старте, background - фоновое обновление)',
+    ('mode',), buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+event_loop_lag = metrics.histogram(
+    'stairbot_event_loop_lag_seconds', 'Задержка цикла событий',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+# Как часто замерять задержку цикла событий (секунды)
+EVENT_LOOP_LAG_INTERVAL = 0.5
+event_loop_task = None
+# Соединений с Bot API, как у Application по умолчанию
+TELEGRAM_CONNECTION_POOL_SIZE = 256
+
+def cache_stats():
+    """Счетчики кэшей ответов по имени кэша"""
+    return {'calculation': calculation_cache.stats(), 'quote_text': quote_text_cache.stats()}
+
+metrics.collected(
+    'stairbot_catalog_items', 'Позиций в текущем прайсе',
+    collect=lambda: len(price_catalog) if price_catalog is not None else None
+)
+metrics.collected(
+    'stairbot_cache_hits_total', 'Попадания в кэш', 'counter', ('cache',),
+    collect=lambda: {name: stats['hits'] for name, stats in cache_stats().items()}
+)
+metrics.collected(
+    'stairbot_cache_misses_total', 'Промахи кэша', 'counter', ('cache',),
+    collect=lambda: {name: stats['misses'] for name, stats in cache_stats().items()}
+)
+metrics.collected(
+    'stairbot_cache_hit_ratio', 'Доля попаданий в кэш', 'gauge', ('cache',),
+    collect=lambda: {name: stats['hit_rate'] for name, stats in cache_stats().items()}
+)
+metrics.collected(
+    'stairbot_quote_table_hits_total', 'Ответы из таблицы готовых расчетов', 'counter',
+    collect=lambda: quote_table.hits if quote_table is not None else None
+)
+
+def set_price_catalog(catalog, update_time=None):
+    """Подмена текущего прайса готовым каталогом одним присваиванием"""
+    global prices_data, price_catalog, last_price_update
+    
+    # Обновление могло вернуть тот же каталог (цены не изменились): таблица для него уже есть или строится
+    changed = catalog is not price_catalog
+    price_catalog = catalog
+    prices_data = catalog.items
+    if update_time is not None:
+        last_price_update = update_time
+    if quote_table_builds and changed:
+        start_quote_table_build()
+
+def start_quote_table_build():
+    """Построение таблицы для текущего прайса в фоновом потоке, если он еще не запущен"""
+    global quote_table_thread
+    with quote_table_lock:
+        # Идущее построение для прежнего прайса прервется и начнется заново для нового
+        if quote_table_thread is not None and quote_table_thread.is_alive():
+            return
+        quote_table_thread = Thread(target=build_quote_tables, daemon=True)
+        quote_table_thread.start()
+
+def build_quote_tables():
+    """Таблицы готовых расчетов, пока прайс не перестанет меняться за время построения"""
+    global quote_table_thread
+    while True:
+        catalog = price_catalog
+        if quote_table is None or quote_table.version != catalog.version:
+            build_quote_table(catalog)
+        with quote_table_lock:
+            if price_catalog is catalog:
+                quote_table_thread = None
+                return
+
+def build_quote_table(catalog):
+    """Построение таблицы готовых расчетов для каталога в фоновом потоке"""
+    global quote_table
+    try:
+        # Если прайс за время построения сменился, таблица уже не нужна
+        table = QuoteTable.build(run_calculator, catalog, cancelled=lambda: price_catalog is not catalog)
+    except Exception as e:
+        logger.error(f"Ошибка построения таблицы расчетов: {e}")
+        return
+    if table is None or price_catalog is not catalog:
+        return
     
+    quote_table = table
+    logger.info(
+        f"📋 Таблица расчетов: {len(table)} вариантов за {table.build_time:.2f} с, "
+        f"{table.nbytes() / 1024 / 1024:.1f} МБ"
+    )
+
+def poll_price_files():
+    """Отпечатки data.xlsx и файла цен с сайта (None, если файл не менялся)"""
+    return price_watcher.poll(), overrides_watcher.poll()
+
+def accept_price_files(fingerprint, overrides_fingerprint):
+    """Запоминаем отпечатки загруженных файлов"""
+    if fingerprint is not None:
+        price_watcher.accept(fingerprint)
+    if overrides_fingerprint is not None:
+        overrides_watcher.accept(overrides_fingerprint)
+
+def price_refresher(force_update, fingerprint, overrides_fingerprint):
+    """Функция обновления каталога или None, если файлы не менялись"""
+    if force_update or price_catalog is None or fingerprint is not None:
+        return refresh_price_catalog
+    if overrides_fingerprint is None:
+        return None
+    # Файл цен с сайта удален: возвращаемся к ценам из Excel
+    if overrides_fingerprint[0] is None:
+        return refresh_price_catalog
+    # Изменились только цены с сайта: меняем только эти строки
+    return apply_price_overrides
+
+def load_prices(force_update=False):
+    """Загрузка цен из Excel файла, если он изменился"""
     try:
-        current_time = datetime.now()
-        if force_update or last_price_update is None or (current_time - last_price_update) > PRICE_UPDATE_INTERVAL:
+        fingerprints = poll_price_files()
+        refresh = price_refresher(force_update, *fingerprints)
+        if refresh is not None:
             logger.info("Начинаем обновление цен...")
             
-            wb = load_workbook('data.xlsx', data_only=True)
-            sheet = wb.active
-            
-            prices = []
-            
-            for row_num in range(4, sheet.max_row + 1):
-                article = sheet.cell(row=row_num, column=1).value
-                name = sheet.cell(row=row_num, column=2).value
-                stair_type = sheet.cell(row=row_num, column=3).value
-                sizes = sheet.cell(row=row_num, column=4).value
-                unit = sheet.cell(row=row_num, column=5).value
-                price = sheet.cell(row=row_num, column=6).value
-                
-                if article and name and price:
-                    item = {
-                        'article': str(article).split('.')[0] if '.' in str(article) else str(article),
-                        'name': str(name),
-                        'stair_type': str(stair_type) if stair_type else '',
-                        'sizes': str(sizes) if sizes else '',
-                        'unit': str(unit) if unit else 'шт.',
-                        'price': float(price) if price else 0
-                    }
-                    prices.append(item)
-            
-            prices_data = prices
-            last_price_update = current_time
-            logger.info(f"Успешно загружено {len(prices)} позиций из Excel")
+            with price_load_duration.time('sync'):
+                catalog, changed = refresh(price_catalog)
+                set_price_catalog(catalog, datetime.now())
+                accept_price_files(*fingerprints)
+            logger.info(f"Успешно загружено {len(prices_data)} позиций (источник: {price_catalog.source})")
         else:
             logger.info("Используем кэшированные цены")
             
     except Exception as e:
         logger.error(f"Ошибка загрузки прайса: {e}")
-        prices_data = get_test_data()
+        set_price_catalog(PriceCatalog(get_test_data(), source='test'))
+
+async def load_prices_async(force_update=False):
+    """Загрузка цен в рабочем потоке без блокировки обработки сообщений"""
+    # Каталог строится целиком в потоке и подменяется одним присваиванием,
+    # поэтому идущие расчеты видят либо старый, либо новый прайс
+    async with price_reload_lock:
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        loop_blocked = 0.0
+        
+        try:
+            fingerprints = await loop.run_in_executor(None, poll_price_files)
+            segment_started = time.perf_counter()
+            refresh = price_refresher(force_update, *fingerprints)
+            if refresh is None:
+                return
+            
+            logger.info("Начинаем фоновое обновление цен...")
+            loop_blocked += time.perf_counter() - segment_started
+            catalog, changed = await loop.run_in_executor(None, refresh, price_catalog)
+            update_time = datetime.now()
+        except Exception as e:
+            logger.error(f"Ошибка загрузки прайса: {e}")
+            if price_catalog is not None:
+                logger.info("Оставляем ранее загруженные цены")
+                return
+            catalog, changed = PriceCatalog(get_test_data(), source='test'), None
+            fingerprints = (None, None)
+            update_time = None
+        
+        swap_started = time.perf_counter()
+        set_price_catalog(catalog, update_time)
+        accept_price_files(*fingerprints)
+        loop_blocked += time.perf_counter() - swap_started
+        
+        duration = time.perf_counter() - started
+        price_load_duration.observe(duration, 'background')
+        PRICE_RELOAD_STATS['reloads'] += 1
+        PRICE_RELOAD_STATS['last_duration'] = duration
+        PRICE_RELOAD_STATS['last_loop_blocked'] = loop_blocked
+        PRICE_RELOAD_STATS['max_loop_blocked'] = max(PRICE_RELOAD_STATS['max_loop_blocked'], loop_blocked)
+        changes = "прайс перестроен" if changed is None else f"изменено строк: {len(changed)}"
+        logger.info(
+            f"Загружено {len(catalog)} позиций за {duration * 1000:.1f} мс, {changes} "
+            f"(event loop заблокирован на {loop_blocked * 1000:.2f} мс)"
+        )
+
+async def watch_prices():
+    """Фоновая проверка data.xlsx и цен с сайта на изменения"""
+    while True:
+        await asyncio.sleep(PRICE_CHECK_INTERVAL)
+        try:
+            await load_prices_async()
+        except Exception as e:
+            logger.error(f"Ошибка проверки прайса: {e}")
+
+async def purge_state():
+    """Фоновое удаление сессий и историй чатов, устаревших по SESSION_TTL"""
+    while True:
+        await asyncio.sleep(STATE_PURGE_INTERVAL)
+        try:
+            loop = asyncio.get_running_loop()
+            removed = await loop.run_in_executor(None, state_backend.purge, time.time() - SESSION_TTL)
+            if removed:
+                logger.info(f"Удалено устаревших записей состояния: {removed}")
+        except Exception as e:
+            logger.error(f"Ошибка очистки состояния: {e}")
+
+async def flush_state():
+    """Фоновая запись накопленных изменений состояния в файл (в рабочем потоке)"""
+    while True:
+        await asyncio.sleep(FLUSH_INTERVAL)
+        try:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, state_backend.flush)
+        except Exception as e:
+            logger.error(f"Ошибка записи состояния: {e}")
+
+async def post_init(application: Application):
+    """Запуск фоновых задач после инициализации бота"""
+    global price_watch_task, state_purge_task, state_flush_task, event_loop_task
+    price_watch_task = asyncio.create_task(watch_prices())
+    state_purge_task = asyncio.create_task(purge_state())
+    state_flush_task = asyncio.create_task(flush_state())
+    event_loop_task = asyncio.create_task(watch_event_loop(event_loop_lag, EVENT_LOOP_LAG_INTERVAL))
 
 def get_test_data():
     """Тестовые данные если файл не загружается"""
@@ -145,54 +428,42 @@ def get_test_data():
     logger.info("Используются тестовые данные")
     return test_data
 
-def get_material_price(material_type, name_pattern, default_price):
+def get_material_price(material_type, name_pattern, default_price, catalog=None):
     """Получение цены с фильтрацией по типу лестницы"""
-    if not prices_data:
+    if catalog is None:
+        catalog = price_catalog
+    if not catalog:
         return default_price
     
     try:
-        for item in prices_data:
-            if (item['stair_type'] == material_type and 
-                name_pattern.lower() in item['name'].lower()):
-                return item['price']
-        return default_price
+        return catalog.get_price(material_type, name_pattern, default_price)
     except Exception as e:
         logger.error(f"Ошибка поиска цены: {e}")
         return default_price
 
-def get_material_by_article(article):
+def get_material_by_article(article, catalog=None):
     """Получение материала по артикулу"""
-    if not prices_data:
+    if catalog is None:
+        catalog = price_catalog
+    if not catalog:
         return None
     
     try:
-        clean_article = str(article).split('.')[0] if '.' in str(article) else str(article)
-        for item in prices_data:
-            if item['article'] == clean_article:
-                return item
-        return None
+        return catalog.get_by_article(article)
     except Exception as e:
         logger.error(f"Ошибка поиска по артикулу {article}: {e}")
         return None
 
-def search_materials_by_article_or_name(search_term):
-    """Поиск материалов по артикулу или названию"""
-    if not prices_data:
-        return []
+def search_materials_by_article_or_name(search_term, limit=10):
+    """Поиск материалов по артикулу или названию: лучшие совпадения и их общее число"""
+    if not price_catalog:
+        return [], 0
     
     try:
-        search_term = search_term.lower().strip()
-        results = []
-        
-        for item in prices_data:
-            if (search_term in item['article'].lower() or 
-                search_term in item['name'].lower()):
-                results.append(item)
-        
-        return results
+        return price_catalog.search_ranked(search_term, limit)
     except Exception as e:
         logger.error(f"Ошибка поиска материалов: {e}")
-        return []
+        return [], 0
 
 def validate_input(value, min_val, max_val, field_name):
     """Проверка ввода на адекватность"""
@@ -207,26 +478,57 @@ def validate_input(value, min_val, max_val, field_name):
 
 async def add_message_to_delete(chat_id, message_id):
     """Добавляем сообщение в список для удаления"""
-    if chat_id not in MESSAGES_TO_DELETE:
-        MESSAGES_TO_DELETE[chat_id] = []
-    MESSAGES_TO_DELETE[chat_id].append(message_id)
+    history = chat_messages.get(chat_id) or ChatHistory()
+    history.message_ids.append(message_id)
     
-    if len(MESSAGES_TO_DELETE[chat_id]) > 50:
-        MESSAGES_TO_DELETE[chat_id] = MESSAGES_TO_DELETE[chat_id][-50:]
+    if len(history.message_ids) > MESSAGES_TO_DELETE_LIMIT:
+        del history.message_ids[:-MESSAGES_TO_DELETE_LIMIT]
+    chat_messages.put(chat_id, history)
+
+def pop_messages_to_delete(chat_id):
+    """Забираем список сообщений чата для удаления"""
+    history = chat_messages.pop(chat_id)
+    return history.message_ids if history is not None else []
 
-async def cleanup_chat_history(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Очистка истории чата"""
+def retry_after_seconds(error):
+    """Пауза из RetryAfter в секундах (int или timedelta в разных версиях PTB)"""
+    delay = error.retry_after
+    return delay.total_seconds() if hasattr(delay, 'total_seconds') else delay
+
+async def call_with_retry(method, **kwargs):
+    """Вызов Bot API с ожиданием при ограничении частоты запросов"""
+    for attempt in range(DELETE_RETRIES + 1):
+        try:
+            return await method(**kwargs)
+        except RetryAfter as e:
+            if attempt == DELETE_RETRIES:
+                raise
+            logger.debug(f"Telegram просит подождать {retry_after_seconds(e)} с")
+            await asyncio.sleep(retry_after_seconds(e))
+
+async def delete_messages(bot, chat_id, message_ids):
+    """Параллельное удаление сообщений по одному (в python-telegram-bot 20.7 нет deleteMessages)"""
+    async def delete_one(message_id):
+        async with delete_semaphore:
+            try:
+                await call_with_retry(bot.delete_message, chat_id=chat_id, message_id=message_id)
+            except Exception as e:
+                logger.debug(f"Не удалось удалить сообщение {message_id}: {e}")
+    
+    await asyncio.gather(*(delete_one(message_id) for message_id in message_ids))
+
+async def cleanup_chat_history(update: Update, context: ContextTypes.DEFAULT_TYPE, background=False):
+    """Очистка истории чата (при background=True удаление идет в фоне, ответ отправляется сразу)"""
     try:
         chat_id = update.effective_chat.id
         
-        if chat_id in MESSAGES_TO_DELETE:
-            for message_id in MESSAGES_TO_DELETE[chat_id]:
-                try:
-                    await context.bot.delete_message(chat_id=chat_id, message_id=message_id)
-                except Exception as e:
-                    logger.debug(f"Не удалось удалить сообщение {message_id}: {e}")
-            
-            MESSAGES_TO_DELETE[chat_id] = []
+        # Забираем список сразу, чтобы новые сообщения в него уже не попали
+        message_ids = pop_messages_to_delete(chat_id)
+        if message_ids:
+            if background:
+                context.application.create_task(delete_messages(context.bot, chat_id, message_ids))
+            else:
+                await delete_messages(context.bot, chat_id, message_ids)
             
         logger.info(f"История чата очищена для пользователя {update.effective_user.id}")
     except Exception as e:
@@ -238,37 +540,29 @@ async def send_message_with_cleanup(update: Update, context: ContextTypes.DEFAUL
     await add_message_to_delete(update.effective_chat.id, message.message_id)
     return message
 
-def optimize_stringers(stringer_length):
-    """Оптимизация раскроя тетивы для минимизации отходов"""
-    total_stringer_qty = 2
-    
-    if stringer_length <= 3000:
-        return [{'length': 3000, 'qty': total_stringer_qty}], total_stringer_qty
+def get_stringer_stock(material_type, catalog=None):
+    """Длины и цены досок для тетив из прайса"""
+    if catalog is None:
+        catalog = price_catalog
+    if not catalog:
+        return STRINGER_STOCK
     
-    elif stringer_length <= 4000:
-        return [{'length': 4000, 'qty': total_stringer_qty}], total_stringer_qty
-    
-    else:
-        qty_4000 = math.ceil(stringer_length / 4000) * total_stringer_qty
-        waste_4000 = (qty_4000 * 4000) - (stringer_length * total_stringer_qty)
-        
-        qty_4000_combo = math.floor(stringer_length / 4000) * total_stringer_qty
-        remaining_length = (stringer_length * total_stringer_qty) - (qty_4000_combo * 4000)
-        qty_3000_combo = math.ceil(remaining_length / 3000) if remaining_length > 0 else 0
-        waste_combo = (qty_4000_combo * 4000 + qty_3000_combo * 3000) - (stringer_length * total_stringer_qty)
-        
-        if waste_4000 <= waste_combo:
-            return [{'length': 4000, 'qty': qty_4000}], qty_4000
-        else:
-            result = []
-            if qty_4000_combo > 0:
-                result.append({'length': 4000, 'qty': qty_4000_combo})
-            if qty_3000_combo > 0:
-                result.append({'length': 3000, 'qty': qty_3000_combo})
-            return result, qty_4000_combo + qty_3000_combo
-
-def calculate_wood_stairs(height, steps_count, config, material_type, actual_step_height, step_width):
+    try:
+        return catalog.find_stock(material_type, 'Тетива') or STRINGER_STOCK
+    except Exception as e:
+        logger.error(f"Ошибка поиска досок для тетив: {e}")
+        return STRINGER_STOCK
+
+def optimize_stringers(pieces, stock):
+    """Самый дешевый раскрой тетив всех маршей из досок прайса"""
+    stringers, total_stringer_qty, _ = cut_stock(pieces, stock)
+    return stringers, total_stringer_qty
+
+def calculate_wood_stairs(height, steps_count, config, material_type, actual_step_height, step_width, catalog=None):
     """Расчет деревянной лестницы с фиксированной высотой ступени 225 мм"""
+    if catalog is None:
+        catalog = price_catalog
+    
     materials = []
     total_cost = 0
     
@@ -289,6 +583,8 @@ def calculate_wood_stairs(height, steps_count, config, material_type, actual_ste
         stair_length = (steps_count - 1) * step_depth
         stringer_length = math.sqrt(height**2 + stair_length**2)
         total_stringer_length = stringer_length * 2
+        # По две тетивы на марш
+        stringer_pieces = [stringer_length] * 2
         
     elif config == 'l_shape':
         first_flight_steps = math.ceil(steps_count / 2)
@@ -304,6 +600,7 @@ def calculate_wood_stairs(height, steps_count, config, material_type, actual_ste
         second_stringer_length = math.sqrt(second_flight_height**2 + second_flight_length**2)
         
         total_stringer_length = (first_stringer_length + second_stringer_length) * 2
+        stringer_pieces = [first_stringer_length] * 2 + [second_stringer_length] * 2
         
     else:
         flights_steps = math.ceil(steps_count / 3)
@@ -317,61 +614,64 @@ def calculate_wood_stairs(height, steps_count, config, material_type, actual_ste
         
         flight_stringer_length = math.sqrt(flight_height**2 + flight_length**2)
         total_stringer_length = flight_stringer_length * 4
+        stringer_pieces = [flight_stringer_length] * 4
     
-    stringers_optimized, total_stringer_qty = optimize_stringers(total_stringer_length / 2)
+    stringer_stock = get_stringer_stock(material_type, catalog=catalog)
+    stringers_optimized, total_stringer_qty = optimize_stringers(stringer_pieces, stringer_stock)
+    stringer_prices = dict(stringer_stock)
     
     for stringer in stringers_optimized:
-        stringer_price = get_material_price(material_type, f'Тетива {stringer["length"]}', 10215 if stringer["length"] == 4000 else 9518)
+        stringer_price = stringer_prices[stringer["length"]]
         stringer_cost = stringer_price * stringer["qty"]
         
-        materials.append({
-            'name': f'Тетива {stringer["length"]}мм',
-            'qty': stringer["qty"],
-            'unit': 'шт.',
-            'price': stringer_price,
-            'total': stringer_cost
-        })
+        materials.append(MaterialLine(
+            name=f'Тетива {stringer["length"]}мм',
+            qty=stringer["qty"],
+            unit='шт.',
+            price=stringer_price,
+            total=stringer_cost
+        ))
         total_cost += stringer_cost
     
-    step_price = get_material_price(material_type, f'СТУПЕНЬ ПРЯМАЯ {step_width}', 1500)
+    step_price = get_material_price(material_type, f'СТУПЕНЬ ПРЯМАЯ {step_width}', 1500, catalog=catalog)
     step_cost = steps_count * step_price
     
-    materials.append({
-        'name': f'Ступень {step_width}×300мм',
-        'qty': steps_count,
-        'unit': 'шт.',
-        'price': step_price,
-        'total': step_cost
-    })
+    materials.append(MaterialLine(
+        name=f'Ступень {step_width}×300мм',
+        qty=steps_count,
+        unit='шт.',
+        price=step_price,
+        total=step_cost
+    ))
     total_cost += step_cost
     
-    riser_price = get_material_price(material_type, f'Подступенок {step_width}', 600)
+    riser_price = get_material_price(material_type, f'Подступенок {step_width}', 600, catalog=catalog)
     riser_cost = steps_count * riser_price
     
-    materials.append({
-        'name': f'Подступенок {step_width}×200мм',
-        'qty': steps_count,
-        'unit': 'шт.',
-        'price': riser_price,
-        'total': riser_cost
-    })
+    materials.append(MaterialLine(
+        name=f'Подступенок {step_width}×200мм',
+        qty=steps_count,
+        unit='шт.',
+        price=riser_price,
+        total=riser_cost
+    ))
     total_cost += riser_cost
     
     if platforms_count > 0:
         platform_size = 1000 if step_width in ["900", "1000"] else 1200
-        platform_price = get_material_price(material_type, f'Площадка {platform_size}', 8000 if platform_size == 1000 else 9500)
+        platform_price = get_material_price(material_type, f'Площадка {platform_size}', 8000 if platform_size == 1000 else 9500, catalog=catalog)
         platform_cost = platforms_count * platform_price
         
-        materials.append({
-            'name': f'Площадка {platform_size}×{platform_size}мм',
-            'qty': platforms_count,
-            'unit': 'шт.',
-            'price': platform_price,
-            'total': platform_cost
-        })
+        materials.append(MaterialLine(
+            name=f'Площадка {platform_size}×{platform_size}мм',
+            qty=platforms_count,
+            unit='шт.',
+            price=platform_price,
+            total=platform_cost
+        ))
         total_cost += platform_cost
     
-    post_price = get_material_price(material_type, 'Столб', 1931)
+    post_price = get_material_price(material_type, 'Столб', 1931, catalog=catalog)
     if config == 'straight':
         posts_qty = 2
     elif config == 'l_shape':
@@ -381,60 +681,63 @@ def calculate_wood_stairs(height, steps_count, config, material_type, actual_ste
     
     posts_cost = posts_qty * post_price
     
-    materials.append({
-        'name': 'Столб опорный',
-        'qty': posts_qty,
-        'unit': 'шт.',
-        'price': post_price,
-        'total': posts_cost
-    })
+    materials.append(MaterialLine(
+        name='Столб опорный',
+        qty=posts_qty,
+        unit='шт.',
+        price=post_price,
+        total=posts_cost
+    ))
     total_cost += posts_cost
     
-    baluster_price = get_material_price(material_type, 'Балясина', 400)
+    baluster_price = get_material_price(material_type, 'Балясина', 400, catalog=catalog)
     balusters_qty = steps_count + platforms_count
     balusters_cost = balusters_qty * baluster_price
     
-    materials.append({
-        'name': 'Балясина',
-        'qty': balusters_qty,
-        'unit': 'шт.',
-        'price': baluster_price,
-        'total': balusters_cost
-    })
+    materials.append(MaterialLine(
+        name='Балясина',
+        qty=balusters_qty,
+        unit='шт.',
+        price=baluster_price,
+        total=balusters_cost
+    ))
     total_cost += balusters_cost
     
     handrail_length = total_stringer_length / 2
     handrail_qty = math.ceil(handrail_length / 3000)
-    handrail_price = get_material_price(material_type, 'ПОРУЧЕНЬ', 2108)
+    handrail_price = get_material_price(material_type, 'ПОРУЧЕНЬ', 2108, catalog=catalog)
     handrail_cost = handrail_qty * handrail_price
     
-    materials.append({
-        'name': 'Поручень 3000мм',
-        'qty': handrail_qty,
-        'unit': 'шт.',
-        'price': handrail_price,
-        'total': handrail_cost
-    })
+    materials.append(MaterialLine(
+        name='Поручень 3000мм',
+        qty=handrail_qty,
+        unit='шт.',
+        price=handrail_price,
+        total=handrail_cost
+    ))
     total_cost += handrail_cost
     
-    return {
-        'type': 'wood',
-        'config': config,
-        'height': height,
-        'step_width': step_width,
-        'steps_count': steps_count,
-        'platforms_count': platforms_count,
-        'step_height': actual_step_height,
-        'stringer_length': total_stringer_length / 2,
-        'stringer_qty': total_stringer_qty,
-        'stringers_detail': stringers_optimized,
-        'posts_count': posts_qty,
-        'materials': materials,
-        'total_cost': total_cost
-    }
+    return StairQuote(
+        type='wood',
+        config=config,
+        height=height,
+        step_width=step_width,
+        steps_count=steps_count,
+        platforms_count=platforms_count,
+        step_height=actual_step_height,
+        stringer_length=total_stringer_length / 2,
+        stringer_qty=total_stringer_qty,
+        stringers_detail=stringers_optimized,
+        posts_count=posts_qty,
+        materials=materials,
+        total_cost=total_cost
+    )
 
-def calculate_modular_stairs(height, steps_count, config, material_type, actual_step_height, step_width):
+def calculate_modular_stairs(height, steps_count, config, material_type, actual_step_height, step_width, catalog=None):
     """Расчет модульной лестницы с фиксированной высотой ступени 225 мм"""
+    if catalog is None:
+        catalog = price_catalog
+    
     materials = []
     total_cost = 0
     
@@ -449,161 +752,194 @@ def calculate_modular_stairs(height, steps_count, config, material_type, actual_
         platforms_count = 2
         steps_count = max(1, steps_count - 2)
     
-    support_1000 = get_material_by_article('15762374')
-    support_2000 = get_material_by_article('15762382')
+    support_1000 = get_material_by_article('15762374', catalog=catalog)
+    support_2000 = get_material_by_article('15762382', catalog=catalog)
     
     if support_1000:
-        materials.append({
-            'name': support_1000['name'],
-            'qty': 1,
-            'unit': 'шт.',
-            'price': support_1000['price'],
-            'total': support_1000['price']
-        })
+        materials.append(MaterialLine(
+            name=support_1000['name'],
+            qty=1,
+            unit='шт.',
+            price=support_1000['price'],
+            total=support_1000['price']
+        ))
         total_cost += support_1000['price']
     
     if support_2000:
-        materials.append({
-            'name': support_2000['name'],
-            'qty': 1,
-            'unit': 'шт.',
-            'price': support_2000['price'],
-            'total': support_2000['price']
-        })
+        materials.append(MaterialLine(
+            name=support_2000['name'],
+            qty=1,
+            unit='шт.',
+            price=support_2000['price'],
+            total=support_2000['price']
+        ))
         total_cost += support_2000['price']
     
-    module_price = get_material_price(material_type, 'Промежуточный элемент', 4076)
+    module_price = get_material_price(material_type, 'Промежуточный элемент', 4076, catalog=catalog)
     modules_qty = steps_count - 1
     modules_cost = modules_qty * module_price
     
-    materials.append({
-        'name': 'Промежуточный элемент',
-        'qty': modules_qty,
-        'unit': 'шт.',
-        'price': module_price,
-        'total': modules_cost
-    })
+    materials.append(MaterialLine(
+        name='Промежуточный элемент',
+        qty=modules_qty,
+        unit='шт.',
+        price=module_price,
+        total=modules_cost
+    ))
     total_cost += modules_cost
     
-    end_module_price = get_material_price(material_type, 'Верхний и нижний элемент', 7590)
-    materials.append({
-        'name': 'Верхний и нижний элемент',
-        'qty': 1,
-        'unit': 'шт.',
-        'price': end_module_price,
-        'total': end_module_price
-    })
+    end_module_price = get_material_price(material_type, 'Верхний и нижний элемент', 7590, catalog=catalog)
+    materials.append(MaterialLine(
+        name='Верхний и нижний элемент',
+        qty=1,
+        unit='шт.',
+        price=end_module_price,
+        total=end_module_price
+    ))
     total_cost += end_module_price
     
-    corner_element = get_material_by_article('15762391')
+    corner_element = get_material_by_article('15762391', catalog=catalog)
     if corner_element:
         if config == 'l_shape':
-            materials.append({
-                'name': corner_element['name'],
-                'qty': 1,
-                'unit': 'шт.',
-                'price': corner_element['price'],
-                'total': corner_element['price']
-            })
+            materials.append(MaterialLine(
+                name=corner_element['name'],
+                qty=1,
+                unit='шт.',
+                price=corner_element['price'],
+                total=corner_element['price']
+            ))
             total_cost += corner_element['price']
         elif config == 'u_shape':
-            materials.append({
-                'name': corner_element['name'],
-                'qty': 2,
-                'unit': 'шт.',
-                'price': corner_element['price'],
-                'total': corner_element['price'] * 2
-            })
+            materials.append(MaterialLine(
+                name=corner_element['name'],
+                qty=2,
+                unit='шт.',
+                price=corner_element['price'],
+                total=corner_element['price'] * 2
+            ))
             total_cost += corner_element['price'] * 2
     
     if platforms_count > 0:
-        platform_price = get_material_price(material_type, 'Площадка', 8000)
-        materials.append({
-            'name': f'Площадка {step_width}x{step_width}',
-            'qty': platforms_count,
-            'unit': 'шт.',
-            'price': platform_price,
-            'total': platform_price * platforms_count
-        })
+        platform_price = get_material_price(material_type, 'Площадка', 8000, catalog=catalog)
+        materials.append(MaterialLine(
+            name=f'Площадка {step_width}x{step_width}',
+            qty=platforms_count,
+            unit='шт.',
+            price=platform_price,
+            total=platform_price * platforms_count
+        ))
         total_cost += platform_price * platforms_count
     
-    step_price = get_material_price(material_type, f'СТУПЕНЬ ПРЯМАЯ {step_width}', 1500)
+    step_price = get_material_price(material_type, f'СТУПЕНЬ ПРЯМАЯ {step_width}', 1500, catalog=catalog)
     step_cost = steps_count * step_price
     
-    materials.append({
-        'name': f'Ступень {step_width}×300мм',
-        'qty': steps_count,
-        'unit': 'шт.',
-        'price': step_price,
-        'total': step_cost
-    })
+    materials.append(MaterialLine(
+        name=f'Ступень {step_width}×300мм',
+        qty=steps_count,
+        unit='шт.',
+        price=step_price,
+        total=step_cost
+    ))
     total_cost += step_cost
     
-    railing_price = get_material_price(material_type, 'Опора под поручень', 900)
+    railing_price = get_material_price(material_type, 'Опора под поручень', 900, catalog=catalog)
     railing_qty = steps_count + platforms_count
     railing_cost = railing_qty * railing_price
     
-    materials.append({
-        'name': 'Опора под поручень',
-        'qty': railing_qty,
-        'unit': 'шт.',
-        'price': railing_price,
-        'total': railing_cost
-    })
+    materials.append(MaterialLine(
+        name='Опора под поручень',
+        qty=railing_qty,
+        unit='шт.',
+        price=railing_price,
+        total=railing_cost
+    ))
     total_cost += railing_cost
     
     handrail_length = math.sqrt(height**2 + (steps_count * 300)**2) / 1000
     handrail_qty = math.ceil(handrail_length / 3)
-    handrail_price = get_material_price(material_type, 'ПОРУЧЕНЬ', 2108)
+    handrail_price = get_material_price(material_type, 'ПОРУЧЕНЬ', 2108, catalog=catalog)
     handrail_cost = handrail_qty * handrail_price
     
-    materials.append({
-        'name': 'Поручень 3000мм',
-        'qty': handrail_qty,
-        'unit': 'шт.',
-        'price': handrail_price,
-        'total': handrail_cost
-    })
+    materials.append(MaterialLine(
+        name='Поручень 3000мм',
+        qty=handrail_qty,
+        unit='шт.',
+        price=handrail_price,
+        total=handrail_cost
+    ))
     total_cost += handrail_cost
     
-    return {
-        'type': 'modular',
-        'config': config,
-        'height': height,
-        'step_width': step_width,
-        'steps_count': steps_count,
-        'platforms_count': platforms_count,
-        'step_height': actual_step_height,
-        'stringer_length': handrail_length,
-        'materials': materials,
-        'total_cost': total_cost
-    }
+    return StairQuote(
+        type='modular',
+        config=config,
+        height=height,
+        step_width=step_width,
+        steps_count=steps_count,
+        platforms_count=platforms_count,
+        step_height=actual_step_height,
+        stringer_length=handrail_length,
+        materials=materials,
+        total_cost=total_cost
+    )
+
+def run_calculator(stair_type, config, material_type, height, step_width, catalog=None):
+    """Расчет лестницы калькулятором нужного типа без кэша"""
+    calculator = calculate_wood_stairs if stair_type == 'wood' else calculate_modular_stairs
+    return calculator(
+        height=height,
+        steps_count=0,
+        config=config,
+        material_type=material_type,
+        actual_step_height=FIXED_STEP_HEIGHT,
+        step_width=step_width,
+        catalog=catalog
+    )
+
+def lookup_quote(stair_type, config, material_type, height, step_width, catalog=None):
+    """Готовый расчет из таблицы или None, если таблицы для этого прайса еще нет"""
+    if catalog is None:
+        catalog = price_catalog
+    table = quote_table
+    if table is None or catalog is None or table.version != catalog.version:
+        return None
+    return table.get(stair_type, config, material_type, height, step_width)
+
+def quote_key(stair_type, config, material_type, height, step_width, catalog=None):
+    """Ключ расчета в кэшах: входные данные и версия прайса"""
+    # Тип высоты тоже в ключе: 3000 и 3000.0 дают разный текст результата
+    version = catalog.version if catalog is not None else None
+    return (stair_type, config, material_type, type(height), height, step_width, version)
+
+def calculate_stairs(stair_type, config, material_type, height, step_width, catalog=None):
+    """Расчет лестницы: по таблице готовых расчетов или с кэшированием по входным данным и версии прайса"""
+    # Результат из кэша общий для всех запросов, изменять его нельзя
+    if catalog is None:
+        catalog = price_catalog
+    
+    result = lookup_quote(stair_type, config, material_type, height, step_width, catalog)
+    if result is not None:
+        return result
+    
+    key = quote_key(stair_type, config, material_type, height, step_width, catalog)
+    result = calculation_cache.get(key)
+    if result is not None:
+        return result
+    
+    result = run_calculator(stair_type, config, material_type, height, step_width, catalog)
+    calculation_cache.put(key, result)
+    return result
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик команды /start"""
-    await cleanup_chat_history(update, context)
+    await cleanup_chat_history(update, context, background=True)
     
-    if prices_data is None:
-        load_prices()
+    if price_catalog is None:
+        await load_prices_async()
     
     user = update.effective_user
-    welcome_text = (
-        f"👋 Добро пожаловать, {user.first_name}!\n"
-        "Я твой помощник в расчете лестниц.\n\n"
-        "📋 *Доступные функции:*\n"
-        "• 🏠 *Расчет лестницы* - полный расчет стоимости\n"
-        "• 🔍 *Поиск материала* - найти материал по артикулу или названию\n\n"
-        "Выберите действие:"
+    message = await update.message.reply_text(
+        ui.welcome_text(user.first_name), reply_markup=ui.MAIN_MENU, parse_mode='Markdown'
     )
-    
-    keyboard = [
-        [InlineKeyboardButton("🔄 Рассчитать лестницу", callback_data="calculate_stairs")],
-        [InlineKeyboardButton("🔍 Найти материал", callback_data="search_material")],
-        [InlineKeyboardButton("🔄 Перезапустить", callback_data="restart")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    message = await update.message.reply_text(welcome_text, reply_markup=reply_markup, parse_mode='Markdown')
     await add_message_to_delete(update.effective_chat.id, message.message_id)
 
 async def restart_bot(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -612,36 +948,15 @@ async def restart_bot(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     
     chat_id = query.message.chat_id
-    if chat_id in MESSAGES_TO_DELETE:
-        for message_id in MESSAGES_TO_DELETE[chat_id]:
-            try:
-                await context.bot.delete_message(chat_id=chat_id, message_id=message_id)
-            except Exception as e:
-                logger.debug(f"Не удалось удалить сообщение {message_id}: {e}")
-        MESSAGES_TO_DELETE[chat_id] = []
+    message_ids = pop_messages_to_delete(chat_id)
+    if message_ids:
+        await delete_messages(context.bot, chat_id, message_ids)
     
     user = query.from_user
     user_id = user.id
-    if user_id in user_data:
-        del user_data[user_id]
-    
-    welcome_text = (
-        f"👋 Добро пожаловать, {user.first_name}!\n"
-        "Я твой помощник в расчете лестниц.\n\n"
-        "📋 *Доступные функции:*\n"
-        "• 🏠 *Расчет лестницы* - полный расчет стоимости\n"
-        "• 🔍 *Поиск материала* - найти материал по артикулу или названию\n\n"
-        "Выберите действие:"
-    )
-    
-    keyboard = [
-        [InlineKeyboardButton("🔄 Рассчитать лестницу", callback_data="calculate_stairs")],
-        [InlineKeyboardButton("🔍 Найти материал", callback_data="search_material")],
-        [InlineKeyboardButton("🔄 Перезапустить", callback_data="restart")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    user_sessions.pop(user_id)
     
-    await query.edit_message_text(welcome_text, reply_markup=reply_markup, parse_mode='Markdown')
+    await query.edit_message_text(ui.welcome_text(user.first_name), reply_markup=ui.MAIN_MENU, parse_mode='Markdown')
 
 async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик нажатий на кнопки"""
@@ -649,43 +964,28 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     
     if query.data == "calculate_stairs":
-        await cleanup_chat_history(update, context)
+        await cleanup_chat_history(update, context, background=True)
         
         user_id = query.from_user.id
-        if user_id not in user_data:
-            user_data[user_id] = {}
-        
-        reply_keyboard = [
-            ["🏠 Деревянная", "⚡ Модульная"],
-            ["🔍 Найти материал", "🔄 Перезапустить"]
-        ]
+        if user_sessions.get(user_id) is None:
+            user_sessions.put(user_id, UserSession())
         
         message = await context.bot.send_message(
             chat_id=query.message.chat_id,
-            text="👋 Добро пожаловать!\n\n"
-                 "📋 *Выберите тип лестницы:*\n"
-                 "• 🏠 *Деревянная* - из отдельных элементов\n"
-                 "• ⚡ *Модульная* - металлическая система",
-            reply_markup=ReplyKeyboardMarkup(reply_keyboard, one_time_keyboard=True, resize_keyboard=True),
+            text=ui.TYPE_PROMPT,
+            reply_markup=ui.TYPE_KEYBOARD,
             parse_mode='Markdown'
         )
         await add_message_to_delete(query.message.chat_id, message.message_id)
         return SELECTING_TYPE
     
     elif query.data == "search_material":
-        await cleanup_chat_history(update, context)
-        
-        reply_keyboard = [["🔄 Перезапустить"]]
+        await cleanup_chat_history(update, context, background=True)
         
         message = await context.bot.send_message(
             chat_id=query.message.chat_id,
-            text="🔍 *ПОИСК МАТЕРИАЛА*\n\n"
-                 "Введите артикул или название материала для поиска:\n\n"
-                 "Примеры:\n"
-                 "• `15762294` - поиск по артикулу\n"
-                 "• `Ступень` - поиск по названию\n"
-                 "• `Тетива` - поиск по названию",
-            reply_markup=ReplyKeyboardMarkup(reply_keyboard, one_time_keyboard=True, resize_keyboard=True),
+            text=ui.SEARCH_PROMPT,
+            reply_markup=ui.RESTART_KEYBOARD,
             parse_mode='Markdown'
         )
         await add_message_to_delete(query.message.chat_id, message.message_id)
@@ -701,7 +1001,7 @@ async def search_material(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     
     await add_message_to_delete(update.effective_chat.id, update.message.message_id)
     
-    if search_term == "🔄 Перезапустить":
+    if search_term == ui.RESTART_BUTTON:
         await restart_from_message(update, context)
         return ConversationHandler.END
     
@@ -709,51 +1009,50 @@ async def search_material(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await send_message_with_cleanup(update, context, "❌ Пожалуйста, введите артикул или название для поиска")
         return SEARCH_MATERIAL
     
-    search_msg = await send_message_with_cleanup(update, context, "🔍 Ищу материалы...")
+    search_msg = await send_message_with_cleanup(update, context, ui.SEARCHING_TEXT)
     
-    results = search_materials_by_article_or_name(search_term)
+    try:
+        # Поиск с опечатками по большому прайсу занимает десятки миллисекунд: в пуле расчетов, а не в цикле событий
+        results, total = await calculation_service.run(
+            user_id, search_materials_by_article_or_name, search_term, limit=10
+        )
+    except CalculationCancelled:
+        # Пользователь уже перезапустил диалог, сообщения удалит перезапуск
+        logger.info(f"Поиск отменен пользователем {user_id}")
+        return ConversationHandler.END
+    except (TimeoutError, CalculationBusy) as e:
+        logger.warning(f"Поиск для пользователя {user_id} не выполнен: {e!r}")
+        results, total = None, 0
     
     try:
         await context.bot.delete_message(chat_id=update.effective_chat.id, message_id=search_msg.message_id)
     except:
         pass
     
-    if not results:
-        await send_message_with_cleanup(
-            update, context,
-            f"❌ Материалы по запросу '{search_term}' не найдены.\n\n"
-            "Попробуйте:\n"
-            "• Проверить правильность артикула\n"
-            "• Использовать другое название\n"
-            "• Упростить запрос"
-        )
+    if results is None:
+        await send_message_with_cleanup(update, context, "⏳ Сейчас выполняется много запросов. Попробуйте через минуту.")
         return SEARCH_MATERIAL
     
-    message_text = f"🔍 *РЕЗУЛЬТАТЫ ПОИСКА* ('{search_term}')\n\n"
+    if not results:
+        await send_message_with_cleanup(update, context, ui.search_not_found_text(search_term))
+        return SEARCH_MATERIAL
     
-    for i, item in enumerate(results[:10], 1):  # Ограничиваем вывод 10 результатами
-        message_text += (
-            f"*{i}. {item['name']}*\n"
-            f"📋 Артикул: `{item['article']}`\n"
-            f"🏷 Тип: {item['stair_type']}\n"
-            f"📏 Размеры: {item.get('sizes', 'не указаны')}\n"
-            f"💰 Цена: {item['price']:,.0f} ₽\n"
-            f"📦 Ед. изм.: {item['unit']}\n\n"
+    parts = [ui.search_title(search_term)]
+    # Выводим не более 10 лучших результатов
+    parts += [
+        ui.search_item_text(
+            i, item['name'], item['article'], item['stair_type'], item.get('sizes', 'не указаны'),
+            item['price'], item['unit']
         )
+        for i, item in enumerate(results, 1)
+    ]
     
-    if len(results) > 10:
-        message_text += f"*... и еще {len(results) - 10} материалов*"
-    
-    message_text += "\n_Для нового поиска введите артикул или название_"
+    if total > len(results):
+        parts.append(ui.search_more(total - len(results)))
     
-    keyboard = [
-        [InlineKeyboardButton("🔄 Новый поиск", callback_data="search_material")],
-        [InlineKeyboardButton("🏠 Расчет лестницы", callback_data="calculate_stairs")],
-        [InlineKeyboardButton("🔄 Перезапустить", callback_data="restart")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    parts.append(ui.SEARCH_FOOTER)
     
-    message = await update.message.reply_text(message_text, reply_markup=reply_markup, parse_mode='Markdown')
+    message = await update.message.reply_text(''.join(parts), reply_markup=ui.SEARCH_MENU, parse_mode='Markdown')
     await add_message_to_delete(update.effective_chat.id, message.message_id)
     
     return ConversationHandler.END
@@ -765,46 +1064,25 @@ async def select_type(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
     
     await add_message_to_delete(update.effective_chat.id, update.message.message_id)
     
-    if user_choice == "🔄 Перезапустить":
+    if user_choice == ui.RESTART_BUTTON:
         await restart_from_message(update, context)
         return ConversationHandler.END
     
-    if user_choice == "🔍 Найти материал":
-        await cleanup_chat_history(update, context)
-        
-        reply_keyboard = [["🔄 Перезапустить"]]
+    if user_choice == ui.SEARCH_BUTTON:
+        await cleanup_chat_history(update, context, background=True)
         
         await send_message_with_cleanup(
-            update, context,
-            "🔍 *ПОИСК МАТЕРИАЛА*\n\n"
-            "Введите артикул или название материала для поиска:\n\n"
-            "Примеры:\n"
-            "• `15762294` - поиск по артикулу\n"
-            "• `Ступень` - поиск по названию\n"
-            "• `Тетива` - поиск по названию",
-            reply_markup=ReplyKeyboardMarkup(reply_keyboard, one_time_keyboard=True, resize_keyboard=True),
-            parse_mode='Markdown'
+            update, context, ui.SEARCH_PROMPT, reply_markup=ui.RESTART_KEYBOARD, parse_mode='Markdown'
         )
         return SEARCH_MATERIAL
     
-    user_data[user_id] = {
-        'type': 'wood' if 'Деревянная' in user_choice else 'modular',
-        'material_type': 'деревянная' if 'Деревянная' in user_choice else 'металлическая'
-    }
-    
-    reply_keyboard = [
-        ["📏 Прямая", "📐 Г-образная", "🔄 П-образная"],
-        ["🔍 Найти материал", "🔄 Перезапустить"]
-    ]
+    user_sessions.put(user_id, UserSession(
+        stair_type='wood' if 'Деревянная' in user_choice else 'modular',
+        material_type='деревянная' if 'Деревянная' in user_choice else 'металлическая'
+    ))
     
     await send_message_with_cleanup(
-        update, context,
-        "📐 *Выберите конфигурацию лестницы:*\n\n"
-        "• 📏 *Прямая* - одномаршевая лестница\n"
-        "• 📐 *Г-образная* - с поворотом на 90°\n" 
-        "• 🔄 *П-образная* - с поворотом на 180°",
-        reply_markup=ReplyKeyboardMarkup(reply_keyboard, one_time_keyboard=True, resize_keyboard=True),
-        parse_mode='Markdown'
+        update, context, ui.CONFIG_PROMPT, reply_markup=ui.CONFIG_KEYBOARD, parse_mode='Markdown'
     )
     return SELECTING_CONFIG
 
@@ -815,48 +1093,26 @@ async def select_config(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
     
     await add_message_to_delete(update.effective_chat.id, update.message.message_id)
     
-    if user_choice == "🔄 Перезапустить":
+    if user_choice == ui.RESTART_BUTTON:
         await restart_from_message(update, context)
         return ConversationHandler.END
     
-    if user_choice == "🔍 Найти материал":
-        await cleanup_chat_history(update, context)
-        
-        reply_keyboard = [["🔄 Перезапустить"]]
+    if user_choice == ui.SEARCH_BUTTON:
+        await cleanup_chat_history(update, context, background=True)
         
         await send_message_with_cleanup(
-            update, context,
-            "🔍 *ПОИСК МАТЕРИАЛА*\n\n"
-            "Введите артикул или название материала для поиска:\n\n"
-            "Примеры:\n"
-            "• `15762294` - поиск по артикулу\n"
-            "• `Ступень` - поиск по названию\n"
-            "• `Тетива` - поиск по названию",
-            reply_markup=ReplyKeyboardMarkup(reply_keyboard, one_time_keyboard=True, resize_keyboard=True),
-            parse_mode='Markdown'
+            update, context, ui.SEARCH_PROMPT, reply_markup=ui.RESTART_KEYBOARD, parse_mode='Markdown'
         )
         return SEARCH_MATERIAL
     
-    config_map = {
-        '📏 Прямая': 'straight',
-        '📐 Г-образная': 'l_shape', 
-        '🔄 П-образная': 'u_shape'
-    }
-    
-    user_data[user_id]['config'] = config_map[user_choice]
-    
-    reply_keyboard = [["🔄 Перезапустить"]]
+    session = user_sessions.get(user_id)
+    if session is None:
+        return await restart_expired_session(update, context)
+    session.config = ui.CONFIG_CHOICES[user_choice]
+    user_sessions.put(user_id, session)
     
     await send_message_with_cleanup(
-        update, context,
-        "📏 *Введите высоту лестницы (мм):*\n\n"
-        "Примеры:\n"
-        "• 2700 - для высоты 2.7 метра\n" 
-        "• 3000 - для высоты 3 метра\n"
-        "• 3500 - для высоты 3.5 метра\n\n"
-        "📝 *Рекомендация:* Высота измеряется от чистого пола нижнего этажа до чистого пола верхнего этажа",
-        reply_markup=ReplyKeyboardMarkup(reply_keyboard, one_time_keyboard=True, resize_keyboard=True),
-        parse_mode='Markdown'
+        update, context, ui.HEIGHT_PROMPT, reply_markup=ui.RESTART_KEYBOARD, parse_mode='Markdown'
     )
     return INPUT_HEIGHT
 
@@ -867,31 +1123,24 @@ async def input_height(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
     
     await add_message_to_delete(update.effective_chat.id, update.message.message_id)
     
-    if height_input == "🔄 Перезапустить":
+    if height_input == ui.RESTART_BUTTON:
         await restart_from_message(update, context)
         return INPUT_HEIGHT
     
-    is_valid, result = validate_input(height_input, 1000, 5000, "Высота лестницы")
+    is_valid, result = validate_input(height_input, ui.MIN_HEIGHT, ui.MAX_HEIGHT, "Высота лестницы")
     
     if not is_valid:
         await send_message_with_cleanup(update, context, result)
         return INPUT_HEIGHT
     
-    user_data[user_id]['height'] = result
-    
-    reply_keyboard = [
-        ["900", "1000", "1200"],
-        ["🔍 Найти материал", "🔄 Перезапустить"]
-    ]
+    session = user_sessions.get(user_id)
+    if session is None:
+        return await restart_expired_session(update, context)
+    session.height = result
+    user_sessions.put(user_id, session)
     
     await send_message_with_cleanup(
-        update, context,
-        "📐 *Выберите ширину ступени:*\n\n"
-        "• 900 мм - компактный вариант\n"
-        "• 1000 мм - стандартная ширина\n"
-        "• 1200 мм - просторная лестница",
-        reply_markup=ReplyKeyboardMarkup(reply_keyboard, one_time_keyboard=True, resize_keyboard=True),
-        parse_mode='Markdown'
+        update, context, ui.STEP_WIDTH_PROMPT, reply_markup=ui.STEP_WIDTH_KEYBOARD, parse_mode='Markdown'
     )
     return SELECTING_STEP_SIZE
 
@@ -902,25 +1151,15 @@ async def select_step_size(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     
     await add_message_to_delete(update.effective_chat.id, update.message.message_id)
     
-    if step_width == "🔄 Перезапустить":
+    if step_width == ui.RESTART_BUTTON:
         await restart_from_message(update, context)
         return ConversationHandler.END
     
-    if step_width == "🔍 Найти материал":
-        await cleanup_chat_history(update, context)
-        
-        reply_keyboard = [["🔄 Перезапустить"]]
+    if step_width == ui.SEARCH_BUTTON:
+        await cleanup_chat_history(update, context, background=True)
         
         await send_message_with_cleanup(
-            update, context,
-            "🔍 *ПОИСК МАТЕРИАЛА*\n\n"
-            "Введите артикул или название материала для поиска:\n\n"
-            "Примеры:\n"
-            "• `15762294` - поиск по артикулу\n"
-            "• `Ступень` - поиск по названию\n"
-            "• `Тетива` - поиск по названию",
-            reply_markup=ReplyKeyboardMarkup(reply_keyboard, one_time_keyboard=True, resize_keyboard=True),
-            parse_mode='Markdown'
+            update, context, ui.SEARCH_PROMPT, reply_markup=ui.RESTART_KEYBOARD, parse_mode='Markdown'
         )
         return SEARCH_MATERIAL
     
@@ -928,80 +1167,62 @@ async def select_step_size(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         await send_message_with_cleanup(update, context, "❌ Пожалуйста, выберите ширину ступени из предложенных вариантов")
         return SELECTING_STEP_SIZE
     
-    user_data[user_id]['step_width'] = step_width
-    
-    calculation_msg = await send_message_with_cleanup(update, context, "🧮 *Выполняю расчет...*", parse_mode='Markdown')
+    session = user_sessions.get(user_id)
+    if session is None:
+        return await restart_expired_session(update, context)
+    session.step_width = step_width
+    user_sessions.put(user_id, session)
     
-    user_input = user_data[user_id]
+    calculation_msg = await send_message_with_cleanup(update, context, ui.CALCULATING_TEXT, parse_mode='Markdown')
     
     try:
-        if user_input['type'] == 'wood':
-            result = calculate_wood_stairs(
-                height=user_input['height'],
-                steps_count=0,
-                config=user_input['config'],
-                material_type=user_input['material_type'],
-                actual_step_height=FIXED_STEP_HEIGHT,
-                step_width=user_input['step_width']
-            )
-        else:
-            result = calculate_modular_stairs(
-                height=user_input['height'],
-                steps_count=0,
-                config=user_input['config'],
-                material_type=user_input['material_type'],
-                actual_step_height=FIXED_STEP_HEIGHT,
-                step_width=user_input['step_width']
+        catalog = price_catalog
+        key = quote_key(
+            session.stair_type, session.config, session.material_type, session.height, session.step_width, catalog
+        )
+        # Такой же расчет уже отправлялся: готовый текст без расчета и форматирования
+        result_text = quote_text_cache.get(key)
+        if result_text is None:
+            # Целая высота берется из таблицы сразу, остальное считается в пуле
+            result = lookup_quote(
+                session.stair_type, session.config, session.material_type, session.height, session.step_width, catalog
             )
+            if result is None:
+                result = await calculation_service.run(
+                    user_id,
+                    calculate_stairs,
+                    stair_type=session.stair_type,
+                    config=session.config,
+                    material_type=session.material_type,
+                    height=session.height,
+                    step_width=session.step_width,
+                    catalog=catalog
+                )
+            result_text = render_quote(result)
+            quote_text_cache.put(key, result_text)
         
         await context.bot.delete_message(chat_id=update.effective_chat.id, message_id=calculation_msg.message_id)
         
-        config_names = {
-            'straight': 'Прямая',
-            'l_shape': 'Г-образная', 
-            'u_shape': 'П-образная'
-        }
-        
-        type_names = {
-            'wood': 'Деревянная',
-            'modular': 'Модульная'
-        }
-        
-        result_text = (
-            f"📊 *РЕЗУЛЬТАТ РАСЧЕТА*\n\n"
-            f"🏷 *Тип:* {type_names[result['type']]}\n"
-            f"📐 *Конфигурация:* {config_names[result['config']]}\n"
-            f"📏 *Высота:* {result['height']:,} мм\n"
-            f"📐 *Ширина ступени:* {result['step_width']} мм\n"
-            f"🪜 *Количество ступеней:* {result['steps_count']}\n"
-            f"📏 *Высота ступени:* {result['step_height']:.1f} мм\n"
-        )
-        
-        if result['type'] == 'wood':
-            result_text += f"📏 *Длина тетивы:* {result['stringer_length']:.0f} мм\n"
-            result_text += f"🔢 *Количество тетив:* {result['stringer_qty']} шт\n"
-        
-        if result['platforms_count'] > 0:
-            result_text += f"🟦 *Количество площадок:* {result['platforms_count']}\n"
-        
-        result_text += f"\n📦 *МАТЕРИАЛЫ:*\n"
-        
-        for material in result['materials']:
-            result_text += f"• {material['name']}: {material['qty']} {material['unit']} × {material['price']:,.0f} ₽ = {material['total']:,.0f} ₽\n"
+        message = await update.message.reply_text(result_text, reply_markup=ui.QUOTE_MENU, parse_mode='Markdown')
+        await add_message_to_delete(update.effective_chat.id, message.message_id)
         
-        result_text += f"\n💰 *ОБЩАЯ СТОИМОСТЬ:* {result['total_cost']:,.0f} ₽\n\n"
-        result_text += "_*Примечание:* Стоимость указана без учета доставки и монтажа_\n"
+        return ConversationHandler.END
         
-        keyboard = [
-            [InlineKeyboardButton("🔄 Новый расчет", callback_data="calculate_stairs")],
-            [InlineKeyboardButton("🔍 Поиск материала", callback_data="search_material")],
-            [InlineKeyboardButton("🔄 Перезапустить", callback_data="restart")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+    except CalculationCancelled:
+        # Пользователь уже перезапустил диалог, сообщения удалит перезапуск
+        logger.info(f"Расчет отменен пользователем {user_id}")
+        return ConversationHandler.END
         
-        message = await update.message.reply_text(result_text, reply_markup=reply_markup, parse_mode='Markdown')
-        await add_message_to_delete(update.effective_chat.id, message.message_id)
+    except TimeoutError:
+        logger.warning(f"Расчет для пользователя {user_id} не уложился в {calculation_service.timeout} с")
+        await context.bot.delete_message(chat_id=update.effective_chat.id, message_id=calculation_msg.message_id)
+        await send_message_with_cleanup(update, context, "⏱ Расчет занял слишком много времени. Попробуйте еще раз позже.")
+        return ConversationHandler.END
         
+    except CalculationBusy as e:
+        logger.warning(f"Очередь расчетов переполнена: {e}")
+        await context.bot.delete_message(chat_id=update.effective_chat.id, message_id=calculation_msg.message_id)
+        await send_message_with_cleanup(update, context, "⏳ Сейчас выполняется много расчетов. Попробуйте через минуту.")
         return ConversationHandler.END
         
     except Exception as e:
@@ -1010,41 +1231,31 @@ async def select_step_size(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         await send_message_with_cleanup(update, context, f"❌ Произошла ошибка при расчете: {str(e)}")
         return ConversationHandler.END
 
+async def restart_expired_session(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Сессия удалена по сроку или вытеснена, а диалог еще ждет ответа: начинаем заново, как по /start"""
+    logger.info(f"Сессия пользователя {update.effective_user.id} не найдена, диалог начат заново")
+    await restart_from_message(update, context)
+    return ConversationHandler.END
+
 async def restart_from_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Перезапуск из состояния диалога"""
-    await cleanup_chat_history(update, context)
+    await cleanup_chat_history(update, context, background=True)
     
     user_id = update.effective_user.id
-    if user_id in user_data:
-        del user_data[user_id]
+    user_sessions.pop(user_id)
     
     user = update.effective_user
-    welcome_text = (
-        f"👋 Добро пожаловать, {user.first_name}!\n"
-        "Я твой помощник в расчете лестниц.\n\n"
-        "📋 *Доступные функции:*\n"
-        "• 🏠 *Расчет лестницы* - полный расчет стоимости\n"
-        "• 🔍 *Поиск материала* - найти материал по артикулу или названию\n\n"
-        "Выберите действие:"
+    message = await update.message.reply_text(
+        ui.welcome_text(user.first_name), reply_markup=ui.MAIN_MENU, parse_mode='Markdown'
     )
-    
-    keyboard = [
-        [InlineKeyboardButton("🔄 Рассчитать лестницу", callback_data="calculate_stairs")],
-        [InlineKeyboardButton("🔍 Найти материал", callback_data="search_material")],
-        [InlineKeyboardButton("🔄 Перезапустить", callback_data="restart")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    message = await update.message.reply_text(welcome_text, reply_markup=reply_markup, parse_mode='Markdown')
     await add_message_to_delete(update.effective_chat.id, message.message_id)
 
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Отмена диалога"""
-    await cleanup_chat_history(update, context)
+    await cleanup_chat_history(update, context, background=True)
     
     user_id = update.effective_user.id
-    if user_id in user_data:
-        del user_data[user_id]
+    user_sessions.pop(user_id)
     
     await send_message_with_cleanup(update, context, "Диалог отменен. Используйте /start для начала нового расчета.")
     return ConversationHandler.END
@@ -1058,17 +1269,102 @@ async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except:
         pass
 
+def is_restart_update(update):
+    """Обновление перезапускает или отменяет диалог"""
+    if update.callback_query is not None:
+        return update.callback_query.data == 'restart'
+    if update.message is not None and update.message.text:
+        text = update.message.text
+        if text == ui.RESTART_BUTTON:
+            return True
+        # Текст из одних пробелов - не команда
+        command = text.split(maxsplit=1)[:1]
+        return bool(command) and command[0].split('@')[0] in ('/start', '/cancel')
+    return False
+
+def interrupt_calculation(update):
+    """Перезапуск не ждет окончания расчета пользователя, а отменяет его"""
+    if isinstance(update, Update) and update.effective_user is not None and is_restart_update(update):
+        if calculation_service.cancel(update.effective_user.id):
+            logger.info(f"Отмена расчета пользователя {update.effective_user.id} по перезапуску")
+
+update_processor = PerUserUpdateProcessor(CONCURRENT_UPDATES, preempt=interrupt_calculation)
+
+class TimedRequest(HTTPXRequest):
+    """Запросы к Bot API с замером времени по методам (sendMessage, deleteMessage, ...)"""
+
+    async def do_request(self, url, method, *args, **kwargs):
+        with telegram_api_latency.time(url.rsplit('/', 1)[-1]):
+            return await super().do_request(url, method, *args, **kwargs)
+
+def timed_handler(state, callback):
+    """Обработчик с замером времени в гистограмме по состоянию диалога"""
+    @functools.wraps(callback)
+    async def handler(update, context):
+        with handler_latency.time(state, callback.__name__):
+            return await callback(update, context)
+    return handler
+
+def build_application(token, base_url=None, processor=None):
+    """Application со всеми обработчиками (base_url - для тестового сервера Bot API)"""
+    builder = (
+        Application.builder()
+        .token(token)
+        .request(TimedRequest(connection_pool_size=TELEGRAM_CONNECTION_POOL_SIZE))
+        .persistence(StatePersistence(state_backend))
+        .concurrent_updates(processor or update_processor)
+        .post_init(post_init)
+    )
+    if base_url:
+        builder = builder.base_url(base_url)
+    application = builder.build()
+    
+    # Обработчик диалога
+    conv_handler = ConversationHandler(
+        entry_points=[
+            CommandHandler('start', timed_handler('entry', start)),
+            CallbackQueryHandler(timed_handler('entry', button_handler), pattern='^(calculate_stairs|search_material)$')
+        ],
+        states={
+            SELECTING_TYPE: [MessageHandler(filters.TEXT & ~filters.COMMAND, timed_handler('selecting_type', select_type))],
+            SELECTING_CONFIG: [MessageHandler(filters.TEXT & ~filters.COMMAND, timed_handler('selecting_config', select_config))],
+            INPUT_HEIGHT: [MessageHandler(filters.TEXT & ~filters.COMMAND, timed_handler('input_height', input_height))],
+            SELECTING_STEP_SIZE: [MessageHandler(filters.TEXT & ~filters.COMMAND, timed_handler('selecting_step_size', select_step_size))],
+            SEARCH_MATERIAL: [MessageHandler(filters.TEXT & ~filters.COMMAND, timed_handler('search_material', search_material))],
+        },
+        fallbacks=[
+            CommandHandler('cancel', timed_handler('fallback', cancel)),
+            CommandHandler('start', timed_handler('fallback', start)),
+            CallbackQueryHandler(timed_handler('fallback', restart_bot), pattern='^restart$'),
+            CallbackQueryHandler(timed_handler('fallback', button_handler), pattern='^(calculate_stairs|search_material)$')
+        ],
+        allow_reentry=True,
+        name='stairs',
+        persistent=True
+    )
+    
+    # Состояния диалогов удаляются из памяти вместе с сессиями
+    application.persistence.attach(conv_handler)
+    application.add_handler(conv_handler)
+    application.add_handler(CallbackQueryHandler(timed_handler('global', restart_bot), pattern='^restart$'))
+    application.add_error_handler(error_handler)
+    return application
+
 def main():
     """Основная функция запуска бота"""
-    # Запускаем keep-alive сервер для Replit
-    keep_alive()
-    logger.info("🔄 Keep-alive server started on port 8080")
+    global quote_table_builds
+    
+    if not WEBHOOK_URL:
+        # Запускаем keep-alive сервер для Replit
+        keep_alive()
+        logger.info(f"🔄 Keep-alive server started on port {PORT}")
     
     # Опционально: запускаем само-пинг (раскомментируйте если нужно)
     # start_ping_loop()
     # logger.info("🔁 Self-ping service started")
     
-    # Загружаем цены при старте
+    # Загружаем цены при старте; после каждой загрузки в фоне строится таблица расчетов
+    quote_table_builds = PRECOMPUTE_QUOTES
     load_prices()
     
     # Получаем токен
@@ -1079,39 +1375,25 @@ def main():
         return
     
     # Создаем приложение
-    application = Application.builder().token(token).build()
-    
-    # Обработчик диалога
-    conv_handler = ConversationHandler(
-        entry_points=[
-            CommandHandler('start', start),
-            CallbackQueryHandler(button_handler, pattern='^(calculate_stairs|search_material)$')
-        ],
-        states={
-            SELECTING_TYPE: [MessageHandler(filters.TEXT & ~filters.COMMAND, select_type)],
-            SELECTING_CONFIG: [MessageHandler(filters.TEXT & ~filters.COMMAND, select_config)],
-            INPUT_HEIGHT: [MessageHandler(filters.TEXT & ~filters.COMMAND, input_height)],
-            SELECTING_STEP_SIZE: [MessageHandler(filters.TEXT & ~filters.COMMAND, select_step_size)],
-            SEARCH_MATERIAL: [MessageHandler(filters.TEXT & ~filters.COMMAND, search_material)],
-        },
-        fallbacks=[
-            CommandHandler('cancel', cancel),
-            CommandHandler('start', start),
-            CallbackQueryHandler(restart_bot, pattern='^restart$'),
-            CallbackQueryHandler(button_handler, pattern='^(calculate_stairs|search_material)$')
-        ],
-        allow_reentry=True
-    )
-    
-    application.add_handler(conv_handler)
-    application.add_handler(CallbackQueryHandler(restart_bot, pattern='^restart$'))
-    application.add_error_handler(error_handler)
+    application = build_application(token)
     
     logger.info("🚀 Бот запущен и готов к работе!")
-    logger.info("📡 Keep-alive сервер работает на порту 8080")
+    logger.info(f"📡 HTTP сервер работает на порту {PORT}")
     logger.info("🔗 URL для мониторинга: https://your-repl-name.your-username.repl.co")
     
-    application.run_polling(drop_pending_updates=True)
+    logger.info(
+        f"⏱ Холодный старт до приема обновлений: {time.perf_counter() - PROCESS_STARTED:.2f} с "
+        f"(прайс: {price_catalog.source})"
+    )
+    if WEBHOOK_URL:
+        from webhook import default_secret, run_webhook
+        
+        asyncio.run(run_webhook(
+            application, WEBHOOK_URL, PORT, WEBHOOK_SECRET or default_secret(token), HOME_TEXT, status_payload,
+            metrics=metrics.render
+        ))
+    else:
+        application.run_polling(drop_pending_updates=True)
 
 if __name__ == '__main__':
     main()
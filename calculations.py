@@ -0,0 +1,143 @@
+"""Сервис расчетов: расчеты лестниц в ограниченном пуле потоков
+
+Расчет не блокирует цикл событий бота, ждет результата не дольше timeout
+и отменяется, когда пользователь перезапускает диалог. Глубина очереди,
+число отказов и время расчетов отдаются в /status.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Потоков расчета
+CALCULATION_WORKERS = 2
+# Сколько расчетов может ждать свободный поток; следующие получают отказ
+CALCULATION_QUEUE_LIMIT = 100
+# Предельное время ожидания одного расчета (с)
+CALCULATION_TIMEOUT = 10.0
+
+
+class CalculationCancelled(Exception):
+    """Расчет отменен: пользователь перезапустил диалог"""
+
+
+class CalculationBusy(Exception):
+    """Очередь расчетов переполнена"""
+
+
+class CalculationService:
+    """Пул потоков для расчетов с таймаутом, отменой по ключу и счетчиками
+
+    Ключ - пользователь: у каждого не больше одного текущего расчета,
+    cancel(key) отменяет его. Уже начатый в потоке расчет прервать нельзя,
+    его результат просто отбрасывается; ждущий в очереди не запускается.
+    """
+
+    def __init__(self, workers=CALCULATION_WORKERS, queue_limit=CALCULATION_QUEUE_LIMIT, timeout=CALCULATION_TIMEOUT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self._executor = None
+        self._lock = threading.Lock()
+        # ключ -> future текущего расчета в цикле событий
+        self._current = {}
+        self._cancelled = set()
+        self.queued = 0
+        self.running = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.rejected = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def _pool(self):
+        # Потоки создаются при первом расчете, а не при импорте бота
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='calculation')
+        return self._executor
+
+    def _call(self, func, args, kwargs):
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        started = time.perf_counter()
+        failed = False
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.running -= 1
+                if failed:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+                self.total_time += elapsed
+                self.max_time = max(self.max_time, elapsed)
+
+    def _dropped(self, future):
+        # Расчет отменен до начала: _call не выполнялся и не снял его с очереди
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+
+    async def run(self, key, func, *args, timeout=None, **kwargs):
+        """Результат func(*args, **kwargs), посчитанный в пуле потоков
+
+        TimeoutError - расчет не уложился в timeout, CalculationCancelled -
+        вызван cancel(key), CalculationBusy - очередь переполнена.
+        """
+        with self._lock:
+            if self.queued >= self.queue_limit:
+                self.rejected += 1
+                raise CalculationBusy(f"в очереди {self.queued} расчетов")
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+        future = self._pool().submit(self._call, func, args, kwargs)
+        future.add_done_callback(self._dropped)
+
+        # Новый расчет пользователя заменяет предыдущий
+        self.cancel(key)
+        waiter = asyncio.wrap_future(future)
+        self._current[key] = waiter
+        try:
+            return await asyncio.wait_for(waiter, timeout or self.timeout)
+        except TimeoutError:
+            self.timeouts += 1
+            raise
+        except asyncio.CancelledError:
+            if waiter not in self._cancelled:
+                raise
+            self.cancelled += 1
+            raise CalculationCancelled(f"расчет для {key} отменен") from None
+        finally:
+            self._cancelled.discard(waiter)
+            if self._current.get(key) is waiter:
+                del self._current[key]
+
+    def cancel(self, key):
+        """Отмена текущего расчета по ключу; True, если было что отменять"""
+        waiter = self._current.get(key)
+        if waiter is None or waiter.done():
+            return False
+        self._cancelled.add(waiter)
+        waiter.cancel()
+        return True
+
+    def stats(self):
+        finished = self.completed + self.failed
+        return {'workers': self.workers, 'queued': self.queued, 'running': self.running,
+                'max_queued': self.max_queued, 'completed': self.completed, 'failed': self.failed,
+                'timeouts': self.timeouts, 'cancelled': self.cancelled, 'rejected': self.rejected,
+                'avg_time': self.total_time / finished if finished else None, 'max_time': self.max_time}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,475 @@
+import copy
+import hashlib
+import itertools
+import json
+import logging
+import os
+import pickle
+import re
+from datetime import datetime
+from openpyxl import load_workbook
+
+from search import SearchIndex
+
+logger = logging.getLogger(__name__)
+
+PRICES_FILE = 'data.xlsx'
+# Первые строки листа занимает шапка таблицы
+FIRST_DATA_ROW = 4
+# Версия формата снимка каталога, меняется вместе со структурой PriceCatalog
+SNAPSHOT_VERSION = 5
+
+# Длина доски: первое число в размерах (4000*300*60) или в названии
+LENGTH_RE = re.compile(r'\d+')
+
+# Номера версий каталога: меняются при каждой загрузке и изменении прайса
+_catalog_versions = itertools.count(1)
+
+
+def normalize_article(article):
+    """Приведение артикула к виду из прайса (без дробной части Excel)"""
+    article = str(article)
+    return article.split('.')[0] if '.' in article else article
+
+
+def parse_price_row(row):
+    """Позиция прайса из строки листа или None, если строка неполная"""
+    article, name, stair_type, sizes, unit, price = (tuple(row) + (None,) * 6)[:6]
+    if not (article and name and price):
+        return None
+    return {
+        'article': normalize_article(article),
+        'name': str(name),
+        'stair_type': str(stair_type) if stair_type else '',
+        'sizes': str(sizes) if sizes else '',
+        'unit': str(unit) if unit else 'шт.',
+        'price': float(price)
+    }
+
+
+def read_price_rows(path=PRICES_FILE):
+    """Потоковое чтение позиций прайса вместе с номерами строк листа"""
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = []
+        for row_num, row in enumerate(
+                wb.active.iter_rows(min_row=FIRST_DATA_ROW, max_col=6, values_only=True), FIRST_DATA_ROW):
+            item = parse_price_row(row)
+            if item is not None:
+                rows.append((row_num, item))
+        return rows
+    finally:
+        # В режиме read_only файл остается открытым до явного закрытия
+        wb.close()
+
+
+def read_prices(path=PRICES_FILE):
+    """Потоковое чтение позиций прайса из Excel файла"""
+    return [item for _, item in read_price_rows(path)]
+
+
+def overrides_path(path):
+    """Путь к файлу цен, собранных с сайта, рядом с Excel файлом"""
+    return path + '.overrides.json'
+
+
+def load_overrides(path=PRICES_FILE):
+    """Цены с сайта: артикул -> цена (пустой словарь, если файла нет)"""
+    try:
+        with open(overrides_path(path), encoding='utf-8') as f:
+            return json.load(f)['prices']
+    except FileNotFoundError:
+        return {}
+
+
+def save_overrides(prices, path=PRICES_FILE, remove=()):
+    """Добавление цен с сайта к уже сохраненным (атомарная запись файла)"""
+    overrides = load_overrides(path)
+    for article in remove:
+        overrides.pop(normalize_article(article), None)
+    overrides.update({normalize_article(article): price for article, price in prices.items()})
+
+    target = overrides_path(path)
+    tmp_path = target + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'updated': datetime.now().isoformat(), 'prices': overrides}, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, target)
+    return overrides
+
+
+def apply_overrides(items, overrides):
+    """Позиции прайса с ценами с сайта вместо цен из Excel файла"""
+    if not overrides:
+        return list(items)
+    result = []
+    for item in items:
+        price = overrides.get(item['article'])
+        if price is not None and price != item['price']:
+            item = dict(item, price=float(price))
+        result.append(item)
+    return result
+
+
+def snapshot_path(path):
+    """Путь к снимку каталога рядом с Excel файлом"""
+    return path + '.snapshot'
+
+
+def file_digest(path):
+    """SHA-256 содержимого файла"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_fingerprint(path):
+    """(размер, SHA-256) файла или None, если файла нет"""
+    try:
+        return os.path.getsize(path), file_digest(path)
+    except FileNotFoundError:
+        return None
+
+
+def source_fingerprint(path=PRICES_FILE, workbook=None):
+    """Отпечатки Excel файла и файла цен с сайта, из которых строится каталог
+
+    Снимаются до чтения файлов: если файл поменяется во время чтения,
+    снимок с таким отпечатком при следующем запуске не подойдет.
+    """
+    return {
+        'workbook': workbook if workbook is not None else file_fingerprint(path),
+        'overrides': file_fingerprint(overrides_path(path))
+    }
+
+
+def _files_unchanged(files, path):
+    """Совпадают ли Excel файл и файл цен с сайта с отпечатками из снимка"""
+    for name, file_path in (('workbook', path), ('overrides', overrides_path(path))):
+        expected = files.get(name)
+        try:
+            size = os.path.getsize(file_path)
+        except FileNotFoundError:
+            size = None
+        if expected is None or size is None:
+            if expected is not None or size is not None:
+                return False
+            continue
+        # Хэш считаем, только если размер совпал
+        if size != expected[0] or file_digest(file_path) != expected[1]:
+            return False
+    return True
+
+
+def load_snapshot(path=PRICES_FILE):
+    """Каталог из снимка или None, если снимка нет или Excel файл или цены с сайта изменились
+
+    В начале снимка записаны размер и SHA-256 файлов, из которых построен
+    каталог; сам каталог читается, только если они совпадают с файлами на
+    диске (по mtime не проверяем: копирование и git checkout его меняют
+    или сохраняют независимо от содержимого).
+    """
+    snapshot = snapshot_path(path)
+    try:
+        with open(snapshot, 'rb') as f:
+            version, files = pickle.load(f)
+            if version != SNAPSHOT_VERSION or not _files_unchanged(files, path):
+                return None
+            catalog = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Не удалось прочитать снимок прайса {snapshot}: {e}")
+        return None
+
+    catalog.source = 'snapshot'
+    catalog.version = next(_catalog_versions)
+    return catalog
+
+
+def save_snapshot(catalog, path=PRICES_FILE):
+    """Сохранение каталога вместе с индексами в снимок
+
+    Перед каталогом пишется заголовок: версия формата и отпечатки файлов
+    catalog.files, по которым load_snapshot проверяет свежесть снимка.
+    """
+    if catalog.files is None:
+        return
+    snapshot = snapshot_path(path)
+    tmp_path = snapshot + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((SNAPSHOT_VERSION, catalog.files), f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(catalog, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, snapshot)
+    except Exception as e:
+        logger.warning(f"Не удалось сохранить снимок прайса {snapshot}: {e}")
+
+
+def build_price_catalog(path=PRICES_FILE, use_snapshot=True):
+    """Чтение прайса и построение индексов (можно вызывать из рабочего потока)
+
+    Если рядом лежит снимок, построенный из тех же Excel файла и цен с
+    сайта, каталог берется из него, иначе прайс читается заново и снимок
+    перестраивается.
+    """
+    if use_snapshot:
+        catalog = load_snapshot(path)
+        if catalog is not None:
+            return catalog
+
+    files = source_fingerprint(path)
+    overrides = load_overrides(path)
+    catalog = PriceCatalog(apply_overrides(read_prices(path), overrides))
+    catalog.override_articles = frozenset(overrides)
+    catalog.files = files
+    if use_snapshot:
+        save_snapshot(catalog, path)
+    return catalog
+
+
+def refresh_price_catalog(current=None, path=PRICES_FILE):
+    """Перечитывание прайса с применением построчных изменений к текущему каталогу
+
+    Возвращает новый каталог и номера изменившихся строк
+    (None, если каталог пришлось строить заново).
+    """
+    if current is None or current.source == 'test':
+        return build_price_catalog(path), None
+
+    files = source_fingerprint(path)
+    overrides = load_overrides(path)
+    catalog, changed = current.apply_changes(apply_overrides(read_prices(path), overrides))
+    catalog.override_articles = frozenset(overrides)
+    if catalog is not current or catalog.files != files:
+        catalog.files = files
+        save_snapshot(catalog, path)
+    return catalog, changed
+
+
+def apply_price_overrides(current, path=PRICES_FILE):
+    """Применение новых цен с сайта к текущему каталогу без перечитывания Excel файла
+
+    Если цены с сайта только добавились или обновились, достаточно наложить
+    их на текущие позиции; меняются только строки с новой ценой. Если какой-то
+    артикул из файла цен пропал, его цену из Excel файла в текущих позициях не
+    восстановить - прайс перечитывается целиком.
+    """
+    if current is None or current.source == 'test':
+        return refresh_price_catalog(current, path)
+
+    # Excel файл не перечитывается: в снимок идет отпечаток того, из которого построен каталог
+    files = source_fingerprint(path, workbook=current.files and current.files['workbook'])
+    overrides = load_overrides(path)
+    if not current.override_articles <= overrides.keys():
+        return refresh_price_catalog(current, path)
+
+    catalog, changed = current.apply_changes(apply_overrides(current.items, overrides))
+    catalog.override_articles = frozenset(overrides)
+    if catalog is not current or catalog.files != files:
+        catalog.files = files
+        save_snapshot(catalog, path)
+    return catalog, changed
+
+
+class PriceFileWatcher:
+    """Отслеживание изменений Excel файла по mtime, размеру и хэшу содержимого"""
+
+    def __init__(self, path=PRICES_FILE):
+        self.path = path
+        self.stat = None
+        self.digest = None
+
+    def poll(self):
+        """Отпечаток файла, если его содержимое изменилось с последней загрузки, иначе None
+
+        Пропажа файла тоже считается изменением: отпечаток (None, None).
+        """
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None if self.stat is None else (None, None)
+        stat = (st.st_mtime_ns, st.st_size)
+        if stat == self.stat:
+            return None
+
+        # mtime мог поменяться без изменения содержимого (копирование, touch)
+        digest = file_digest(self.path)
+        if digest == self.digest:
+            self.stat = stat
+            return None
+        return stat, digest
+
+    def accept(self, fingerprint):
+        """Запоминаем отпечаток успешно загруженного файла"""
+        self.stat, self.digest = fingerprint
+
+
+def trigrams(text):
+    """Множество триграмм строки"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class PriceCatalog:
+    """Прайс с индексами для быстрого поиска материалов
+
+    Строится один раз при загрузке цен и после этого не меняется. Порядок
+    позиций совпадает с файлом, поэтому все поиски возвращают то же, что и
+    полный перебор списка.
+    """
+
+    # Поля, от которых зависят индексы
+    INDEXED_FIELDS = ('article', 'name', 'stair_type', 'sizes')
+
+    def __init__(self, items, source='xlsx'):
+        self.items = list(items)
+        # Названия приводим к нижнему регистру заранее
+        self.names = [item['name'].lower() for item in self.items]
+
+        self.by_article = {}
+        self.by_type = {}
+        # (вид лестницы, триграмма названия) -> позиции по возрастанию
+        self.name_index = {}
+
+        for pos, item in enumerate(self.items):
+            self.by_article.setdefault(item['article'], item)
+
+            stair_type = item['stair_type']
+            self.by_type.setdefault(stair_type, []).append(pos)
+            for gram in trigrams(self.names[pos]):
+                self.name_index.setdefault((stair_type, gram), []).append(pos)
+
+        # Полнотекстовый индекс для поиска материалов с рейтингом
+        self.text_index = SearchIndex(self.items)
+        self._pattern_cache = {}
+        # Откуда взят каталог: xlsx, snapshot или test
+        self.source = source
+        # Артикулы, цены которых взяты из файла цен с сайта
+        self.override_articles = frozenset()
+        # Отпечатки Excel файла и файла цен с сайта (source_fingerprint) для снимка
+        self.files = None
+        self.version = next(_catalog_versions)
+
+    def __getstate__(self):
+        # Кэш найденных шаблонов в снимок не пишем
+        state = self.__dict__.copy()
+        state['_pattern_cache'] = {}
+        return state
+
+    def __len__(self):
+        return len(self.items)
+
+    def apply_changes(self, items):
+        """Новый каталог по перечитанному прайсу и номера изменившихся строк
+
+        Если строки не добавлялись, не удалялись и индексируемые поля не
+        менялись, индексы переиспользуются и заменяются только измененные
+        позиции. Иначе каталог строится заново, номера строк не возвращаются.
+        """
+        items = list(items)
+        if len(items) != len(self.items):
+            return PriceCatalog(items), None
+
+        changed = []
+        for pos, (old, new) in enumerate(zip(self.items, items)):
+            if old == new:
+                continue
+            if any(old.get(field) != new.get(field) for field in self.INDEXED_FIELDS):
+                return PriceCatalog(items), None
+            changed.append(pos)
+
+        if not changed:
+            return self, changed
+
+        catalog = copy.copy(self)
+        catalog.items = list(self.items)
+        catalog.by_article = dict(self.by_article)
+        catalog._pattern_cache = {}
+        catalog.source = 'xlsx'
+        catalog.version = next(_catalog_versions)
+        for pos in changed:
+            old, new = self.items[pos], items[pos]
+            catalog.items[pos] = new
+            if catalog.by_article.get(new['article']) is old:
+                catalog.by_article[new['article']] = new
+        return catalog, changed
+
+    def _candidates(self, index, keys, fallback):
+        """Самый короткий список позиций среди ключей индекса"""
+        if not keys:
+            return fallback
+        best = None
+        for key in keys:
+            positions = index.get(key)
+            if positions is None:
+                return ()
+            if best is None or len(positions) < len(best):
+                best = positions
+        return best
+
+    def find_by_pattern(self, material_type, name_pattern):
+        """Первая позиция вида лестницы, в названии которой есть подстрока"""
+        pattern = name_pattern.lower()
+        key = (material_type, pattern)
+        if key in self._pattern_cache:
+            return self._pattern_cache[key]
+
+        candidates = self._candidates(
+            self.name_index,
+            [(material_type, gram) for gram in trigrams(pattern)],
+            self.by_type.get(material_type, ())
+        )
+        found = None
+        for pos in candidates:
+            if pattern in self.names[pos]:
+                found = self.items[pos]
+                break
+
+        self._pattern_cache[key] = found
+        return found
+
+    def get_price(self, material_type, name_pattern, default_price):
+        """Цена первой подходящей позиции или цена по умолчанию"""
+        item = self.find_by_pattern(material_type, name_pattern)
+        return item['price'] if item is not None else default_price
+
+    def find_stock(self, material_type, name_pattern):
+        """Длины и цены досок вида лестницы с подстрокой в названии
+
+        Возвращает пары (длина, цена) по убыванию длины; из позиций одной
+        длины берется самая дешевая.
+        """
+        pattern = name_pattern.lower()
+        key = ('stock', material_type, pattern)
+        if key in self._pattern_cache:
+            return self._pattern_cache[key]
+
+        candidates = self._candidates(
+            self.name_index,
+            [(material_type, gram) for gram in trigrams(pattern)],
+            self.by_type.get(material_type, ())
+        )
+        prices = {}
+        for pos in candidates:
+            if pattern not in self.names[pos]:
+                continue
+            item = self.items[pos]
+            match = LENGTH_RE.search(item.get('sizes') or '') or LENGTH_RE.search(item['name'])
+            if match is None or not item['price']:
+                continue
+            length = int(match.group())
+            prices[length] = min(prices.get(length, item['price']), item['price'])
+
+        stock = sorted(prices.items(), reverse=True)
+        self._pattern_cache[key] = stock
+        return stock
+
+    def get_by_article(self, article):
+        """Позиция по артикулу"""
+        return self.by_article.get(normalize_article(article))
+
+    def search_ranked(self, query, limit=10):
+        """Лучшие позиции по запросу (с учетом префиксов и опечаток) и их общее число"""
+        positions, total = self.text_index.search(query, limit)
+        return [self.items[pos] for pos in positions], total
@@ -0,0 +1,139 @@
+"""Раскрой тетив из досок нескольких длин с минимальной стоимостью
+
+Тетивы маршей (куски) раскладываются по доскам из прайса так, чтобы
+суммарная цена досок была минимальной: из одной доски можно выпилить
+несколько коротких тетив. Тетива длиннее самой длинной доски
+сращивается: целые доски любых длин из прайса (в том числе разных) плюс
+остаток, который раскраивается вместе с остальными кусками. Перебор с
+запоминанием по оставшимся кускам для обычных лестниц (до 4-6 кусков)
+занимает доли миллисекунды.
+"""
+import itertools
+import math
+from functools import lru_cache
+
+
+def _fill(pieces, start, capacity):
+    """Наборы кусков с позиции start, которые помещаются в capacity и
+    к которым нельзя добавить еще один оставшийся кусок
+
+    Куски упорядочены по убыванию; одинаковые куски перебираются один раз.
+    Возвращает кортежи номеров кусков.
+    """
+    results = []
+
+    def walk(pos, left, chosen):
+        extended = False
+        previous = None
+        for i in range(pos, len(pieces)):
+            piece = pieces[i]
+            if piece > left or piece == previous:
+                continue
+            previous = piece
+            extended = True
+            walk(i + 1, left - piece, chosen + (i,))
+        if not extended:
+            # Набор максимален, если ни один пропущенный кусок в остаток не влезает
+            taken = set(chosen)
+            if all(pieces[i] > left for i in range(start, len(pieces)) if i not in taken):
+                results.append(chosen)
+
+    walk(start, capacity, ())
+    return results
+
+
+@lru_cache(maxsize=65536)
+def _pack(pieces, stock):
+    """(стоимость, длины досок) для раскроя кусков pieces из досок stock
+
+    pieces - кортеж целых длин по убыванию, stock - кортеж (длина, цена).
+    Первый (самый длинный) кусок кладется в одну из досок вместе с
+    максимальным набором остальных; дальше задача решается для оставшихся.
+    Если кусок не помещается ни в одну доску, возвращается None.
+    """
+    if not pieces:
+        return 0, ()
+    first, rest = pieces[0], pieces[1:]
+    best = None
+    for length, price in stock:
+        if first > length:
+            continue
+        for chosen in _fill(rest, 0, length - first):
+            taken = set(chosen)
+            remaining = tuple(piece for i, piece in enumerate(rest) if i not in taken)
+            packed = _pack(remaining, stock)
+            if packed is None:
+                continue
+            cost, boards = packed[0] + price, (length,) + packed[1]
+            # При равной цене - меньше отходов
+            if best is None or (cost, sum(boards)) < (best[0], sum(best[1])):
+                best = cost, boards
+    return best
+
+
+def _splits(piece, stock):
+    """Варианты сращивания длинного куска: (целые доски, цена, остаток)
+
+    Целые доски - любой набор длин из прайса, после которого остается
+    кусок не длиннее самой длинной доски. Из наборов одной общей длины
+    остается самый дешевый: остаток у них одинаковый.
+    """
+    longest = max(length for length, _ in stock)
+    shortest = min(length for length, _ in stock)
+    cheapest = {}
+    for count in range(1, math.ceil(piece / shortest)):
+        for boards in itertools.combinations_with_replacement(stock, count):
+            total = sum(length for length, _ in boards)
+            if not piece - longest <= total < piece:
+                continue
+            price = sum(price for _, price in boards)
+            if total not in cheapest or price < cheapest[total][1]:
+                cheapest[total] = tuple(length for length, _ in boards), price
+    return [(whole, price, piece - total) for total, (whole, price) in sorted(cheapest.items())]
+
+
+@lru_cache(maxsize=65536)
+def _solve(pieces, stock):
+    longest = max(length for length, _ in stock)
+    short = [piece for piece in pieces if piece <= longest]
+    long_groups = [(piece, len(list(group))) for piece, group in itertools.groupby(p for p in pieces if p > longest)]
+
+    # Для одинаковых длинных кусков достаточно выбрать набор вариантов без учета порядка
+    group_choices = [
+        list(itertools.combinations_with_replacement(_splits(piece, stock), count))
+        for piece, count in long_groups
+    ]
+    best = None
+    for choice in itertools.product(*group_choices):
+        boards, cost, remainders = (), 0, []
+        for splits in choice:
+            for whole, price, remainder in splits:
+                boards += whole
+                cost += price
+                remainders.append(remainder)
+        packed = _pack(tuple(sorted(short + remainders, reverse=True)), stock)
+        if packed is None:
+            continue
+        total = cost + packed[0], boards + packed[1]
+        if best is None or (total[0], sum(total[1])) < (best[0], sum(best[1])):
+            best = total
+    return best
+
+
+def cut_stock(pieces, stock):
+    """Самый дешевый набор досок для кусков pieces
+
+    pieces - длины тетив в мм (дробные округляются вверх), stock - пары
+    (длина доски, цена). Возвращает ([{'length', 'qty'}] по убыванию длины,
+    общее число досок, стоимость).
+    """
+    stock = tuple(sorted({(int(length), price) for length, price in stock if length > 0}, reverse=True))
+    if not stock:
+        raise ValueError("Нет длин досок для раскроя")
+    pieces = tuple(sorted((math.ceil(piece) for piece in pieces if piece > 0), reverse=True))
+    cost, boards = _solve(pieces, stock)
+    counts = {}
+    for length in boards:
+        counts[length] = counts.get(length, 0) + 1
+    plan = [{'length': length, 'qty': counts[length]} for length in sorted(counts, reverse=True)]
+    return plan, len(boards), cost
@@ -0,0 +1,144 @@
+"""Извлечение цены из страницы поиска lemanapro.ru
+
+Сначала пробуем дешевые точечные способы: JSON-LD разметку товара и
+атрибут data-price, найденные регулярным выражением без разбора всей
+страницы. Если их нет, разбираем HTML через lxml (когда он установлен)
+или BeautifulSoup теми же селекторами, что и раньше.
+"""
+import json
+import logging
+import re
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html as lxml_html
+except ImportError:
+    lxml_html = None
+
+logger = logging.getLogger(__name__)
+
+JSON_LD_RE = re.compile(
+    r'<script[^>]*type=["\']application/ld\+json["\'][^>]*>(.*?)</script>',
+    re.IGNORECASE | re.DOTALL
+)
+DATA_PRICE_RE = re.compile(r'\sdata-price=["\']([^"\']*)["\']', re.IGNORECASE)
+
+# Селекторы разбора страницы целиком, в порядке приоритета
+PRICE_SELECTORS = [
+    '.price',
+    '.product-price',
+    '[class*="price"]',
+    '[data-price]'
+]
+# Те же селекторы для lxml без зависимости от cssselect
+PRICE_XPATHS = [
+    "//*[contains(concat(' ', normalize-space(@class), ' '), ' price ')]",
+    "//*[contains(concat(' ', normalize-space(@class), ' '), ' product-price ')]",
+    "//*[contains(@class, 'price')]",
+    "//*[@data-price]"
+]
+
+
+def digits_price(text):
+    """Цена из текста элемента: все цифры подряд, как в исходном парсере"""
+    price = ''.join(filter(str.isdigit, text))
+    return int(price) if price else None
+
+
+def number_price(value):
+    """Цена из машинного значения (1234, "1 234.50") без копеек"""
+    if isinstance(value, (int, float)):
+        return int(value) if value > 0 else None
+    text = re.sub(r'\s', '', str(value)).replace(',', '.')
+    try:
+        price = float(text)
+    except ValueError:
+        return None
+    return int(price) if price > 0 else None
+
+
+def _find_offer_price(data):
+    """Первая цена в JSON-LD: offers.price, offers.lowPrice или price"""
+    if isinstance(data, list):
+        for value in data:
+            price = _find_offer_price(value)
+            if price is not None:
+                return price
+    elif isinstance(data, dict):
+        for key in ('price', 'lowPrice'):
+            if key in data:
+                price = number_price(data[key])
+                if price is not None:
+                    return price
+        for key in ('offers', 'itemListElement', 'item', '@graph'):
+            if key in data:
+                price = _find_offer_price(data[key])
+                if price is not None:
+                    return price
+    return None
+
+
+def extract_jsonld(html):
+    """Цена из JSON-LD разметки товара"""
+    for match in JSON_LD_RE.finditer(html):
+        try:
+            data = json.loads(match.group(1))
+        except ValueError:
+            continue
+        price = _find_offer_price(data)
+        if price is not None:
+            return price
+    return None
+
+
+def extract_data_price(html):
+    """Цена из первого атрибута data-price"""
+    for match in DATA_PRICE_RE.finditer(html):
+        price = number_price(match.group(1))
+        if price is not None:
+            return price
+    return None
+
+
+def extract_soup(html):
+    """Цена по CSS селекторам через BeautifulSoup"""
+    soup = BeautifulSoup(html, 'html.parser')
+    for selector in PRICE_SELECTORS:
+        for element in soup.select(selector):
+            price = digits_price(element.get_text(strip=True))
+            if price is not None:
+                return price
+    return None
+
+
+def extract_lxml(html):
+    """Цена по тем же селекторам через lxml; при ошибке разбора - через BeautifulSoup"""
+    try:
+        tree = lxml_html.fromstring(html)
+    except Exception as e:
+        logger.debug(f"lxml не разобрал страницу: {e}")
+        return extract_soup(html)
+    for xpath in PRICE_XPATHS:
+        for element in tree.xpath(xpath):
+            price = digits_price(element.text_content())
+            if price is not None:
+                return price
+    return None
+
+
+# Извлекатели по порядку: первый найденный результат считается ценой
+EXTRACTORS = [
+    ('jsonld', extract_jsonld),
+    ('data-price', extract_data_price),
+    ('lxml', extract_lxml) if lxml_html is not None else ('soup', extract_soup)
+]
+
+
+def extract_price(html, extractors=None):
+    """Извлечение цены из страницы поиска"""
+    for name, extractor in extractors or EXTRACTORS:
+        price = extractor(html)
+        if price is not None:
+            return price
+    return None
@@ -0,0 +1,160 @@
+"""Метрики бота в текстовом формате Prometheus
+
+Гистограммы копят наблюдения по меткам (обработчик, метод Bot API) в
+горячем пути: одно наблюдение - поиск корзины и пара сложений под
+блокировкой. Значения, которые и так считаются в других местах (размер
+каталога, счетчики кэшей), не дублируются: их отдают функции сбора,
+вызываемые при каждом запросе /metrics.
+"""
+import asyncio
+import bisect
+import threading
+import time
+
+# Корзины по умолчанию (с): от миллисекунды до десятков секунд
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, bool):
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Histogram:
+    """Гистограмма с метками: число наблюдений по корзинам, сумма и количество"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # значения меток -> [счетчики по корзинам (последняя - +Inf), сумма]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def time(self, *label_values):
+        """Замер времени блока with, в том числе завершившегося исключением"""
+        return _Timer(self, label_values)
+
+    def samples(self):
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        lines = []
+        for labels, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_labels(self.label_names, labels, ("le", _format_value(bound)))} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.label_names, labels)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_labels(self.label_names, labels)} {cumulative}')
+        return lines
+
+
+class _Timer:
+    """Замер времени для Histogram.time(): наблюдение записывается при выходе из with"""
+
+    __slots__ = ('histogram', 'label_values', 'started')
+
+    def __init__(self, histogram, label_values):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, *self.label_values)
+        return False
+
+
+class Collected:
+    """Счетчик или значение, которое при каждом запросе отдает функция сбора
+
+    collect() возвращает число (метрика без меток) или словарь
+    {значения меток: число}; None - значения пока нет.
+    """
+
+    def __init__(self, name, documentation, kind='gauge', labels=(), collect=None):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.label_names = tuple(labels)
+        self.collect = collect
+
+    def samples(self):
+        values = self.collect()
+        if values is None:
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [
+            f'{self.name}{_labels(self.label_names, labels if isinstance(labels, tuple) else (labels,))} {_format_value(value)}'
+            for labels, value in values.items() if value is not None
+        ]
+
+
+class Registry:
+    """Набор метрик и их вывод в текстовом формате Prometheus"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def collected(self, name, documentation, kind='gauge', labels=(), collect=None):
+        metric = Collected(name, documentation, kind, labels, collect)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                # Ошибка одной функции сбора не должна ломать весь ответ
+                lines.append(f'# {metric.name}: {_escape(e)}')
+                continue
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+async def watch_event_loop(histogram, interval=0.5):
+    """Задержка цикла событий: насколько позже заказанного просыпается sleep(interval)"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        histogram.observe(max(0.0, loop.time() - started - interval))
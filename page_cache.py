@@ -0,0 +1,133 @@
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILE = 'lemanapro_cache.json'
+# Цены, загруженные не раньше этого срока (с), не запрашиваются повторно
+DEFAULT_TTL = 12 * 60 * 60
+
+
+class RefreshStats:
+    """Счетчики одного прохода обновления цен: запросы, трафик и сэкономленное время"""
+
+    def __init__(self):
+        self.fresh = 0
+        self.not_modified = 0
+        self.downloaded = 0
+        self.bytes_downloaded = 0
+        self.bytes_saved = 0
+        self.time_saved = 0.0
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+    def report(self):
+        logger.info(
+            f"Кэш страниц: пропущено по TTL {self.fresh}, не изменилось (304) {self.not_modified}, "
+            f"загружено {self.downloaded}; скачано {self.bytes_downloaded / 1024:.1f} КБ, "
+            f"сэкономлено {self.bytes_saved / 1024:.1f} КБ и ~{self.time_saved:.1f} с"
+        )
+
+
+class PageCache:
+    """Кэш страниц поиска на диске: ETag, Last-Modified и извлеченная цена по URL
+
+    Запись хранит цену, а не саму страницу: при ответе 304 цена берется из
+    кэша без разбора HTML. Записи моложе ttl не запрашиваются вовсе.
+    Страницы, с которых цену извлечь не удалось (капча, страница ошибки),
+    не кэшируются: иначе их ETag и пустая цена прожили бы весь ttl.
+    """
+
+    def __init__(self, path=CACHE_FILE, ttl=DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.entries = {}
+        self.stats = RefreshStats()
+        self.load()
+
+    def load(self):
+        """Чтение кэша с диска; испорченный файл просто игнорируется"""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                entries = json.load(f)
+            # Записи без цены могли остаться от прежних версий кэша
+            self.entries = {url: entry for url, entry in entries.items() if entry.get('price') is not None}
+        except FileNotFoundError:
+            self.entries = {}
+        except Exception as e:
+            logger.warning(f"Не удалось прочитать кэш страниц {self.path}: {e}")
+            self.entries = {}
+
+    def save(self):
+        """Атомарная запись кэша на диск"""
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить кэш страниц {self.path}: {e}")
+
+    def start_run(self):
+        """Новые счетчики для очередного прохода обновления"""
+        self.stats = RefreshStats()
+        return self.stats
+
+    def get(self, url):
+        return self.entries.get(url)
+
+    def is_fresh(self, entry, now=None):
+        """Запись моложе TTL и ее можно использовать без запроса"""
+        if entry is None:
+            return False
+        now = time.time() if now is None else now
+        return now - entry['checked'] < self.ttl
+
+    def conditional_headers(self, entry):
+        """Заголовки условного запроса по сохраненным ETag и Last-Modified"""
+        headers = {}
+        if entry is None:
+            return headers
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def use_fresh(self, entry):
+        """Цена из записи моложе TTL"""
+        self.stats.fresh += 1
+        self.stats.bytes_saved += entry['size']
+        self.stats.time_saved += entry['elapsed']
+        return entry['price']
+
+    def not_modified(self, url, entry, size, elapsed):
+        """Ответ 304: продлеваем запись и возвращаем сохраненную цену"""
+        entry['checked'] = time.time()
+        self.stats.not_modified += 1
+        self.stats.bytes_downloaded += size
+        self.stats.bytes_saved += max(0, entry['size'] - size)
+        self.stats.time_saved += max(0.0, entry['elapsed'] - elapsed)
+        return entry['price']
+
+    def store(self, url, headers, price, size, elapsed):
+        """Ответ 200: запоминаем валидаторы, цену, размер и время загрузки
+
+        Без цены страница не запоминается; прежняя запись остается (ответ 304
+        на ее ETag по-прежнему означает ее цену), но без продления срока.
+        """
+        self.stats.downloaded += 1
+        self.stats.bytes_downloaded += size
+        if price is None:
+            return
+        self.entries[url] = {
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'price': price,
+            'size': size,
+            'elapsed': elapsed,
+            'checked': time.time()
+        }
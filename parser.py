@@ -1,43 +1,94 @@
 import requests
-from bs4 import BeautifulSoup
 import pandas as pd
 import time
 import logging
 
+from extractors import extract_price
+
 logger = logging.getLogger(__name__)
 
+SEARCH_URL = "https://surgut.lemanapro.ru/search/?q={article}"
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+PRICE_COLUMN = 'Продажная цена магазина'
+# Сколько измененных строк показывать в логе
+REPORT_ROWS = 20
+
+def article_column(df):
+    """Артикулы строк с заполненным артикулом (индекс как у df)"""
+    articles = df['Артикул'].map(str).str.strip()
+    return articles[~articles.isin(['', 'nan', 'None'])]
+
+def apply_prices(df, prices):
+    """Запись найденных цен в DataFrame одной операцией
+    
+    prices - словарь или Series артикул -> цена (None, если цена не найдена).
+    Возвращает отчет об измененных строках: артикул, старая и новая цена.
+    """
+    articles = article_column(df)
+    found = articles.map(pd.Series(prices, dtype=object))
+    new_prices = pd.to_numeric(found, errors='coerce')
+    old_prices = df.loc[articles.index, PRICE_COLUMN]
+    changed = new_prices.notna() & (new_prices != 0) & (new_prices != old_prices)
+    
+    report = pd.DataFrame({
+        'Артикул': articles[changed],
+        'Старая цена': old_prices[changed],
+        # Цены пишем как пришли от парсера (целые остаются целыми)
+        'Новая цена': found[changed].infer_objects()
+    })
+    if len(report):
+        df.loc[report.index, PRICE_COLUMN] = report['Новая цена'].to_numpy()
+    return report
+
+def log_report(report):
+    """Итог обновления и первые измененные строки в лог"""
+    for index, row in report.head(REPORT_ROWS).iterrows():
+        logger.info(f"Обновлена цена для {row['Артикул']}: {row['Старая цена']} -> {row['Новая цена']}")
+    if len(report) > REPORT_ROWS:
+        logger.info(f"... и еще {len(report) - REPORT_ROWS} строк")
+    logger.info(f"Обновлено {len(report)} цен")
+
 class LemanaproParser:
-    def __init__(self):
+    def __init__(self, search_url=SEARCH_URL, cache=None):
+        self.search_url = search_url
         self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+        self.session.headers.update(HEADERS)
+        # PageCache: условные запросы и пропуск недавно проверенных артикулов
+        self.cache = cache
+        # Измененные строки последнего обновления (см. apply_prices)
+        self.last_report = None
+    
+    def is_cached(self, article):
+        """Цена артикула свежая в кэше и запрос не нужен"""
+        if self.cache is None:
+            return False
+        return self.cache.is_fresh(self.cache.get(self.search_url.format(article=article)))
     
     def get_price_by_article(self, article):
         """Получение цены по артикулу с сайта lemanapro.ru"""
         try:
-            url = f"https://surgut.lemanapro.ru/search/?q={article}"
-            response = self.session.get(url, timeout=10)
+            url = self.search_url.format(article=article)
+            entry = self.cache.get(url) if self.cache is not None else None
+            if entry is not None and self.cache.is_fresh(entry):
+                return self.cache.use_fresh(entry)
+            
+            headers = self.cache.conditional_headers(entry) if self.cache is not None else {}
+            started = time.monotonic()
+            response = self.session.get(url, timeout=10, headers=headers)
+            elapsed = time.monotonic() - started
+            
+            if response.status_code == 304 and entry is not None:
+                return self.cache.not_modified(url, entry, len(response.content), elapsed)
             
             if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Поиск цены на странице (нужно адаптировать под структуру сайта)
-                price_selectors = [
-                    '.price',
-                    '.product-price',
-                    '[class*="price"]',
-                    '[data-price]'
-                ]
-                
-                for selector in price_selectors:
-                    price_elements = soup.select(selector)
-                    for element in price_elements:
-                        price_text = element.get_text(strip=True)
-                        # Извлекаем числа из текста
-                        price = ''.join(filter(str.isdigit, price_text))
-                        if price:
-                            return int(price)
+                price = extract_price(response.text)
+                if self.cache is not None:
+                    self.cache.store(url, response.headers, price, len(response.content), elapsed)
+                if price is not None:
+                    return price
             
             logger.warning(f"Цена для артикула {article} не найдена")
             return None
@@ -49,23 +100,40 @@ class LemanaproParser:
     def update_prices(self, df):
         """Обновление цен в DataFrame"""
         try:
-            updated_count = 0
+            if self.cache is not None:
+                self.cache.start_run()
             
-            for index, row in df.iterrows():
-                article = str(row['Артикул']).strip()
-                if article and article != 'nan' and article != 'None' and article != '':
-                    # Ждем между запросами чтобы не заблокировали
+            prices = {}
+            for article in article_column(df).unique():
+                # Ждем между запросами чтобы не заблокировали
+                if not self.is_cached(article):
                     time.sleep(1)
-                    
-                    new_price = self.get_price_by_article(article)
-                    if new_price and new_price != row['Продажная цена магазина']:
-                        df.at[index, 'Продажная цена магазина'] = new_price
-                        updated_count += 1
-                        logger.info(f"Обновлена цена для {article}: {new_price}")
+                prices[article] = self.get_price_by_article(article)
             
-            logger.info(f"Обновлено {updated_count} цен")
+            self.last_report = apply_prices(df, prices)
+            log_report(self.last_report)
+            if self.cache is not None:
+                self.cache.save()
+                self.cache.stats.report()
             return df
                 
         except Exception as e:
             logger.error(f"Ошибка обновления цен: {e}")
             return df
+    
+    async def update_prices_async(self, df, **scraper_options):
+        """Обновление цен в DataFrame с параллельной загрузкой страниц"""
+        from scraper import AsyncPriceScraper
+        
+        try:
+            scraper_options.setdefault('cache', self.cache)
+            scraper = AsyncPriceScraper(search_url=self.search_url, **scraper_options)
+            prices = await scraper.fetch_prices(article_column(df).unique())
+            
+            self.last_report = apply_prices(df, prices)
+            log_report(self.last_report)
+            return df
+        
+        except Exception as e:
+            logger.error(f"Ошибка обновления цен: {e}")
+            return df
@@ -0,0 +1,108 @@
+"""Обновление цен прайса с сайта lemanapro.ru
+
+Пример: python price_refresh.py                 # цены в data.xlsx.overrides.json
+        python price_refresh.py --target xlsx   # новые цены в ячейках data.xlsx
+Запущенный бот замечает новый файл цен и заменяет в каталоге только
+изменившиеся строки, не перечитывая data.xlsx.
+"""
+import argparse
+import asyncio
+import logging
+import os
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from catalog import PRICES_FILE, load_overrides, overrides_path, read_price_rows, save_overrides
+from page_cache import CACHE_FILE, PageCache
+from parser import PRICE_COLUMN, SEARCH_URL, LemanaproParser
+
+logger = logging.getLogger(__name__)
+
+# Колонка цены на листе (F)
+PRICE_CELL_COLUMN = 6
+
+
+def read_price_frame(path=PRICES_FILE):
+    """Артикулы и действующие цены прайса; индекс - номер строки листа"""
+    overrides = load_overrides(path)
+    rows = read_price_rows(path)
+    return pd.DataFrame(
+        {
+            'Артикул': [item['article'] for _, item in rows],
+            PRICE_COLUMN: [overrides.get(item['article'], item['price']) for _, item in rows]
+        },
+        index=[row_num for row_num, _ in rows]
+    )
+
+
+def write_price_cells(path, prices):
+    """Запись новых цен в ячейки листа: prices - номер строки -> цена
+
+    openpyxl не умеет менять отдельные ячейки в файле: книга читается и
+    сохраняется целиком. Значения ячеек сохраняются, но то, что openpyxl не
+    поддерживает (рисунки, диаграммы, макросы, часть оформления), при
+    перезаписи теряется. Файл подменяется атомарно, чтобы бот не прочитал
+    его наполовину записанным.
+    """
+    wb = load_workbook(path)
+    sheet = wb.active
+    for row_num, price in prices.items():
+        sheet.cell(row=row_num, column=PRICE_CELL_COLUMN).value = price
+    tmp_path = path + '.tmp'
+    wb.save(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def refresh_prices(path=PRICES_FILE, target='overrides', sequential=False, cache=None, search_url=SEARCH_URL,
+                   **scraper_options):
+    """Сбор цен с сайта и запись изменившихся; возвращает отчет об изменениях"""
+    df = read_price_frame(path)
+    parser = LemanaproParser(search_url, cache=cache)
+    if sequential:
+        parser.update_prices(df)
+    else:
+        asyncio.run(parser.update_prices_async(df, **scraper_options))
+
+    report = parser.last_report
+    if report is None or report.empty:
+        logger.info("Цены на сайте не изменились")
+        return report
+
+    articles = report['Артикул'].tolist()
+    prices = report['Новая цена'].tolist()
+    if target == 'xlsx':
+        write_price_cells(path, dict(zip(report.index, prices)))
+        # Цена из файла цен с сайта перекрыла бы записанную в ячейку
+        if os.path.exists(overrides_path(path)):
+            save_overrides({}, path, remove=articles)
+        logger.info(f"Записано {len(prices)} ячеек цены в {path}")
+    else:
+        save_overrides(dict(zip(articles, prices)), path)
+        logger.info(f"Записано {len(prices)} цен в {overrides_path(path)}")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Обновление цен прайса с сайта lemanapro.ru')
+    parser.add_argument('--file', default=PRICES_FILE, help='Excel файл прайса')
+    parser.add_argument('--target', choices=('overrides', 'xlsx'), default='overrides',
+                        help='куда писать новые цены: файл рядом с прайсом или ячейки прайса '
+                             '(книга перезаписывается целиком)')
+    parser.add_argument('--sequential', action='store_true', help='старый последовательный обход (1 запрос в секунду)')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=2.0, help='запросов в секунду к сайту')
+    parser.add_argument('--cache', default=CACHE_FILE, help='файл кэша страниц (пустая строка - без кэша)')
+    parser.add_argument('--report', help='CSV файл с изменившимися строками')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    cache = PageCache(args.cache) if args.cache else None
+    scraper_options = {} if args.sequential else {'concurrency': args.concurrency, 'rate': args.rate}
+    report = refresh_prices(args.file, args.target, args.sequential, cache, **scraper_options)
+    if args.report and report is not None:
+        report.to_csv(args.report, index_label='Строка', encoding='utf-8')
+
+
+if __name__ == '__main__':
+    main()
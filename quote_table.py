@@ -0,0 +1,192 @@
+"""Готовые расчеты лестниц для всех допустимых входных данных
+
+Высота вводится в пределах 1000-5000 мм, остальное выбирается кнопками:
+2 типа x 3 конфигурации x 3 ширины x 4001 целая высота = 72 018 расчетов.
+Таблица строится после загрузки прайса и хранит результаты по столбцам в
+массивах numpy: числа - массивом по высотам, повторяющиеся значения
+(список тетив, состав материалов) - номером варианта. Расчет по таблице -
+сборка StairQuote по индексу высоты без вызова калькулятора.
+"""
+import logging
+import time
+from dataclasses import fields
+
+import numpy as np
+
+from results import MaterialLine, StairQuote
+from ui import CONFIGS, MAX_HEIGHT, MIN_HEIGHT, STAIR_TYPES, STEP_WIDTHS
+
+logger = logging.getLogger(__name__)
+
+
+def _compact(values):
+    """Массив целых наименьшего подходящего типа"""
+    array = np.asarray(values, dtype=np.int64)
+    if array.size == 0:
+        return array
+    dtype = np.result_type(np.min_scalar_type(int(array.min())), np.min_scalar_type(int(array.max())))
+    return np.ascontiguousarray(array, dtype=dtype)
+
+
+class Variants:
+    """Значения, повторяющиеся по высотам: список разных значений и номер для каждой высоты"""
+
+    __slots__ = ('values', 'index')
+
+    def __init__(self, values):
+        distinct = {}
+        self.values = []
+        index = []
+        for value in values:
+            key = repr(value)
+            if key not in distinct:
+                distinct[key] = len(self.values)
+                self.values.append(value)
+            index.append(distinct[key])
+        self.index = _compact(index)
+
+    def __getitem__(self, i):
+        return self.values[self.index[i]]
+
+
+class QuoteBlock:
+    """Расчеты одной комбинации типа, конфигурации и ширины ступени по всем высотам
+
+    Строки материалов хранятся как (название, единица, цена) и массив
+    количеств; стоимость строки - цена x количество, как в калькуляторах.
+    Массивы лежат по высотам, чтобы все числа одной высоты читались одним
+    tolist(). Результат по таблице совпадает с расчетом калькулятора; общие
+    значения (списки тетив) разделяются между результатами и не изменяются.
+    """
+
+    __slots__ = ('material_type', 'keys', 'constants', 'int_keys', 'ints', 'float_keys', 'floats',
+                 'variants', 'lines', 'quantities', 'layouts')
+
+    def __init__(self, material_type, results):
+        self.material_type = material_type
+        self.keys = tuple(field.name for field in fields(StairQuote))
+        self.constants = {}
+        self.variants = {}
+        ints = {}
+        floats = {}
+        for key in self.keys:
+            if key in ('height', 'materials'):
+                continue
+            values = [getattr(result, key) for result in results]
+            types = {type(value) for value in values}
+            if all(value == values[0] for value in values) and len(types) == 1:
+                self.constants[key] = values[0]
+            elif types == {int}:
+                ints[key] = values
+            elif types == {float}:
+                floats[key] = values
+            else:
+                self.variants[key] = Variants(values)
+        self.int_keys = tuple(ints)
+        self.ints = _compact(np.array(list(ints.values()), dtype=np.int64).reshape(len(ints), len(results)).T)
+        self.float_keys = tuple(floats)
+        self.floats = np.array(list(floats.values()), dtype=np.float64).reshape(len(floats), len(results)).T.copy()
+
+        # Строки материалов: (название, единица, цена) -> номер строки
+        lines = {}
+        layouts = []
+        for result in results:
+            layout = []
+            for material in result.materials:
+                if material.total != material.price * material.qty or type(material.qty) is not int:
+                    raise ValueError(f"Стоимость строки {material.name} не равна цене x количество")
+                line = (material.name, material.unit, material.price)
+                layout.append(lines.setdefault(line, len(lines)))
+            layouts.append(tuple(layout))
+        self.lines = list(lines)
+        quantities = np.zeros((len(results), len(self.lines)), dtype=np.int64)
+        for i, result in enumerate(results):
+            for line, material in zip(layouts[i], result.materials):
+                quantities[i, line] = material.qty
+        self.quantities = _compact(quantities)
+        # Какие строки и в каком порядке есть у каждой высоты
+        self.layouts = Variants([tuple((line, *self.lines[line]) for line in layout) for layout in layouts])
+
+    def quote(self, i, height):
+        """Результат расчета для высоты с номером i"""
+        values = dict(self.constants)
+        values['height'] = height
+        values.update(zip(self.int_keys, self.ints[i].tolist()))
+        values.update(zip(self.float_keys, self.floats[i].tolist()))
+        for key, variants in self.variants.items():
+            values[key] = variants[i]
+        qty = self.quantities[i].tolist()
+        values['materials'] = [
+            MaterialLine(name, qty[line], unit, price, price * qty[line])
+            for line, name, unit, price in self.layouts[i]
+        ]
+        return StairQuote(**values)
+
+    def nbytes(self):
+        arrays = [self.ints, self.floats, self.quantities, self.layouts.index]
+        arrays += [variants.index for variants in self.variants.values()]
+        return sum(array.nbytes for array in arrays)
+
+
+class QuoteTable:
+    """Готовые расчеты для всех целых высот от MIN_HEIGHT до MAX_HEIGHT по одному каталогу"""
+
+    def __init__(self, version, first_height, count):
+        self.version = version
+        self.first_height = first_height
+        self.count = count
+        # (тип, конфигурация, ширина ступени) -> QuoteBlock
+        self.blocks = {}
+        self.build_time = None
+        self.hits = 0
+
+    @classmethod
+    def build(cls, calculate, catalog, heights=None, cancelled=None):
+        """Расчет всей таблицы функцией calculate(stair_type, config, material_type, height, step_width, catalog)
+
+        cancelled() проверяется между комбинациями: если каталог уже
+        сменился, построение прерывается и возвращается None.
+        """
+        started = time.perf_counter()
+        heights = range(MIN_HEIGHT, MAX_HEIGHT + 1) if heights is None else heights
+        table = cls(getattr(catalog, 'version', None), heights[0], len(heights))
+        for stair_type, material_type in STAIR_TYPES.items():
+            for config in CONFIGS:
+                for step_width in STEP_WIDTHS:
+                    if cancelled is not None and cancelled():
+                        return None
+                    # Высота из диалога - float, как и здесь
+                    results = [
+                        calculate(stair_type, config, material_type, float(height), step_width, catalog)
+                        for height in heights
+                    ]
+                    try:
+                        table.blocks[(stair_type, config, step_width)] = QuoteBlock(material_type, results)
+                    except ValueError as e:
+                        logger.warning(f"Расчеты {stair_type}/{config}/{step_width} не сохранены в таблицу: {e}")
+        table.build_time = time.perf_counter() - started
+        return table
+
+    def get(self, stair_type, config, material_type, height, step_width):
+        """Готовый расчет или None, если входных данных нет в таблице"""
+        block = self.blocks.get((stair_type, config, step_width))
+        if block is None or block.material_type != material_type:
+            return None
+        if not float(height).is_integer():
+            return None
+        i = int(height) - self.first_height
+        if not 0 <= i < self.count:
+            return None
+        self.hits += 1
+        return block.quote(i, height)
+
+    def __len__(self):
+        return len(self.blocks) * self.count
+
+    def nbytes(self):
+        """Размер массивов таблицы в байтах"""
+        return sum(block.nbytes() for block in self.blocks.values())
+
+    def stats(self):
+        return {'version': self.version, 'quotes': len(self), 'bytes': self.nbytes(),
+                'build_time': self.build_time, 'hits': self.hits}
@@ -0,0 +1,151 @@
+"""Пакетный расчет лестниц для прайс-листов и каталогов магазина
+
+Пример: python quotes.py --heights 2000:4000:100 --format csv -o quotes.csv
+"""
+import argparse
+import csv
+import itertools
+import json
+import sys
+
+import bot
+from ui import CONFIGS, STAIR_TYPES, STEP_WIDTHS
+
+CSV_FIELDS = (
+    'type', 'config', 'height', 'step_width', 'steps_count', 'platforms_count',
+    'step_height', 'stringer_length', 'total_cost', 'materials'
+)
+
+
+class BatchPrices:
+    """Цены каталога, найденные один раз на весь пакетный расчет"""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.version = getattr(catalog, 'version', None)
+        self._prices = {}
+        self._articles = {}
+
+    def __len__(self):
+        return len(self.catalog) if self.catalog is not None else 0
+
+    def get_price(self, material_type, name_pattern, default_price):
+        key = (material_type, name_pattern, default_price)
+        if key not in self._prices:
+            self._prices[key] = self.catalog.get_price(material_type, name_pattern, default_price)
+        return self._prices[key]
+
+    def find_stock(self, material_type, name_pattern):
+        key = ('stock', material_type, name_pattern)
+        if key not in self._prices:
+            self._prices[key] = self.catalog.find_stock(material_type, name_pattern)
+        return self._prices[key]
+
+    def get_by_article(self, article):
+        if article not in self._articles:
+            self._articles[article] = self.catalog.get_by_article(article)
+        return self._articles[article]
+
+
+def normalize_spec(spec):
+    """Проверка и приведение описания лестницы к аргументам расчета"""
+    stair_type = spec.get('type')
+    if stair_type not in STAIR_TYPES:
+        raise ValueError(f"Неизвестный тип лестницы: {stair_type!r}")
+    config = spec.get('config')
+    if config not in CONFIGS:
+        raise ValueError(f"Неизвестная конфигурация: {config!r}")
+    step_width = str(spec.get('step_width'))
+    if step_width not in STEP_WIDTHS:
+        raise ValueError(f"Неизвестная ширина ступени: {step_width!r}")
+    height = spec.get('height')
+    if not isinstance(height, (int, float)) or height <= 0:
+        raise ValueError(f"Некорректная высота: {height!r}")
+    material_type = spec.get('material_type') or STAIR_TYPES[stair_type]
+    return stair_type, config, material_type, height, step_width
+
+
+def quote_batch(specs, catalog=None):
+    """Расчет по списку описаний лестниц; результаты отдаются по мере готовности"""
+    if catalog is None:
+        catalog = bot.price_catalog
+    prices = BatchPrices(catalog)
+
+    for spec in specs:
+        stair_type, config, material_type, height, step_width = normalize_spec(spec)
+        calculator = bot.calculate_wood_stairs if stair_type == 'wood' else bot.calculate_modular_stairs
+        yield calculator(
+            height=height,
+            steps_count=0,
+            config=config,
+            material_type=material_type,
+            actual_step_height=bot.FIXED_STEP_HEIGHT,
+            step_width=step_width,
+            catalog=prices
+        )
+
+
+def iter_specs(heights, types=tuple(STAIR_TYPES), configs=CONFIGS, widths=STEP_WIDTHS):
+    """Все сочетания типа, конфигурации, ширины и высоты"""
+    for stair_type, config, step_width, height in itertools.product(types, configs, widths, heights):
+        yield {'type': stair_type, 'config': config, 'step_width': step_width, 'height': height}
+
+
+def parse_heights(value):
+    """Высоты из строки вида 2700,3000 или диапазона 2000:4000:100"""
+    if ':' in value:
+        start, stop, step = (int(part) for part in value.split(':'))
+        return list(range(start, stop + 1, step))
+    return [int(part) for part in value.split(',')]
+
+
+def write_csv(results, output):
+    writer = csv.DictWriter(output, fieldnames=CSV_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    for result in results:
+        row = result.to_dict()
+        row['materials'] = json.dumps(row['materials'], ensure_ascii=False)
+        writer.writerow(row)
+
+
+def write_jsonl(results, output):
+    for result in results:
+        output.write(json.dumps(result.to_dict(), ensure_ascii=False) + '\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Пакетный расчет стоимости лестниц')
+    parser.add_argument('--heights', default='1000:5000:100',
+                        help='высоты через запятую или диапазон начало:конец:шаг (мм)')
+    parser.add_argument('--types', default=','.join(STAIR_TYPES), help='wood,modular')
+    parser.add_argument('--configs', default=','.join(CONFIGS), help='straight,l_shape,u_shape')
+    parser.add_argument('--widths', default=','.join(STEP_WIDTHS), help='900,1000,1200')
+    parser.add_argument('--input', help='JSONL файл с описаниями лестниц вместо сочетаний')
+    parser.add_argument('--format', choices=('csv', 'jsonl'), default='jsonl')
+    parser.add_argument('-o', '--output', help='файл результата (по умолчанию stdout)')
+    args = parser.parse_args(argv)
+
+    bot.load_prices()
+
+    if args.input:
+        with open(args.input, encoding='utf-8') as f:
+            specs = [json.loads(line) for line in f if line.strip()]
+    else:
+        specs = iter_specs(
+            parse_heights(args.heights),
+            args.types.split(','),
+            args.configs.split(','),
+            args.widths.split(',')
+        )
+
+    writer = write_csv if args.format == 'csv' else write_jsonl
+    output = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        writer(quote_batch(specs), output)
+    finally:
+        if args.output:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
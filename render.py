@@ -0,0 +1,64 @@
+"""Текст результата расчета в Markdown
+
+Шаблон всего ответа собирается один раз для каждого набора строк (тип
+лестницы, есть ли площадки, число материалов) и хранится с уже
+привязанным format: ответ получается одним вызовом format вместо
+цепочки f-строк и конкатенаций.
+"""
+from functools import lru_cache
+
+CONFIG_NAMES = {
+    'straight': 'Прямая',
+    'l_shape': 'Г-образная',
+    'u_shape': 'П-образная'
+}
+TYPE_NAMES = {
+    'wood': 'Деревянная',
+    'modular': 'Модульная'
+}
+
+HEADER = (
+    "📊 *РЕЗУЛЬТАТ РАСЧЕТА*\n\n"
+    "🏷 *Тип:* {}\n"
+    "📐 *Конфигурация:* {}\n"
+    "📏 *Высота:* {:,} мм\n"
+    "📐 *Ширина ступени:* {} мм\n"
+    "🪜 *Количество ступеней:* {}\n"
+    "📏 *Высота ступени:* {:.1f} мм\n"
+)
+STRINGERS = "📏 *Длина тетивы:* {:.0f} мм\n🔢 *Количество тетив:* {} шт\n"
+PLATFORMS = "🟦 *Количество площадок:* {}\n"
+MATERIALS_TITLE = "\n📦 *МАТЕРИАЛЫ:*\n"
+MATERIAL = "• {}: {} {} × {:,.0f} ₽ = {:,.0f} ₽\n"
+TOTAL = "\n💰 *ОБЩАЯ СТОИМОСТЬ:* {:,.0f} ₽\n\n"
+NOTE = "_*Примечание:* Стоимость указана без учета доставки и монтажа_\n"
+
+
+@lru_cache(maxsize=None)
+def _template(wood, platforms, materials):
+    """format шаблона ответа; вариантов немного (тип x площадки x число строк)"""
+    template = HEADER
+    if wood:
+        template += STRINGERS
+    if platforms:
+        template += PLATFORMS
+    template += MATERIALS_TITLE + MATERIAL * materials + TOTAL + NOTE
+    return template.format
+
+
+def render_quote(quote):
+    """Текст ответа с результатом расчета (StairQuote)"""
+    wood = quote.type == 'wood'
+    platforms = quote.platforms_count > 0
+    values = [
+        TYPE_NAMES[quote.type], CONFIG_NAMES[quote.config], quote.height,
+        quote.step_width, quote.steps_count, quote.step_height
+    ]
+    if wood:
+        values += (quote.stringer_length, quote.stringer_qty)
+    if platforms:
+        values.append(quote.platforms_count)
+    for material in quote.materials:
+        values += (material.name, material.qty, material.unit, material.price, material.total)
+    values.append(quote.total_cost)
+    return _template(wood, platforms, len(quote.materials))(*values)
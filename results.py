@@ -0,0 +1,62 @@
+"""Результаты расчета лестниц: компактные объекты вместо вложенных словарей
+
+Калькуляторы возвращают StairQuote со списком MaterialLine. Оба класса -
+dataclass со __slots__; to_dict() отдает прежние словари для пакетного
+расчета (quotes.py) и внешних потребителей.
+"""
+from dataclasses import dataclass
+
+
+@dataclass(slots=True, frozen=True)
+class MaterialLine:
+    """Строка материалов: количество, цена за единицу и стоимость"""
+    name: str
+    qty: int
+    unit: str
+    price: float
+    total: float
+
+    def to_dict(self):
+        return {'name': self.name, 'qty': self.qty, 'unit': self.unit, 'price': self.price, 'total': self.total}
+
+
+@dataclass(slots=True)
+class StairQuote:
+    """Расчет одной лестницы
+
+    stringer_qty, stringers_detail и posts_count есть только у деревянных
+    лестниц. Результаты из кэша и таблицы расчетов общие, изменять их нельзя.
+    """
+    type: str
+    config: str
+    height: float
+    step_width: str
+    steps_count: int
+    platforms_count: int
+    step_height: float
+    stringer_length: float
+    materials: list
+    total_cost: float
+    stringer_qty: int = None
+    stringers_detail: list = None
+    posts_count: int = None
+
+    def to_dict(self):
+        """Словарь в прежнем формате калькуляторов (с тем же порядком ключей)"""
+        result = {
+            'type': self.type,
+            'config': self.config,
+            'height': self.height,
+            'step_width': self.step_width,
+            'steps_count': self.steps_count,
+            'platforms_count': self.platforms_count,
+            'step_height': self.step_height,
+            'stringer_length': self.stringer_length
+        }
+        if self.type == 'wood':
+            result['stringer_qty'] = self.stringer_qty
+            result['stringers_detail'] = self.stringers_detail
+            result['posts_count'] = self.posts_count
+        result['materials'] = [material.to_dict() for material in self.materials]
+        result['total_cost'] = self.total_cost
+        return result
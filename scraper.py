@@ -0,0 +1,301 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from parser import HEADERS, SEARCH_URL, extract_price
+
+logger = logging.getLogger(__name__)
+
+# Ответы, после которых запрос стоит повторить
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def parse_price(body):
+    """Цена из тела страницы (выполняется и в процессах пула разбора)"""
+    return extract_price(body.decode('utf-8', errors='replace'))
+
+
+class TokenBucket:
+    """Ограничение частоты запросов: rate токенов в секунду, запас до burst"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Ожидание свободного токена"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ScrapeProgress:
+    """Счетчики прогресса обновления цен с периодическим отчетом в лог"""
+
+    def __init__(self, total, report_interval=10.0, callback=None):
+        self.total = total
+        self.done = 0
+        self.found = 0
+        self.failed = 0
+        self.retries = 0
+        self.started = time.monotonic()
+        self.report_interval = report_interval
+        self.callback = callback
+        self._last_report = self.started
+
+    def update(self, price):
+        self.done += 1
+        if price is None:
+            self.failed += 1
+        else:
+            self.found += 1
+        now = time.monotonic()
+        if self.done == self.total or now - self._last_report >= self.report_interval:
+            self._last_report = now
+            self.report()
+
+    def snapshot(self):
+        elapsed = time.monotonic() - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        remaining = (self.total - self.done) / rate if rate else None
+        return {
+            'done': self.done,
+            'total': self.total,
+            'found': self.found,
+            'failed': self.failed,
+            'retries': self.retries,
+            'elapsed': elapsed,
+            'rate': rate,
+            'eta': remaining
+        }
+
+    def report(self):
+        stats = self.snapshot()
+        eta = f"{stats['eta']:.0f} с" if stats['eta'] is not None else "?"
+        logger.info(
+            f"Обновление цен: {stats['done']}/{stats['total']}, найдено {stats['found']}, "
+            f"ошибок {stats['failed']}, {stats['rate']:.1f} стр/с, осталось ~{eta}"
+        )
+        if self.callback:
+            self.callback(stats)
+
+
+class AsyncPriceScraper:
+    """Параллельная загрузка цен по артикулам с ограничением частоты на каждый хост"""
+
+    def __init__(self, search_url=SEARCH_URL, concurrency=8, rate=2.0, burst=4,
+                 retries=3, backoff=0.5, timeout=10, report_interval=10.0, progress_callback=None,
+                 cache=None, parse_processes=None, queue_size=256):
+        self.search_url = search_url
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.report_interval = report_interval
+        self.progress_callback = progress_callback
+        self.progress = None
+        # PageCache: условные запросы и пропуск недавно проверенных артикулов
+        self.cache = cache
+        # Процессы для разбора страниц: None - по числу ядер, 0 - разбор в цикле событий
+        self.parse_processes = parse_processes
+        # Размер очередей между стадиями конвейера
+        self.queue_size = queue_size
+        self._buckets = {}
+
+    def _bucket(self, url):
+        """Ограничитель частоты для хоста из URL"""
+        host = urlsplit(url).netloc
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.rate, self.burst)
+        return self._buckets[host]
+
+    def _backoff_delay(self, attempt, retry_after=None):
+        """Пауза перед повтором: Retry-After или экспонента со случайным разбросом"""
+        if retry_after is not None:
+            return retry_after
+        return self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+    async def fetch_response(self, session, url, headers=None):
+        """Статус, тело, заголовки ответа и время загрузки или None после исчерпания повторов"""
+        for attempt in range(self.retries + 1):
+            await self._bucket(url).acquire()
+            retry_after = None
+            try:
+                started = time.monotonic()
+                async with session.get(url, headers=headers) as response:
+                    if response.status in (200, 304):
+                        body = await response.read()
+                        return response.status, body, response.headers, time.monotonic() - started
+                    if response.status not in RETRY_STATUSES:
+                        logger.warning(f"Ответ {response.status} для {url}")
+                        return None
+                    header = response.headers.get('Retry-After')
+                    if header and header.isdigit():
+                        retry_after = int(header)
+                    logger.debug(f"Ответ {response.status} для {url}, попытка {attempt + 1}")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.debug(f"Ошибка загрузки {url}: {e!r}, попытка {attempt + 1}")
+
+            if attempt < self.retries:
+                self.progress.retries += 1
+                await asyncio.sleep(self._backoff_delay(attempt, retry_after))
+        logger.warning(f"Не удалось загрузить {url} за {self.retries + 1} попыток")
+        return None
+
+    async def fetch_body(self, session, article):
+        """Загрузка страницы артикула без разбора
+
+        Возвращает (цена, None), если цена известна без разбора (кэш, 304,
+        ошибка загрузки), или (None, (url, тело, заголовки, время загрузки)).
+        """
+        url = self.search_url.format(article=article)
+        entry = self.cache.get(url) if self.cache is not None else None
+        if entry is not None and self.cache.is_fresh(entry):
+            return self.cache.use_fresh(entry), None
+
+        headers = self.cache.conditional_headers(entry) if self.cache is not None else None
+        result = await self.fetch_response(session, url, headers)
+        if result is None:
+            return None, None
+        status, body, response_headers, elapsed = result
+        if status == 304:
+            if entry is None:
+                return None, None
+            return self.cache.not_modified(url, entry, len(body), elapsed), None
+        return None, (url, body, response_headers, elapsed)
+
+    def store_page(self, page, price):
+        """Запоминаем в кэше цену разобранной страницы"""
+        if self.cache is not None:
+            url, body, headers, elapsed = page
+            self.cache.store(url, headers, price, len(body), elapsed)
+
+    async def fetch_price(self, session, article):
+        """Цена по артикулу или None (разбор страницы в цикле событий)"""
+        price, page = await self.fetch_body(session, article)
+        if page is None:
+            return price
+        try:
+            price = parse_price(page[1])
+        except Exception as e:
+            logger.error(f"Ошибка парсинга артикула {article}: {e}")
+            return None
+        self.store_page(page, price)
+        return price
+
+    async def fetch_prices(self, articles):
+        """Цены для списка артикулов: словарь артикул -> цена или None"""
+        articles = list(dict.fromkeys(articles))
+        self.progress = ScrapeProgress(len(articles), self.report_interval, self.progress_callback)
+        if self.cache is not None:
+            self.cache.start_run()
+        prices = {}
+        queue = asyncio.Queue()
+        for article in articles:
+            queue.put_nowait(article)
+
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=HEADERS) as session:
+            fetchers = min(self.concurrency, len(articles))
+            if self.parse_processes == 0 or not articles:
+                await self._run_inline(session, queue, prices, fetchers)
+            else:
+                workers = self.parse_processes or os.cpu_count() or 1
+                with ProcessPoolExecutor(workers) as pool:
+                    await self._run_pipeline(session, queue, prices, fetchers, pool, workers * 2)
+        if self.cache is not None:
+            self.cache.save()
+            self.cache.stats.report()
+        return prices
+
+    async def _run_inline(self, session, queue, prices, fetchers):
+        """Загрузка и разбор в одних и тех же задачах цикла событий"""
+        async def worker():
+            while True:
+                try:
+                    article = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                price = await self.fetch_price(session, article)
+                prices[article] = price
+                self.progress.update(price)
+
+        await asyncio.gather(*(worker() for _ in range(fetchers)))
+
+    async def _run_pipeline(self, session, queue, prices, fetchers, pool, parsers):
+        """Конвейер: загрузка -> разбор в пуле процессов -> запись результатов
+
+        Стадии связаны очередями ограниченного размера: загрузка не ждет
+        разбора, пока очередь страниц не заполнится, а память не растет,
+        если разбор отстает.
+        """
+        loop = asyncio.get_running_loop()
+        pages = asyncio.Queue(self.queue_size)
+        results = asyncio.Queue(self.queue_size)
+
+        async def fetcher():
+            while True:
+                try:
+                    article = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                price, page = await self.fetch_body(session, article)
+                if page is None:
+                    await results.put((article, price, None))
+                else:
+                    await pages.put((article, page))
+
+        async def parser():
+            while True:
+                item = await pages.get()
+                if item is None:
+                    return
+                article, page = item
+                try:
+                    price = await loop.run_in_executor(pool, parse_price, page[1])
+                except Exception as e:
+                    logger.error(f"Ошибка парсинга артикула {article}: {e}")
+                    price, page = None, None
+                await results.put((article, price, page))
+
+        async def writer():
+            while True:
+                item = await results.get()
+                if item is None:
+                    return
+                article, price, page = item
+                if page is not None:
+                    self.store_page(page, price)
+                prices[article] = price
+                self.progress.update(price)
+
+        writer_task = asyncio.create_task(writer())
+        parser_tasks = [asyncio.create_task(parser()) for _ in range(parsers)]
+        try:
+            await asyncio.gather(*(fetcher() for _ in range(fetchers)))
+            for _ in parser_tasks:
+                await pages.put(None)
+            await asyncio.gather(*parser_tasks)
+            await results.put(None)
+            await writer_task
+        finally:
+            for task in parser_tasks + [writer_task]:
+                task.cancel()
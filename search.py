@@ -0,0 +1,275 @@
+import bisect
+import heapq
+import itertools
+import re
+
+# Классы совпадения слова запроса со словом позиции и их вес в рейтинге
+EXACT, PREFIX, INFIX, FUZZY = 4, 3, 2, 1
+# Бонусы: точный артикул и запрос из нескольких слов целиком в названии
+ARTICLE_BONUS = 20
+PHRASE_BONUS = 2
+# Сдвиг веса для позиций, найденных только с опечатками
+TIER_PENALTY = 1000
+# Опечатки ищем только в словах из букв не короче этой длины
+FUZZY_MIN_LENGTH = 4
+
+WORD_RE = re.compile(r'\w+')
+PART_RE = re.compile(r'\d+|[^\W\d_]+')
+
+
+def normalize(text):
+    """Нижний регистр и ё -> е"""
+    return text.lower().replace('ё', 'е')
+
+
+def tokenize(text):
+    """Слова строки; слова вида 4000x300x60 дополнительно делятся на части"""
+    tokens = []
+    for word in WORD_RE.findall(normalize(text)):
+        tokens.append(word)
+        parts = PART_RE.findall(word)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+def edit_distance(a, b, limit):
+    """Расстояние Дамерау-Левенштейна (OSA) с отсечкой по limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, prev2[j - 2] + 1)
+            cur[j] = value
+            row_min = min(row_min, value)
+        if row_min > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+def fuzzy_limit(token):
+    """Сколько опечаток допускаем в слове запроса"""
+    if len(token) < FUZZY_MIN_LENGTH or not token.isalpha():
+        return 0
+    return 1 if len(token) < 8 else 2
+
+
+def front_grams(token):
+    """Триграммы слова с дополнением в начале ($$а, $аб, абв, ...)"""
+    padded = '$$' + token
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Инвертированный индекс слов и триграмм по артикулу, названию и размерам
+
+    Работает с номерами позиций прайса; сами позиции хранит PriceCatalog.
+    """
+
+    def __init__(self, items):
+        self.tokens = []
+        self.phrases = []
+        self.articles = []
+        # слово -> номера позиций по возрастанию
+        self.postings = {}
+        for pos, item in enumerate(items):
+            text = f"{item['article']} {item['name']} {item.get('sizes', '')}"
+            tokens = tuple(dict.fromkeys(tokenize(text)))
+            self.tokens.append(frozenset(tokens))
+            self.phrases.append(normalize(item['name']))
+            self.articles.append(normalize(item['article']))
+            for token in tokens:
+                self.postings.setdefault(token, []).append(pos)
+
+        # артикул -> позиции с этим артикулом
+        self.article_positions = {}
+        for pos, article in enumerate(self.articles):
+            self.article_positions.setdefault(article, set()).add(pos)
+        # Отсортированный словарь для поиска по префиксу
+        self.vocabulary = sorted(self.postings)
+        # триграмма -> слова словаря, для поиска подстроки внутри слова
+        self.infix_grams = {}
+        # триграмма с началом слова -> буквенные слова, для поиска с опечатками
+        self.fuzzy_grams = {}
+        for token in self.vocabulary:
+            for i in range(len(token) - 2):
+                self.infix_grams.setdefault(token[i:i + 3], set()).add(token)
+            if token.isalpha():
+                for gram in front_grams(token):
+                    self.fuzzy_grams.setdefault(gram, set()).add(token)
+
+    def _prefix_range(self, token):
+        """Границы слов словаря, начинающихся с token"""
+        lo = bisect.bisect_left(self.vocabulary, token)
+        hi = bisect.bisect_left(self.vocabulary, token + '\uffff')
+        return lo, hi
+
+    def _matching_words(self, token):
+        """Слова словаря по классам совпадения: точное, префикс, подстрока"""
+        exact = {token} if token in self.postings else set()
+        lo, hi = self._prefix_range(token)
+        prefix = set(self.vocabulary[lo:hi]) - exact
+        infix = set()
+        if len(token) >= 3:
+            found = None
+            grams = {token[i:i + 3] for i in range(len(token) - 2)}
+            for gram in sorted(grams, key=lambda g: len(self.infix_grams.get(g, ()))):
+                words_with_gram = self.infix_grams.get(gram)
+                if not words_with_gram:
+                    found = set()
+                    break
+                found = set(words_with_gram) if found is None else found & words_with_gram
+            infix = {word for word in found if token in word} - exact - prefix
+        return exact, prefix, infix
+
+    def _fuzzy_words(self, token):
+        """Слова словаря, совпадающие с token (или их начало) с учетом опечаток"""
+        limit = fuzzy_limit(token)
+        if not limit:
+            return set()
+
+        # Одна опечатка портит не больше трех триграмм слова
+        grams = front_grams(token)
+        min_shared = max(1, len(grams) - 3 * limit)
+        shared = {}
+        for gram in grams:
+            for word in self.fuzzy_grams.get(gram, ()):
+                shared[word] = shared.get(word, 0) + 1
+
+        words = set()
+        size = len(token)
+        for word, count in shared.items():
+            if count < min_shared:
+                continue
+            if edit_distance(token, word, limit) <= limit:
+                words.add(word)
+            elif len(word) > size and any(
+                    edit_distance(token, word[:k], limit) <= limit
+                    for k in (size - 1, size, size + 1)):
+                words.add(word)
+        return words
+
+    def _positions(self, words):
+        """Объединение позиций, в которых встречаются слова"""
+        positions = set()
+        for word in words:
+            positions.update(self.postings[word])
+        return positions
+
+    def _token_classes(self, words_by_class):
+        """Позиции по классам совпадения (каждая позиция в лучшем классе) и все вместе"""
+        classes = []
+        seen = set()
+        for weight, words in words_by_class:
+            positions = self._positions(words) - seen
+            if positions:
+                classes.append((weight, positions))
+                seen |= positions
+        return classes, seen
+
+    def _top(self, token_classes, bonuses, limit, tier, best):
+        """Добавление в кучу best лучших позиций из сочетаний классов совпадения
+
+        Позиции делятся на группы с одинаковым весом; группы перебираются по
+        убыванию веса, а внутри группы - по номеру позиции. Как только
+        следующая позиция не обгоняет худшую из limit найденных, перебор
+        останавливается.
+        """
+        groups = []
+        for combo in itertools.product(*token_classes):
+            weight = sum(w for w, _ in combo) - TIER_PENALTY * tier
+            group = self._intersect([positions for _, positions in combo])
+            for bonus, positions in bonuses:
+                hits = group & positions
+                if hits:
+                    groups.append((weight + bonus, hits))
+                    group = group - hits
+            if group:
+                groups.append((weight, group))
+        groups.sort(key=lambda group: -group[0])
+
+        for score, group in groups:
+            if len(best) >= limit and (score, 0) < best[0]:
+                break
+            for pos in sorted(group):
+                key = (score, -pos)
+                if len(best) < limit:
+                    heapq.heappush(best, key)
+                elif key > best[0]:
+                    heapq.heapreplace(best, key)
+                else:
+                    break
+
+    def _bonuses(self, query_words, query_tokens, candidates):
+        """Позиции с бонусами: точный артикул и запрос из нескольких слов в названии"""
+        bonuses = [(ARTICLE_BONUS, self.article_positions.get(query_words, set()))]
+        if len(query_tokens) > 1:
+            bonuses.append((PHRASE_BONUS, {pos for pos in candidates if query_words in self.phrases[pos]}))
+        return bonuses
+
+    @staticmethod
+    def _intersect(sets):
+        """Пересечение множеств начиная с самого маленького"""
+        sets = sorted(sets, key=len)
+        result = set(sets[0])
+        for other in sets[1:]:
+            result &= other
+            if not result:
+                break
+        return result
+
+    def search(self, query, limit=10):
+        """Лучшие позиции по запросу и общее число найденных
+
+        Позиции с опечатками всегда идут после точных совпадений, поэтому
+        опечатки ищутся, только если точных совпадений меньше limit.
+        """
+        query_words = normalize(query).strip()
+        query_tokens = list(dict.fromkeys(tokenize(query)))
+        if not query_tokens:
+            return [], 0
+
+        words = [self._matching_words(token) for token in query_tokens]
+        strict = [
+            self._token_classes(zip((EXACT, PREFIX, INFIX), token_words))
+            for token_words in words
+        ]
+        # Общее число найденных считаем пересечением множеств, без ранжирования
+        candidates = self._intersect([matched for _, matched in strict])
+        total = len(candidates)
+        limit = limit or max(total, 1)
+        best = []
+        if candidates:
+            bonuses = self._bonuses(query_words, query_tokens, candidates)
+            self._top([classes for classes, _ in strict], bonuses, limit, 0, best)
+
+        if total < limit:
+            fuzzy_words = [self._fuzzy_words(token) - set().union(*token_words)
+                           for token, token_words in zip(query_tokens, words)]
+            if any(fuzzy_words):
+                fuzzy = [self._positions(extra) for extra in fuzzy_words]
+                extra_candidates = self._intersect([
+                    strict_matched | fuzzy_matched
+                    for (_, strict_matched), fuzzy_matched in zip(strict, fuzzy)
+                ]) - candidates
+                if extra_candidates:
+                    total += len(extra_candidates)
+                    # В сочетания берем только позиции с опечатками
+                    token_classes = [
+                        [(weight, positions & extra_candidates) for weight, positions in strict_classes]
+                        + [(FUZZY, (fuzzy_matched - strict_matched) & extra_candidates)]
+                        for (strict_classes, strict_matched), fuzzy_matched in zip(strict, fuzzy)
+                    ]
+                    bonuses = self._bonuses(query_words, query_tokens, extra_candidates)
+                    self._top(token_classes, bonuses, limit, 1, best)
+
+        best.sort(reverse=True)
+        return [-neg_pos for _, neg_pos in best], total
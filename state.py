@@ -0,0 +1,475 @@
+"""Хранилище состояния диалогов: сессии пользователей, сообщения чатов и
+состояния ConversationHandler
+
+Записи компактные (dataclass со __slots__) и устаревают через ttl после
+последнего изменения. Бэкенд в памяти ограничен числом записей, бэкенд
+SQLite хранит состояние на диске и переживает перезапуск бота. О записях,
+удаленных по сроку или вытесненных, бэкенд сообщает через on_remove, чтобы
+вместе с сессией удалялось и состояние диалога пользователя - и в бэкенде,
+и в памяти ConversationHandler.
+"""
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+# Сессия без действий пользователя дольше этого срока (с) удаляется
+SESSION_TTL = 24 * 60 * 60
+# Сколько записей держит бэкенд в памяти
+MEMORY_LIMIT = 100_000
+# Как часто записывать накопленные изменения в SQLite (с)
+FLUSH_INTERVAL = 1.0
+
+
+def _notify_removed(backend, entries):
+    """Вызов on_remove бэкенда для удаленных записей (пространство, ключ)"""
+    if backend.on_remove is not None:
+        for namespace, key in entries:
+            backend.on_remove(namespace, key)
+
+
+@dataclass(slots=True)
+class UserSession:
+    """Выбор пользователя в диалоге расчета"""
+    stair_type: str = None
+    material_type: str = None
+    config: str = None
+    height: float = None
+    step_width: str = None
+
+
+@dataclass(slots=True)
+class ChatHistory:
+    """Сообщения чата, которые бот удалит при очистке истории"""
+    message_ids: list = field(default_factory=list)
+
+
+class MemoryBackend:
+    """Состояние в памяти: не больше max_entries записей, лишние вытесняются по давности"""
+
+    # Записи хранятся как есть, без сериализации
+    stores_objects = True
+
+    def __init__(self, max_entries=MEMORY_LIMIT, on_remove=None):
+        self.max_entries = max_entries
+        self.on_remove = on_remove
+        self.evictions = 0
+        # (пространство, ключ) -> (время изменения, значение) в порядке изменения
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, namespace, key):
+        """(время изменения, значение) или None"""
+        with self._lock:
+            return self._data.get((namespace, key))
+
+    def put(self, namespace, key, value, touched):
+        evicted = []
+        with self._lock:
+            self._data[(namespace, key)] = (touched, value)
+            self._data.move_to_end((namespace, key))
+            while len(self._data) > self.max_entries:
+                evicted.append(self._data.popitem(last=False)[0])
+                self.evictions += 1
+        _notify_removed(self, evicted)
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self._data.pop((namespace, key), None)
+
+    def items(self, namespace):
+        """Все записи пространства: (ключ, время изменения, значение)"""
+        with self._lock:
+            return [(key, touched, value) for (ns, key), (touched, value) in self._data.items() if ns == namespace]
+
+    def purge(self, older_than):
+        """Удаление записей, не менявшихся с older_than; возвращает их число"""
+        removed = []
+        with self._lock:
+            # Записи упорядочены по времени изменения, старые - в начале
+            while self._data:
+                touched, _ = next(iter(self._data.values()))
+                if touched >= older_than:
+                    break
+                removed.append(self._data.popitem(last=False)[0])
+        _notify_removed(self, removed)
+        return len(removed)
+
+    def flush(self):
+        """Записывать нечего: все уже в памяти"""
+        return 0
+
+    def stats(self):
+        return {'backend': 'memory', 'entries': len(self._data), 'max_entries': self.max_entries,
+                'evictions': self.evictions}
+
+    def close(self):
+        pass
+
+
+class SQLiteBackend:
+    """Состояние в файле SQLite: переживает перезапуск, память не растет с числом пользователей
+
+    put и delete только запоминают изменение в памяти; на диск изменения
+    пишет flush() одной транзакцией. Бот вызывает его раз в FLUSH_INTERVAL
+    в рабочем потоке, поэтому commit и ожидание диска не задерживают цикл
+    событий. Чтение сначала смотрит в еще не записанные изменения, затем в
+    файл через отдельное соединение (в режиме WAL запись его не блокирует).
+    При аварийной остановке теряются изменения за последний интервал.
+    """
+
+    stores_objects = False
+
+    def __init__(self, path, on_remove=None):
+        self.path = path
+        self.on_remove = on_remove
+        self._reader = None
+        self._writer = None
+        # (пространство, ключ JSON) -> (время изменения, значение) или None (удаление), еще не на диске
+        self._pending = {}
+        # Изменения, которые сейчас записывает flush
+        self._flushing = {}
+        self.flushes = 0
+        # Буферы изменений
+        self._lock = threading.Lock()
+        # Соединение для чтения
+        self._read_lock = threading.Lock()
+        # Соединение для записи: flush и purge идут по одному
+        self._write_lock = threading.Lock()
+
+    def _connect(self):
+        # Файл создается при первом обращении, а не при импорте бота
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS state ('
+            'namespace TEXT NOT NULL, key TEXT NOT NULL, touched REAL NOT NULL, value TEXT NOT NULL, '
+            'PRIMARY KEY (namespace, key)) WITHOUT ROWID'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS state_touched ON state (touched)')
+        conn.commit()
+        return conn
+
+    def _reader_connection(self):
+        if self._reader is None:
+            self._reader = self._connect()
+        return self._reader
+
+    def _writer_connection(self):
+        if self._writer is None:
+            self._writer = self._connect()
+        return self._writer
+
+    @staticmethod
+    def _key(key):
+        return json.dumps(key)
+
+    @staticmethod
+    def _load_key(text):
+        key = json.loads(text)
+        # Ключи ConversationHandler - кортежи, JSON возвращает списки
+        return tuple(key) if isinstance(key, list) else key
+
+    def get(self, namespace, key):
+        entry_key = (namespace, self._key(key))
+        with self._lock:
+            for buffer in (self._pending, self._flushing):
+                if entry_key in buffer:
+                    return buffer[entry_key]
+        with self._read_lock:
+            row = self._reader_connection().execute(
+                'SELECT touched, value FROM state WHERE namespace = ? AND key = ?', entry_key
+            ).fetchone()
+        return None if row is None else (row[0], row[1])
+
+    def put(self, namespace, key, value, touched):
+        with self._lock:
+            self._pending[(namespace, self._key(key))] = (touched, value)
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self._pending[(namespace, self._key(key))] = None
+
+    def flush(self):
+        """Запись накопленных изменений одной транзакцией; возвращает их число"""
+        with self._write_lock:
+            return self._flush()
+
+    def _flush(self):
+        with self._lock:
+            if not self._pending:
+                return 0
+            batch = self._flushing = self._pending
+            self._pending = {}
+        conn = self._writer_connection()
+        try:
+            conn.executemany(
+                'INSERT OR REPLACE INTO state (namespace, key, touched, value) VALUES (?, ?, ?, ?)',
+                [(namespace, key, entry[0], entry[1]) for (namespace, key), entry in batch.items() if entry is not None]
+            )
+            conn.executemany(
+                'DELETE FROM state WHERE namespace = ? AND key = ?',
+                [entry_key for entry_key, entry in batch.items() if entry is None]
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            # Не записанное вернется в следующий flush; более новые изменения важнее
+            with self._lock:
+                self._pending = {**batch, **self._pending}
+                self._flushing = {}
+            raise
+        with self._lock:
+            self._flushing = {}
+        self.flushes += 1
+        return len(batch)
+
+    def items(self, namespace):
+        # Буферы берем до чтения файла: если flush успеет записать их раньше, значения совпадут
+        with self._lock:
+            overlay = {**self._flushing, **self._pending}
+        with self._read_lock:
+            rows = self._reader_connection().execute(
+                'SELECT key, touched, value FROM state WHERE namespace = ?', (namespace,)
+            ).fetchall()
+        entries = {key: (touched, value) for key, touched, value in rows}
+        for (entry_namespace, key), entry in overlay.items():
+            if entry_namespace != namespace:
+                continue
+            if entry is None:
+                entries.pop(key, None)
+            else:
+                entries[key] = entry
+        return [(self._load_key(key), touched, value) for key, (touched, value) in entries.items()]
+
+    def purge(self, older_than):
+        with self._write_lock:
+            # Сначала новые изменения: продленная запись не должна удалиться по старому времени
+            self._flush()
+            conn = self._writer_connection()
+            removed = []
+            if self.on_remove is not None:
+                removed = conn.execute('SELECT namespace, key FROM state WHERE touched < ?', (older_than,)).fetchall()
+            count = conn.execute('DELETE FROM state WHERE touched < ?', (older_than,)).rowcount
+            conn.commit()
+        _notify_removed(self, [(namespace, self._load_key(key)) for namespace, key in removed])
+        return count
+
+    def stats(self):
+        """Число записей в файле (без еще не записанных изменений)"""
+        with self._read_lock:
+            entries = self._reader_connection().execute('SELECT COUNT(*) FROM state').fetchone()[0]
+        with self._lock:
+            pending = len(self._pending) + len(self._flushing)
+        return {'backend': 'sqlite', 'path': self.path, 'entries': entries, 'pending': pending,
+                'flushes': self.flushes}
+
+    def close(self):
+        with self._write_lock:
+            self._flush()
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        with self._read_lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+
+
+def open_backend(path, max_entries=MEMORY_LIMIT):
+    """SQLite по пути к файлу или память, если путь пустой или ':memory:'"""
+    if not path or path == ':memory:':
+        return MemoryBackend(max_entries)
+    return SQLiteBackend(path)
+
+
+class StateStore:
+    """Записи одного вида (сессии, истории чатов) по ключу с устареванием через ttl"""
+
+    def __init__(self, backend, namespace, record_type, ttl=SESSION_TTL):
+        self.backend = backend
+        self.namespace = namespace
+        self.record_type = record_type
+        self.ttl = ttl
+
+    def get(self, key):
+        """Запись по ключу или None, если ее нет или она устарела"""
+        entry = self.backend.get(self.namespace, key)
+        if entry is None:
+            return None
+        touched, value = entry
+        if time.time() - touched > self.ttl:
+            self.backend.delete(self.namespace, key)
+            _notify_removed(self.backend, [(self.namespace, key)])
+            return None
+        if self.backend.stores_objects:
+            return value
+        return self.record_type(**json.loads(value))
+
+    def put(self, key, record):
+        """Сохранение записи; время изменения продлевает ее жизнь"""
+        value = record if self.backend.stores_objects else json.dumps(asdict(record), ensure_ascii=False)
+        self.backend.put(self.namespace, key, value, time.time())
+
+    def pop(self, key):
+        """Запись по ключу с удалением из хранилища"""
+        record = self.get(key)
+        if record is not None:
+            self.backend.delete(self.namespace, key)
+        return record
+
+
+class StatePersistence(BasePersistence):
+    """Состояния ConversationHandler в том же бэкенде, что и сессии
+
+    Остальные данные PTB (user_data, chat_data, bot_data) бот не
+    использует, поэтому они не сохраняются. Когда сессия пользователя из
+    sessions_namespace удаляется по сроку или вытесняется, удаляются и
+    сохраненные состояния его диалогов: ключ диалога - (чат, пользователь).
+    Удаленное по сроку, вытесненное или удаленное вместе с сессией состояние
+    убирается и из словаря состояний ConversationHandler (attach), иначе
+    словарь рос бы с каждым пользователем, бросившим диалог.
+    """
+
+    def __init__(self, backend, ttl=SESSION_TTL, update_interval=60, sessions_namespace='user'):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=False, callback_data=False),
+            update_interval=update_interval
+        )
+        self.backend = backend
+        self.ttl = ttl
+        self.sessions_namespace = sessions_namespace
+        # пользователь -> {(пространство, ключ диалога)}
+        self._user_conversations = {}
+        self._index_lock = threading.Lock()
+        # имя диалога -> ConversationHandler, состояния которого чистятся вместе с сессиями
+        self._handlers = {}
+        # Цикл событий бота: из потока очистки словари обработчиков меняются через него
+        self._loop = None
+        backend.on_remove = self._session_removed
+
+    def attach(self, handler):
+        """Удалять состояния диалогов handler из памяти вместе с записями в бэкенде"""
+        self._handlers[handler.name] = handler
+
+    def _namespace(self, name):
+        return f'conversation:{name}'
+
+    def _index(self, namespace, key, present):
+        if not isinstance(key, tuple) or not key:
+            return
+        with self._index_lock:
+            keys = self._user_conversations.setdefault(key[-1], set())
+            if present:
+                keys.add((namespace, key))
+            else:
+                keys.discard((namespace, key))
+                if not keys:
+                    del self._user_conversations[key[-1]]
+
+    def _forget_handler_state(self, namespace, key):
+        """Удаление состояния из словаря ConversationHandler (в цикле событий)"""
+        handler = self._handlers.get(namespace[len('conversation:'):])
+        if handler is None:
+            return
+        # Запись в бэкенде уже удалена: удаляем без отметки для update_conversation
+        conversations = handler._conversations
+        getattr(conversations, 'data', conversations).pop(key, None)
+
+    def _conversation_removed(self, namespace, key):
+        self._index(namespace, key, False)
+        loop = self._loop
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if loop is None or running is loop:
+            self._forget_handler_state(namespace, key)
+        elif not loop.is_closed():
+            # Вызов из потока очистки: словарь обработчика меняем только в его цикле
+            loop.call_soon_threadsafe(self._forget_handler_state, namespace, key)
+
+    def _session_removed(self, namespace, key):
+        if namespace.startswith('conversation:'):
+            # Само состояние диалога удалено по сроку или вытеснено
+            self._conversation_removed(namespace, key)
+            return
+        if namespace != self.sessions_namespace:
+            return
+        with self._index_lock:
+            conversations = self._user_conversations.pop(key, ())
+        for conversation_namespace, conversation_key in conversations:
+            self.backend.delete(conversation_namespace, conversation_key)
+            self._conversation_removed(conversation_namespace, conversation_key)
+
+    def _decode(self, value):
+        return value if self.backend.stores_objects else json.loads(value)
+
+    async def get_conversations(self, name):
+        self._loop = asyncio.get_running_loop()
+        older_than = time.time() - self.ttl
+        conversations = {
+            key: self._decode(value)
+            for key, touched, value in self.backend.items(self._namespace(name))
+            if touched >= older_than
+        }
+        for key in conversations:
+            self._index(self._namespace(name), key, True)
+        return conversations
+
+    async def update_conversation(self, name, key, new_state):
+        if new_state is None:
+            self.backend.delete(self._namespace(name), key)
+            self._index(self._namespace(name), key, False)
+            return
+        value = new_state if self.backend.stores_objects else json.dumps(new_state)
+        self.backend.put(self._namespace(name), key, value, time.time())
+        self._index(self._namespace(name), key, True)
+
+    async def get_user_data(self):
+        return {}
+
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def update_user_data(self, user_id, data):
+        pass
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def drop_user_data(self, user_id):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def refresh_user_data(self, user_id, user_data):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    async def flush(self):
+        self.backend.close()
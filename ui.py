@@ -0,0 +1,127 @@
+"""Готовые элементы интерфейса бота: клавиатуры и постоянные тексты сообщений
+
+Объекты клавиатур Telegram после создания не изменяются, поэтому
+создаются один раз при импорте и отправляются всеми обработчиками, а не
+собираются заново на каждое сообщение. Тексты с переменными частями
+хранятся шаблонами с уже привязанным format.
+"""
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup
+
+# Допустимые входные данные расчета: тип лестницы (и материал в прайсе),
+# конфигурация, ширина ступени и высота (мм)
+STAIR_TYPES = {
+    'wood': 'деревянная',
+    'modular': 'металлическая'
+}
+CONFIGS = ('straight', 'l_shape', 'u_shape')
+STEP_WIDTHS = ('900', '1000', '1200')
+MIN_HEIGHT = 1000
+MAX_HEIGHT = 5000
+
+# Кнопки обычной клавиатуры, по которым обработчики узнают команду
+RESTART_BUTTON = "🔄 Перезапустить"
+SEARCH_BUTTON = "🔍 Найти материал"
+
+# Главное меню: /start и перезапуск
+MAIN_MENU = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🔄 Рассчитать лестницу", callback_data="calculate_stairs")],
+    [InlineKeyboardButton("🔍 Найти материал", callback_data="search_material")],
+    [InlineKeyboardButton("🔄 Перезапустить", callback_data="restart")]
+])
+# Под результатом расчета
+QUOTE_MENU = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🔄 Новый расчет", callback_data="calculate_stairs")],
+    [InlineKeyboardButton("🔍 Поиск материала", callback_data="search_material")],
+    [InlineKeyboardButton("🔄 Перезапустить", callback_data="restart")]
+])
+# Под результатами поиска материала
+SEARCH_MENU = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🔄 Новый поиск", callback_data="search_material")],
+    [InlineKeyboardButton("🏠 Расчет лестницы", callback_data="calculate_stairs")],
+    [InlineKeyboardButton("🔄 Перезапустить", callback_data="restart")]
+])
+
+RESTART_KEYBOARD = ReplyKeyboardMarkup([[RESTART_BUTTON]], one_time_keyboard=True, resize_keyboard=True)
+TYPE_KEYBOARD = ReplyKeyboardMarkup([
+    ["🏠 Деревянная", "⚡ Модульная"],
+    [SEARCH_BUTTON, RESTART_BUTTON]
+], one_time_keyboard=True, resize_keyboard=True)
+CONFIG_KEYBOARD = ReplyKeyboardMarkup([
+    ["📏 Прямая", "📐 Г-образная", "🔄 П-образная"],
+    [SEARCH_BUTTON, RESTART_BUTTON]
+], one_time_keyboard=True, resize_keyboard=True)
+STEP_WIDTH_KEYBOARD = ReplyKeyboardMarkup([
+    ["900", "1000", "1200"],
+    [SEARCH_BUTTON, RESTART_BUTTON]
+], one_time_keyboard=True, resize_keyboard=True)
+
+CONFIG_CHOICES = {
+    '📏 Прямая': 'straight',
+    '📐 Г-образная': 'l_shape',
+    '🔄 П-образная': 'u_shape'
+}
+
+welcome_text = (
+    "👋 Добро пожаловать, {}!\n"
+    "Я твой помощник в расчете лестниц.\n\n"
+    "📋 *Доступные функции:*\n"
+    "• 🏠 *Расчет лестницы* - полный расчет стоимости\n"
+    "• 🔍 *Поиск материала* - найти материал по артикулу или названию\n\n"
+    "Выберите действие:"
+).format
+TYPE_PROMPT = (
+    "👋 Добро пожаловать!\n\n"
+    "📋 *Выберите тип лестницы:*\n"
+    "• 🏠 *Деревянная* - из отдельных элементов\n"
+    "• ⚡ *Модульная* - металлическая система"
+)
+SEARCH_PROMPT = (
+    "🔍 *ПОИСК МАТЕРИАЛА*\n\n"
+    "Введите артикул или название материала для поиска:\n\n"
+    "Примеры:\n"
+    "• `15762294` - поиск по артикулу\n"
+    "• `Ступень` - поиск по названию\n"
+    "• `Тетива` - поиск по названию"
+)
+CONFIG_PROMPT = (
+    "📐 *Выберите конфигурацию лестницы:*\n\n"
+    "• 📏 *Прямая* - одномаршевая лестница\n"
+    "• 📐 *Г-образная* - с поворотом на 90°\n"
+    "• 🔄 *П-образная* - с поворотом на 180°"
+)
+HEIGHT_PROMPT = (
+    "📏 *Введите высоту лестницы (мм):*\n\n"
+    "Примеры:\n"
+    "• 2700 - для высоты 2.7 метра\n"
+    "• 3000 - для высоты 3 метра\n"
+    "• 3500 - для высоты 3.5 метра\n\n"
+    "📝 *Рекомендация:* Высота измеряется от чистого пола нижнего этажа до чистого пола верхнего этажа"
+)
+STEP_WIDTH_PROMPT = (
+    "📐 *Выберите ширину ступени:*\n\n"
+    "• 900 мм - компактный вариант\n"
+    "• 1000 мм - стандартная ширина\n"
+    "• 1200 мм - просторная лестница"
+)
+CALCULATING_TEXT = "🧮 *Выполняю расчет...*"
+SEARCHING_TEXT = "🔍 Ищу материалы..."
+
+# Результаты поиска материала
+search_title = "🔍 *РЕЗУЛЬТАТЫ ПОИСКА* ('{}')\n\n".format
+search_item_text = (
+    "*{}. {}*\n"
+    "📋 Артикул: `{}`\n"
+    "🏷 Тип: {}\n"
+    "📏 Размеры: {}\n"
+    "💰 Цена: {:,.0f} ₽\n"
+    "📦 Ед. изм.: {}\n\n"
+).format
+search_more = "*... и еще {} материалов*".format
+SEARCH_FOOTER = "\n_Для нового поиска введите артикул или название_"
+search_not_found_text = (
+    "❌ Материалы по запросу '{}' не найдены.\n\n"
+    "Попробуйте:\n"
+    "• Проверить правильность артикула\n"
+    "• Использовать другое название\n"
+    "• Упростить запрос"
+).format
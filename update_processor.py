@@ -0,0 +1,96 @@
+"""Параллельная обработка обновлений Telegram с порядком внутри пользователя
+
+Обновления разных пользователей обрабатываются одновременно (не больше
+заданного числа), обновления одного пользователя - строго по очереди, как
+пришли: шаги ConversationHandler и сессии не перепутаются.
+"""
+import asyncio
+import logging
+
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+# Во сколько раз принятых в работу обновлений (вместе с ждущими своей очереди)
+# может быть больше, чем обрабатываемых одновременно
+PENDING_FACTOR = 16
+
+
+def update_key(update):
+    """Ключ очереди: пользователь, для обновлений без пользователя - чат"""
+    user = getattr(update, 'effective_user', None)
+    if user is not None:
+        return 'user', user.id
+    chat = getattr(update, 'effective_chat', None)
+    if chat is not None:
+        return 'chat', chat.id
+    return None
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Обработчик обновлений для ApplicationBuilder.concurrent_updates
+
+    Семафор базового класса ограничивает число принятых обновлений, включая
+    ждущие предыдущее обновление своего пользователя, а собственный семафор -
+    число обрабатываемых одновременно. Так пользователь, приславший много
+    сообщений подряд, не занимает слоты обработки остальных.
+
+    preempt(update) вызывается сразу для обновления, которое встало в очередь
+    за еще не обработанным обновлением того же пользователя: например, чтобы
+    кнопка перезапуска отменила идущий расчет, а не ждала его окончания.
+    """
+
+    def __init__(self, max_concurrent_updates, max_pending_updates=None, preempt=None):
+        super().__init__(max_pending_updates or max_concurrent_updates * PENDING_FACTOR)
+        self.limit = max_concurrent_updates
+        self.preempt = preempt
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        # ключ -> [блокировка, число обновлений в работе и в очереди]
+        self._queues = {}
+        self.active = 0
+        self.processed = 0
+        self.max_user_queue = 0
+
+    async def _run(self, coroutine):
+        async with self._slots:
+            self.active += 1
+            try:
+                await coroutine
+            finally:
+                self.active -= 1
+                self.processed += 1
+
+    async def do_process_update(self, update, coroutine):
+        key = update_key(update)
+        if key is None:
+            await self._run(coroutine)
+            return
+
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = [asyncio.Lock(), 0]
+        elif self.preempt is not None:
+            try:
+                self.preempt(update)
+            except Exception as e:
+                logger.error(f"Ошибка прерывания обработки обновления: {e}")
+        queue[1] += 1
+        self.max_user_queue = max(self.max_user_queue, queue[1])
+        try:
+            # asyncio.Lock пропускает ждущих в порядке прихода
+            async with queue[0]:
+                await self._run(coroutine)
+        finally:
+            queue[1] -= 1
+            if queue[1] == 0:
+                del self._queues[key]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def stats(self):
+        return {'max_concurrent_updates': self.limit, 'active': self.active, 'users': len(self._queues),
+                'processed': self.processed, 'max_user_queue': self.max_user_queue}
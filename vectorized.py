@@ -0,0 +1,169 @@
+"""Векторный расчет лестниц на NumPy для целых диапазонов высот
+
+Повторяет calculate_wood_stairs и calculate_modular_stairs операция в
+операцию, поэтому результаты совпадают с ними точно. Нужен для построения
+прайс-листов по тысячам высот; для работы требуется numpy.
+"""
+import numpy as np
+
+import bot
+from cutting import cut_stock
+
+STEP_DEPTH = 300
+
+
+def _square(values):
+    """Квадрат как x**2 в Python
+
+    NumPy возводит массив в квадрат как x * x, а Python для float вызывает
+    pow(); результаты иногда расходятся в последнем бите. float_power
+    вызывает pow() и совпадает со скалярным расчетом.
+    """
+    return np.float_power(values, 2)
+
+
+def _width_prices(widths, price_for_width):
+    """Массив цен по массиву ширин ступеней"""
+    prices = np.zeros(widths.shape)
+    for width in np.unique(widths):
+        prices[widths == width] = price_for_width(str(width))
+    return prices
+
+
+def _stringers(pieces, stock):
+    """Число досок и стоимость тетив, как в optimize_stringers
+
+    pieces - массивы длин тетив, по одному на каждую тетиву маршей. Раскрой
+    считается только для разных наборов длин (с округлением до мм вверх,
+    как в cut_stock).
+    """
+    shape = np.broadcast_shapes(*(piece.shape for piece in pieces))
+    lengths = np.ceil(np.stack([np.broadcast_to(piece, shape).ravel() for piece in pieces]))
+    unique, inverse = np.unique(lengths, axis=1, return_inverse=True)
+    solved = np.array([cut_stock(column.tolist(), stock)[1:] for column in unique.T], dtype=float).reshape(-1, 2)
+    inverse = inverse.reshape(-1)
+    return solved[inverse, 0].reshape(shape), solved[inverse, 1].reshape(shape)
+
+
+def _steps(heights, config):
+    """Количество ступеней, высота ступени и число площадок"""
+    steps = np.ceil(heights / bot.FIXED_STEP_HEIGHT)
+    step_height = heights / steps
+    platforms = {'straight': 0, 'l_shape': 1, 'u_shape': 2}[config]
+    if platforms:
+        steps = np.maximum(1, steps - platforms)
+    return steps, step_height, platforms
+
+
+def wood_stairs(config, heights, step_widths, material_type='деревянная', catalog=None):
+    """Расчет деревянных лестниц для массивов высот и ширин ступеней"""
+    if catalog is None:
+        catalog = bot.price_catalog
+    heights, widths = np.broadcast_arrays(np.asarray(heights, dtype=float), np.asarray(step_widths).astype(str))
+
+    def price(pattern, default):
+        return bot.get_material_price(material_type, pattern, default, catalog=catalog)
+
+    steps, step_height, platforms = _steps(heights, config)
+
+    if config == 'straight':
+        stair_length = (steps - 1) * STEP_DEPTH
+        stringer = np.sqrt(_square(heights) + _square(stair_length))
+        total_stringer_length = stringer * 2
+        pieces = [stringer] * 2
+    elif config == 'l_shape':
+        first = np.ceil(steps / 2)
+        second = steps - first
+        first_height = first * step_height
+        second_height = second * step_height
+        first_length = (first - 1) * STEP_DEPTH
+        second_length = (second - 1) * STEP_DEPTH
+        first_stringer = np.sqrt(_square(first_height) + _square(first_length))
+        second_stringer = np.sqrt(_square(second_height) + _square(second_length))
+        total_stringer_length = (first_stringer + second_stringer) * 2
+        pieces = [first_stringer] * 2 + [second_stringer] * 2
+    else:
+        flight = np.ceil(steps / 3)
+        flight = np.where(steps - flight * 2 < 0, np.ceil(steps / 2), flight)
+        flight_height = flight * step_height
+        flight_length = (flight - 1) * STEP_DEPTH
+        flight_stringer = np.sqrt(_square(flight_height) + _square(flight_length))
+        total_stringer_length = flight_stringer * 4
+        pieces = [flight_stringer] * 4
+
+    stringer_length = total_stringer_length / 2
+    stringer_qty, stringer_cost = _stringers(pieces, bot.get_stringer_stock(material_type, catalog=catalog))
+
+    total = np.zeros(heights.shape)
+    total = total + stringer_cost
+    total = total + steps * _width_prices(widths, lambda w: price(f'СТУПЕНЬ ПРЯМАЯ {w}', 1500))
+    total = total + steps * _width_prices(widths, lambda w: price(f'Подступенок {w}', 600))
+    if platforms:
+        platform_prices = _width_prices(
+            widths,
+            lambda w: price('Площадка 1000', 8000) if w in ('900', '1000') else price('Площадка 1200', 9500)
+        )
+        total = total + platforms * platform_prices
+    posts = {'straight': 2, 'l_shape': 3, 'u_shape': 4}[config]
+    total = total + posts * price('Столб', 1931)
+    total = total + (steps + platforms) * price('Балясина', 400)
+    handrail_qty = np.ceil(stringer_length / 3000)
+    total = total + handrail_qty * price('ПОРУЧЕНЬ', 2108)
+
+    return {
+        'steps_count': steps,
+        'platforms_count': np.full(heights.shape, platforms),
+        'step_height': step_height,
+        'stringer_length': stringer_length,
+        'stringer_qty': stringer_qty,
+        'handrail_qty': handrail_qty,
+        'total_cost': total
+    }
+
+
+def modular_stairs(config, heights, step_widths, material_type='металлическая', catalog=None):
+    """Расчет модульных лестниц для массивов высот и ширин ступеней"""
+    if catalog is None:
+        catalog = bot.price_catalog
+    heights, widths = np.broadcast_arrays(np.asarray(heights, dtype=float), np.asarray(step_widths).astype(str))
+
+    def price(pattern, default):
+        return bot.get_material_price(material_type, pattern, default, catalog=catalog)
+
+    steps, step_height, platforms = _steps(heights, config)
+
+    total = np.zeros(heights.shape)
+    for article in ('15762374', '15762382'):
+        support = bot.get_material_by_article(article, catalog=catalog)
+        if support:
+            total = total + support['price']
+    total = total + (steps - 1) * price('Промежуточный элемент', 4076)
+    total = total + price('Верхний и нижний элемент', 7590)
+    corner = bot.get_material_by_article('15762391', catalog=catalog)
+    if corner and config == 'l_shape':
+        total = total + corner['price']
+    elif corner and config == 'u_shape':
+        total = total + corner['price'] * 2
+    if platforms:
+        total = total + price('Площадка', 8000) * platforms
+    total = total + steps * _width_prices(widths, lambda w: price(f'СТУПЕНЬ ПРЯМАЯ {w}', 1500))
+    total = total + (steps + platforms) * price('Опора под поручень', 900)
+    handrail_length = np.sqrt(_square(heights) + _square(steps * STEP_DEPTH)) / 1000
+    handrail_qty = np.ceil(handrail_length / 3)
+    total = total + handrail_qty * price('ПОРУЧЕНЬ', 2108)
+
+    return {
+        'steps_count': steps,
+        'platforms_count': np.full(heights.shape, platforms),
+        'step_height': step_height,
+        'stringer_length': handrail_length,
+        'handrail_qty': handrail_qty,
+        'total_cost': total
+    }
+
+
+def stairs(stair_type, config, heights, step_widths, material_type=None, catalog=None):
+    """Векторный расчет лестницы нужного типа"""
+    if stair_type == 'wood':
+        return wood_stairs(config, heights, step_widths, material_type or 'деревянная', catalog)
+    return modular_stairs(config, heights, step_widths, material_type or 'металлическая', catalog)
@@ -0,0 +1,114 @@
+"""Режим webhook: один асинхронный HTTP сервер принимает обновления Telegram
+и отвечает на проверки доступности (/, /ping, /status, /metrics)
+
+Заменяет run_polling и Flask сервер в отдельном потоке: обновления
+приходят POST запросом от Telegram сразу в цикл событий бота.
+"""
+import asyncio
+import hashlib
+import logging
+import signal
+
+from aiohttp import web
+from telegram import Update
+
+from metrics import CONTENT_TYPE
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_PATH = '/telegram'
+# Сколько обновлений Telegram отправляет параллельно (1-100)
+MAX_CONNECTIONS = 40
+
+
+def default_secret(token):
+    """Секрет webhook из токена: одинаковый между перезапусками и не раскрывает токен"""
+    return hashlib.sha256(token.encode()).hexdigest()[:32]
+
+
+def create_web_app(application, secret_token, home_text, status, path=WEBHOOK_PATH, metrics=None):
+    """aiohttp приложение: webhook Telegram и страницы для мониторинга
+
+    status - функция без аргументов, возвращающая словарь для /status,
+    metrics - функция, возвращающая текст метрик для /metrics.
+    """
+    async def home(request):
+        return web.Response(text=home_text)
+
+    async def ping(request):
+        return web.Response(text="PONG")
+
+    async def status_page(request):
+        return web.json_response(status())
+
+    async def metrics_page(request):
+        return web.Response(body=metrics().encode(), headers={'Content-Type': CONTENT_TYPE})
+
+    async def telegram_update(request):
+        if request.headers.get('X-Telegram-Bot-Api-Secret-Token') != secret_token:
+            return web.Response(status=403)
+        try:
+            update = Update.de_json(await request.json(), application.bot)
+        except Exception as e:
+            logger.warning(f"Некорректное обновление от Telegram: {e}")
+            return web.Response(status=400)
+        # Отвечаем сразу: обработка идет в Application, как и при polling
+        await application.update_queue.put(update)
+        return web.Response()
+
+    web_app = web.Application()
+    web_app.router.add_get('/', home)
+    web_app.router.add_get('/ping', ping)
+    web_app.router.add_get('/status', status_page)
+    if metrics is not None:
+        web_app.router.add_get('/metrics', metrics_page)
+    web_app.router.add_post(path, telegram_update)
+    return web_app
+
+
+async def serve(application, web_app, port, stop_event):
+    """Запуск Application и HTTP сервера до stop_event"""
+    await application.initialize()
+    if application.post_init is not None:
+        await application.post_init(application)
+    await application.start()
+
+    runner = web.AppRunner(web_app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '0.0.0.0', port)
+    try:
+        await site.start()
+        logger.info(f"📡 Webhook сервер слушает порт {port}")
+        await stop_event.wait()
+    finally:
+        await runner.cleanup()
+        await application.stop()
+        await application.shutdown()
+        if application.post_shutdown is not None:
+            await application.post_shutdown(application)
+
+
+async def run_webhook(application, webhook_url, port, secret_token, home_text, status, path=WEBHOOK_PATH, metrics=None):
+    """Регистрация webhook в Telegram и работа до SIGINT/SIGTERM"""
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass
+
+    web_app = create_web_app(application, secret_token, home_text, status, path, metrics)
+
+    async def register(app):
+        await application.bot.set_webhook(
+            url=webhook_url.rstrip('/') + path,
+            secret_token=secret_token,
+            allowed_updates=Update.ALL_TYPES,
+            drop_pending_updates=True,
+            max_connections=MAX_CONNECTIONS
+        )
+        logger.info(f"🔗 Webhook зарегистрирован: {webhook_url.rstrip('/')}{path}")
+
+    web_app.on_startup.append(register)
+    await serve(application, web_app, port, stop_event)